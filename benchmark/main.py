@@ -0,0 +1,241 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from datetime import datetime
+from uuid import uuid4
+import httpx
+
+from a2a.client import A2ACardResolver, A2AClient
+from a2a.types import (
+    JSONRPCErrorResponse, Message, MessageSendConfiguration, MessageSendParams,
+    SendMessageRequest, Task, TaskState, TextPart,
+)
+
+DEFAULT_MESSAGE = "Create a task called 'Review documentation' with description 'Review and update the project documentation'."
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Executors report backend failures as ordinary text replies, so these count as errors too.
+AGENT_ERROR_PREFIXES = ("Error:", "Run failed", "Operation failed", "Agent not initialized", "Authentication error")
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def reply_text(event) -> str:
+    parts = []
+    if isinstance(event, Message):
+        parts = event.parts
+    elif isinstance(event, Task) and event.status.message:
+        parts = event.status.message.parts
+    for part in parts or []:
+        text = getattr(getattr(part, 'root', part), 'text', None)
+        if text:
+            return text
+    return ""
+
+class LoadRun:
+    def __init__(self, client: A2AClient, message: str, contexts: int, timeout: float):
+        self.client = client
+        self.message = message
+        self.context_ids = [f"bench-{uuid4().hex}" for _ in range(contexts)] if contexts else None
+        self.timeout = timeout
+        self.samples = []
+
+    def _context_id(self, seq: int) -> str:
+        if self.context_ids:
+            return self.context_ids[seq % len(self.context_ids)]
+        return f"bench-{uuid4().hex}"
+
+    async def send_one(self, seq: int, scheduled_at: float | None = None):
+        # Open-loop latency is measured from the scheduled send time so queueing in the client is not hidden.
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        error = None
+        try:
+            response = await asyncio.wait_for(self.client.send_message(SendMessageRequest(
+                id=str(uuid4()),
+                params=MessageSendParams(
+                    message=Message(
+                        role='user',
+                        parts=[TextPart(text=self.message)],
+                        messageId=str(uuid4()),
+                        contextId=self._context_id(seq),
+                    ),
+                    configuration=MessageSendConfiguration(acceptedOutputModes=['text']),
+                )
+            )), timeout=self.timeout)
+            if isinstance(response.root, JSONRPCErrorResponse):
+                error = f"jsonrpc:{response.root.error.code}"
+            elif isinstance(response.root.result, Task) and response.root.result.status.state in (TaskState.failed, TaskState.canceled):
+                error = f"task:{response.root.result.status.state.value}"
+            elif reply_text(response.root.result).startswith(AGENT_ERROR_PREFIXES):
+                error = "agent_error"
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except httpx.HTTPStatusError as e:
+            error = f"http:{e.response.status_code}"
+        except Exception as e:
+            error = type(e).__name__
+        self.samples.append((time.perf_counter() - started, error))
+
+    async def closed_loop(self, concurrency: int, duration: float, max_requests: int | None):
+        deadline = time.perf_counter() + duration
+        counter = iter(range(max_requests or 2**62))
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                seq = next(counter, None)
+                if seq is None:
+                    return
+                await self.send_one(seq)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration: float, max_requests: int | None, arrival: str):
+        start = time.perf_counter()
+        next_at = start
+        in_flight = set()
+        seq = 0
+        while next_at - start < duration and (max_requests is None or seq < max_requests):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self.send_one(seq, scheduled_at=next_at))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            seq += 1
+            next_at += random.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+        if in_flight:
+            await asyncio.gather(*in_flight)
+
+    def summary(self, elapsed: float) -> dict:
+        latencies = sorted(latency for latency, error in self.samples if not error)
+        errors = {}
+        for _, error in self.samples:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+        total = len(self.samples)
+        failed = sum(errors.values())
+        ms = lambda value: round(value * 1000, 2) if value is not None else None
+        return {
+            "requests": total,
+            "succeeded": total - failed,
+            "failed": failed,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round((total - failed) / elapsed, 3) if elapsed else 0.0,
+            "latency_ms": {
+                "min": ms(latencies[0] if latencies else None),
+                "mean": ms(sum(latencies) / len(latencies) if latencies else None),
+                "p50": ms(percentile(latencies, 50)),
+                "p95": ms(percentile(latencies, 95)),
+                "p99": ms(percentile(latencies, 99)),
+                "max": ms(latencies[-1] if latencies else None),
+            },
+        }
+
+def compare(result: dict, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared to {baseline_path} ({baseline['started_at']}):")
+    ok = True
+    for key in ["p50", "p95", "p99"]:
+        old, new = baseline["summary"]["latency_ms"][key], result["summary"]["latency_ms"][key]
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        flag = "REGRESSION" if change > max_regression else ""
+        ok = ok and not flag
+        print(f"  {key}: {old:.1f}ms -> {new:.1f}ms ({change:+.1%}) {flag}")
+    old_tp, new_tp = baseline["summary"]["throughput_rps"], result["summary"]["throughput_rps"]
+    print(f"  throughput: {old_tp} -> {new_tp} req/s")
+    old_err, new_err = baseline["summary"]["error_rate"], result["summary"]["error_rate"]
+    print(f"  error rate: {old_err:.2%} -> {new_err:.2%}")
+    if new_err > old_err + max_regression:
+        ok = False
+    return ok
+
+async def run(args) -> dict:
+    message = args.message
+    if args.message_file:
+        with open(args.message_file) as f:
+            message = f.read()
+
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_connections), max_keepalive_connections=max(args.concurrency, args.max_connections))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as httpx_client:
+        agent_card = await A2ACardResolver(httpx_client, args.url).get_agent_card()
+        print(f"Benchmarking {agent_card.name} at {args.url} ({args.mode}-loop)")
+        client = A2AClient(httpx_client, agent_card=agent_card)
+
+        if args.warmup:
+            await LoadRun(client, message, 1, args.timeout).closed_loop(1, float("inf"), args.warmup)
+
+        load = LoadRun(client, message, args.contexts, args.timeout)
+        started_at = datetime.now().isoformat(timespec="seconds")
+        start = time.perf_counter()
+        if args.mode == "closed":
+            await load.closed_loop(args.concurrency, args.duration, args.requests)
+        else:
+            await load.open_loop(args.rate, args.duration, args.requests, args.arrival)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "agent": agent_card.name,
+        "url": args.url,
+        "started_at": started_at,
+        "config": {
+            "mode": args.mode, "concurrency": args.concurrency, "rate": args.rate, "arrival": args.arrival,
+            "duration_s": args.duration, "requests": args.requests, "contexts": args.contexts,
+            "timeout_s": args.timeout, "warmup": args.warmup, "message_chars": len(message),
+        },
+        "summary": load.summary(elapsed),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator and latency benchmark for A2A agents.")
+    parser.add_argument("url", help="Agent base URL, e.g. http://localhost:8001")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed", help="closed: fixed concurrency; open: fixed arrival rate")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent workers in closed-loop mode")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per second in open-loop mode")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson", help="Open-loop inter-arrival distribution")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--contexts", type=int, default=0, help="Reuse this many contextIds round-robin (0 = new context per request)")
+    parser.add_argument("--warmup", type=int, default=1, help="Sequential warm-up requests excluded from results")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--max-connections", type=int, default=100, help="HTTP connection pool size")
+    parser.add_argument("--message", default=DEFAULT_MESSAGE, help="Message text to send")
+    parser.add_argument("--message-file", help="Read the message text from a file")
+    parser.add_argument("--output", help="Result JSON path (default: benchmark/results/<agent>-<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative latency increase before --compare fails")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    summary = result["summary"]
+    latency = summary["latency_ms"]
+    print(f"{summary['requests']} requests, {summary['failed']} failed ({summary['error_rate']:.2%}), {summary['throughput_rps']} req/s")
+    print(f"latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    if summary["errors"]:
+        print(f"errors: {summary['errors']}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        slug = "".join(c if c.isalnum() else "-" for c in result["agent"].lower()).strip("-")
+        output = os.path.join(RESULTS_DIR, f"{slug}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and not compare(result, args.compare, args.max_regression):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+import httpx
+from a2a.client import A2AClient
+from main import LoadRun, percentile
+from startup import AGENTS, ROOT, RESULTS_DIR, wait_for
+
+async def card_latencies(url: str, concurrency: int, requests: int) -> list[float]:
+    latencies = []
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)) as client:
+        async def worker(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                (await client.get(f"{url}/.well-known/agent.json")).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    return latencies
+
+async def drive(url: str, concurrency: int, requests: int) -> dict:
+    start = time.perf_counter()
+    card = sorted(await card_latencies(url, concurrency, requests))
+    card_elapsed = time.perf_counter() - start
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)) as httpx_client:
+        load = LoadRun(A2AClient(httpx_client, url=f"{url}/"), "Update the onboarding guide", 0, 30)
+        await load.closed_loop(concurrency, float("inf"), concurrency)
+        load.samples.clear()
+        start = time.perf_counter()
+        await load.closed_loop(concurrency, float("inf"), requests)
+        send = load.summary(time.perf_counter() - start)
+    ms = lambda value: round(value * 1000, 3)
+    return {
+        "agent_card": {"throughput_rps": round(len(card) / card_elapsed, 1), "p50_ms": ms(percentile(card, 50)), "p99_ms": ms(percentile(card, 99))},
+        "message_send": {"throughput_rps": send["throughput_rps"], "p50_ms": send["latency_ms"]["p50"], "p99_ms": send["latency_ms"]["p99"], "failed": send["failed"]},
+    }
+
+def measure(name: str, profile: str, port: int, args) -> dict:
+    # No backend latency, so what is left is the agent's own per-request cost: HTTP, JSON-RPC, task store, events.
+    env = {**os.environ, "A2A_BACKEND": "fake", "FAKE_LATENCY": "fixed:0", "SERVER_PROFILE": profile, "PORT": str(port),
+           "MAX_CONCURRENCY": str(args.concurrency * 2)}
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(ROOT, AGENTS[name]), env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://localhost:{port}"
+        ready_at, _ = wait_for(f"{url}/ready", time.perf_counter() + args.timeout)
+        if ready_at is None:
+            raise RuntimeError(f"{name} did not become ready with SERVER_PROFILE={profile}")
+        return {"agent": name, "profile": profile, **asyncio.run(drive(url, args.concurrency, args.requests))}
+    finally:
+        process.terminate()
+        process.wait(timeout=args.timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares per-request server overhead of SERVER_PROFILE=default and performance on fake backends with no latency.")
+    parser.add_argument("agents", nargs="*", default=["formatter"], help=f"Agents to measure ({', '.join(AGENTS)})")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint and profile")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--port", type=int, default=9300, help="Port used for the measured server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    parser.add_argument("--output", help="Result JSON path (default: benchmark/results/server-<timestamp>.json)")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.agents:
+        for profile in ("default", "performance"):
+            result = measure(name, profile, args.port, args)
+            results.append(result)
+            card, send = result["agent_card"], result["message_send"]
+            print(f"{name} {profile:>11}: agent card {card['throughput_rps']} req/s p50 {card['p50_ms']}ms p99 {card['p99_ms']}ms | "
+                  f"message/send {send['throughput_rps']} req/s p50 {send['p50_ms']}ms p99 {send['p99_ms']}ms ({send['failed']} failed)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"server-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "config": vars(args), "results": results}, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+AGENTS = {"confluence": "confluence_agent", "devops": "devops_agent", "github": "github_agent", "formatter": "userstory-format-agent"}
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+def import_costs(agent_dir: str, env: dict, top: int) -> dict:
+    """Cumulative import time of each package that main.py imports directly, via -X importtime."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=agent_dir, env=env, capture_output=True, text=True)
+    total = time.perf_counter() - start
+    packages = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        # -X importtime indents nested imports by two spaces per level; main itself is level 0.
+        if match and len(match.group(3)) == 2:
+            package = match.group(4).split(".")[0]
+            packages[package] = packages.get(package, 0) + int(match.group(2)) / 1e6
+    heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"process_s": round(total, 3), "packages_s": {name: round(seconds, 3) for name, seconds in heaviest}}
+
+def wait_for(url: str, deadline: float, done=lambda response: response.status_code == 200):
+    while time.perf_counter() < deadline:
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if done(response):
+                return time.perf_counter(), response
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None, None
+
+def measure(name: str, port: int, env: dict, timeout: float, top: int) -> dict:
+    agent_dir = os.path.join(ROOT, AGENTS[name])
+    result = {"agent": name, "imports": import_costs(agent_dir, env, top)}
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=agent_dir, env={**env, "PORT": str(port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://localhost:{port}"
+        deadline = start + timeout
+        card_at, _ = wait_for(f"{base}/.well-known/agent.json", deadline)
+        result["card_s"] = round(card_at - start, 3) if card_at else None
+        if card_at:
+            # Stops on "failed" too, e.g. when measuring without Azure credentials.
+            ready_at, ready = wait_for(f"{base}/ready", deadline, lambda response: response.json().get("status") != "starting")
+            if ready is not None:
+                status = ready.json()
+                result["ready_s"] = round(ready_at - start, 3) if status["status"] == "ready" else None
+                result["setup"] = status
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures agent startup: import cost, time to serve the agent card and time until /ready.")
+    parser.add_argument("agents", nargs="*", default=list(AGENTS), help=f"Agents to measure ({', '.join(AGENTS)})")
+    parser.add_argument("--runs", type=int, default=3, help="Cold starts per agent")
+    parser.add_argument("--base-port", type=int, default=9200, help="Port used for the measured server")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for each server")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest top-level imports to report")
+    parser.add_argument("--output", help="Result JSON path (default: benchmark/results/startup-<timestamp>.json)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    results = []
+    for name in args.agents:
+        for run in range(args.runs):
+            result = measure(name, args.base_port, env, args.timeout, args.top)
+            results.append(result)
+            packages = ", ".join(f"{package} {seconds:.2f}s" for package, seconds in result["imports"]["packages_s"].items())
+            print(f"{name} run {run + 1}: card {result['card_s']}s, ready {result['ready_s']}s, import main {result['imports']['process_s']}s ({packages})")
+            if result.get("setup"):
+                print(f"  setup {result['setup']['status']}: {result['setup']['steps']}{' - ' + result['setup']['error'] if result['setup'].get('error') else ''}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "backend": env.get("A2A_BACKEND", "azure"), "results": results}, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Admission control for the agent servers.
+
+Each executor runs at most `max_concurrency` backend requests at once. Up to `max_queue` more wait in
+FIFO order for a slot, for at most `queue_timeout` seconds. When the queue is full, LoadSheddingMiddleware
+answers new message/send calls with HTTP 503 and a Retry-After estimate right away. Otherwise they would
+pile up behind requests the backend is already throttling.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from a2a.types import JSONRPCError
+from a2a.utils.errors import ServerError
+from common.metrics import REGISTRY
+
+OVERLOADED = -32000
+SHED_METHODS = ("message/send", "message/stream")
+
+QUEUE_SECONDS = REGISTRY.histogram("a2a_admission_wait_seconds", "Time requests spent queued for an execution slot.", ["agent", "outcome"])
+QUEUED = REGISTRY.gauge("a2a_admission_queued", "Requests waiting for an execution slot.", ["agent"])
+SHED = REGISTRY.counter("a2a_requests_shed_total", "Requests rejected by admission control.", ["agent", "reason"])
+
+class AdmissionController:
+    def __init__(self, agent: str, max_concurrency: int = 8, max_queue: int = 32, queue_timeout: float = 30.0):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        # Moving average of slot hold time, used to estimate Retry-After for shed requests.
+        self._service_time = 1.0
+        QUEUED.set_function(lambda: len(self._waiters), agent)
+
+    @classmethod
+    def from_env(cls, agent: str, max_concurrency: int = 8) -> "AdmissionController":
+        return cls(
+            agent,
+            max_concurrency=int(os.environ.get("MAX_CONCURRENCY", max_concurrency)),
+            max_queue=int(os.environ.get("MAX_QUEUE", 32)),
+            queue_timeout=float(os.environ.get("QUEUE_TIMEOUT", 30.0)),
+        )
+
+    @property
+    def full(self) -> bool:
+        return self.active >= self.max_concurrency and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(backlog * self._service_time / self.max_concurrency))
+
+    def overloaded(self, reason: str) -> ServerError:
+        SHED.inc(self.agent, reason)
+        return ServerError(error=JSONRPCError(code=OVERLOADED, message=f"Agent overloaded ({reason}), retry later", data={"retryAfter": self.retry_after()}))
+
+    async def _acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            QUEUE_SECONDS.observe(0.0, self.agent, "admitted")
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self.overloaded("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            QUEUE_SECONDS.observe(time.perf_counter() - start, self.agent, "timeout")
+            raise self.overloaded("queue_timeout")
+        except asyncio.CancelledError:
+            # A slot may have been handed over just as the caller was cancelled; pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        QUEUE_SECONDS.observe(time.perf_counter() - start, self.agent, "admitted")
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot moves straight to the next waiter, so active stays the same.
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - start)
+            self._release()
+
+class LoadSheddingMiddleware:
+    """Rejects message/send with 503 + Retry-After while the controller's queue is full.
+
+    The body is only inspected while saturated, so tasks/get and tasks/cancel still get through.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not self.controller.full:
+            return await self.app(scope, receive, send)
+
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message)
+            if message["type"] != "http.request" or not message.get("more_body"):
+                break
+        body = b"".join(chunk.get("body", b"") for chunk in chunks)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {}
+
+        if isinstance(payload, dict) and payload.get("method") in SHED_METHODS:
+            retry_after = self.controller.retry_after()
+            SHED.inc(self.controller.agent, "load_shed")
+            content = json.dumps({"jsonrpc": "2.0", "id": payload.get("id"), "error": {
+                "code": OVERLOADED, "message": "Agent overloaded, retry later", "data": {"retryAfter": retry_after}}}).encode()
+            await send({"type": "http.response.start", "status": 503, "headers": [
+                (b"content-type", b"application/json"), (b"retry-after", str(retry_after).encode()), (b"content-length", str(len(content)).encode())]})
+            await send({"type": "http.response.body", "body": content})
+            return
+
+        async def replay():
+            return chunks.pop(0) if chunks else await receive()
+        await self.app(scope, replay, send)
@@ -0,0 +1,113 @@
+"""A fixed set of backend clients shared by many conversations.
+
+Each conversation sticks to the client that started it, because its thread object belongs to that
+client's connection. New conversations go to the least busy healthy client. A client serves at most
+`max_per_client` calls at once. After `max_failures` consecutive failures it is replaced by a fresh
+one, and the conversations it held start over on their next turn. Only the `MAX_CONTEXTS` most recently
+used conversations stay pinned; older ones are forgotten the same way.
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+POOL_BUSY = REGISTRY.gauge("a2a_client_pool_busy", "Calls in flight or waiting per pooled client.", ["agent", "client"])
+MAX_CONTEXTS = 4096
+
+POOL_RECYCLES = REGISTRY.counter("a2a_client_pool_recycles_total", "Pooled clients replaced after repeated failures.", ["agent"])
+
+class PooledClient:
+    def __init__(self, index: int, client, max_per_client: int):
+        self.index = index
+        self.client = client
+        self.busy = 0
+        self.failures = 0
+        self.contexts = set()
+        self.semaphore = asyncio.Semaphore(max_per_client)
+
+class ClientPool:
+    def __init__(self, agent: str, factory, size: int = 4, max_per_client: int = 2, max_failures: int = 3, on_recycle=None):
+        self.agent = agent
+        self.factory = factory
+        self.size = size
+        self.max_per_client = max_per_client
+        self.max_failures = max_failures
+        # Called with the context ids whose client was replaced or that were forgotten, so the caller can drop their threads.
+        self.on_recycle = on_recycle
+        self.clients: list[PooledClient] = []
+        self.affinity: OrderedDict[str, PooledClient] = OrderedDict()
+
+    @classmethod
+    def from_env(cls, agent: str, factory, on_recycle=None) -> "ClientPool":
+        return cls(agent, factory,
+                   size=int(os.environ.get("CLIENT_POOL_SIZE", 4)),
+                   max_per_client=int(os.environ.get("CLIENT_MAX_CONCURRENCY", 2)),
+                   max_failures=int(os.environ.get("CLIENT_MAX_FAILURES", 3)),
+                   on_recycle=on_recycle)
+
+    def start(self):
+        """Creates the clients; sync so it can run as a readiness step in a worker thread."""
+        self.clients = [PooledClient(i, self.factory(), self.max_per_client) for i in range(self.size)]
+        for member in self.clients:
+            POOL_BUSY.set_function(lambda member=member: member.busy, self.agent, str(member.index))
+
+    def _pick(self, context_id: str | None) -> PooledClient:
+        member = self.affinity.get(context_id)
+        if member is None:
+            member = min(self.clients, key=lambda m: (m.failures > 0, m.busy, len(m.contexts)))
+            # One-off calls (context_id None) keep no conversation, so nothing is pinned.
+            if context_id is not None:
+                self.affinity[context_id] = member
+                member.contexts.add(context_id)
+                self._forget_oldest()
+        else:
+            self.affinity.move_to_end(context_id)
+        return member
+
+    def _forget_oldest(self):
+        forgotten = []
+        while len(self.affinity) > MAX_CONTEXTS:
+            context_id, member = self.affinity.popitem(last=False)
+            member.contexts.discard(context_id)
+            forgotten.append(context_id)
+        if self.on_recycle and forgotten:
+            self.on_recycle(forgotten)
+
+    def _recycle(self, member: PooledClient):
+        logger.warning(f"Replacing {self.agent} client {member.index} after {member.failures} consecutive failures")
+        POOL_RECYCLES.inc(self.agent)
+        try:
+            member.client = self.factory()
+        except Exception as e:
+            logger.error(f"Creating a replacement {self.agent} client failed, keeping the old one: {e}")
+            return
+        member.failures = 0
+        contexts, member.contexts = member.contexts, set()
+        for context_id in contexts:
+            self.affinity.pop(context_id, None)
+        if self.on_recycle and contexts:
+            self.on_recycle(contexts)
+
+    @asynccontextmanager
+    async def client(self, context_id: str | None):
+        member = self._pick(context_id)
+        # Counted while waiting too, so new conversations avoid clients that already have a backlog.
+        member.busy += 1
+        try:
+            async with member.semaphore:
+                try:
+                    yield member.client
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    member.failures += 1
+                    if member.failures >= self.max_failures:
+                        self._recycle(member)
+                    raise
+                member.failures = 0
+        finally:
+            member.busy -= 1
@@ -0,0 +1,156 @@
+"""Finding out what stalls an agent server: an always-on event loop watchdog and guarded debug routes.
+
+`LoopMonitor` wakes up every `LOOP_LAG_INTERVAL` seconds on the event loop and records how late it
+was (`a2a_event_loop_lag_seconds`). A watchdog thread notices when the loop has not woken up for
+`LOOP_LAG_THRESHOLD` seconds and captures the loop thread's stack while it is still blocked, so the
+warning names the blocking call (a synchronous SDK call, a `time.sleep`, a slow callback), not just
+the lag it caused.
+
+With `DEBUG_TOKEN` set, `/debug/profile?seconds=10` returns a cProfile of the event loop thread over
+that window, capped at MAX_PROFILE_SECONDS; `sort` takes a pstats sort key and `limit` the number of
+rows. `/debug/tasks` dumps every asyncio task and thread with its stack. Both need
+`Authorization: Bearer <DEBUG_TOKEN>`; without the variable the routes don't exist.
+"""
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LAG = REGISTRY.histogram("a2a_event_loop_lag_seconds", "How late the event loop ran a timer, sampled periodically.", ["agent"],
+                         buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+BLOCKED = REGISTRY.counter("a2a_event_loop_blocked_total", "Times the event loop was blocked longer than LOOP_LAG_THRESHOLD.", ["agent"])
+
+MAX_PROFILE_SECONDS = 60
+
+class LoopMonitor:
+    def __init__(self, agent: str, threshold: float = 0.25, interval: float = 0.05):
+        self.agent = agent
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = time.monotonic()
+        self._stack = None
+        self._loop_thread = None
+        self._task = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, agent: str) -> "LoopMonitor":
+        return cls(agent, threshold=float(os.environ.get("LOOP_LAG_THRESHOLD", "0.25")),
+                   interval=float(os.environ.get("LOOP_LAG_INTERVAL", "0.05")))
+
+    def start(self):
+        """Must be called on the event loop it should watch."""
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name=f"{self.agent}-loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self._beat = time.monotonic()
+            LAG.observe(lag, self.agent)
+            if lag >= self.threshold:
+                BLOCKED.inc(self.agent)
+                stack, self._stack = self._stack, None
+                logger.warning(f"{self.agent}: event loop blocked for {lag:.3f}s" + (f" in:\n{stack}" if stack else ""))
+
+    def _watch(self):
+        # Polls often enough to catch every stall above the threshold while it is still going on.
+        while not self._stop.wait(min(self.interval, self.threshold / 2)):
+            if self._stack is None and time.monotonic() - self._beat - self.interval >= self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                self._stack = "".join(traceback.format_stack(frame)) if frame else None
+
+def _coroutine_stack(coro) -> str:
+    """The await chain of a suspended coroutine, innermost last, like a traceback."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append((frame, frame.f_lineno))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return "".join(traceback.StackSummary.extract(frames).format())
+
+def dump_tasks() -> str:
+    lines = []
+    for task in sorted(asyncio.all_tasks(), key=lambda t: t.get_name()):
+        lines.append(f"Task {task.get_name()} ({'done' if task.done() else 'pending'}): {task.get_coro().__qualname__}")
+        lines.append(_coroutine_stack(task.get_coro()))
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"Thread {names.get(ident, ident)}:")
+        lines.append("".join(traceback.format_stack(frame)))
+    return "\n".join(lines)
+
+class DebugRoutes:
+    def __init__(self, token: str):
+        self.token = token
+        self._profiling = False
+
+    def _allowed(self, request) -> bool:
+        return hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {self.token}")
+
+    async def profile(self, request):
+        if not self._allowed(request):
+            return PlainTextResponse("Forbidden", status_code=403)
+        if self._profiling:
+            return PlainTextResponse("A profile is already running", status_code=409)
+        try:
+            seconds = float(request.query_params.get("seconds", "10"))
+            limit = int(request.query_params.get("limit", "50"))
+        except ValueError:
+            return PlainTextResponse("seconds must be a number and limit an integer", status_code=400)
+        if not math.isfinite(seconds) or seconds <= 0 or limit <= 0:
+            return PlainTextResponse("seconds and limit must be positive", status_code=400)
+        sort = request.query_params.get("sort", "cumulative")
+        if sort not in pstats.Stats.sort_arg_dict_default:
+            return PlainTextResponse(f"sort must be one of {', '.join(sorted(pstats.Stats.sort_arg_dict_default))}", status_code=400)
+        seconds = min(seconds, MAX_PROFILE_SECONDS)
+        self._profiling = True
+        # Enabled on the event loop thread, so it sees every callback and coroutine step in the window.
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            self._profiling = False
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out).sort_stats(sort)
+        stats.print_stats(limit)
+        return PlainTextResponse(out.getvalue())
+
+    async def tasks(self, request):
+        if not self._allowed(request):
+            return PlainTextResponse("Forbidden", status_code=403)
+        return PlainTextResponse(dump_tasks())
+
+def debug_routes(token: str | None = None) -> list[Route]:
+    token = token or os.environ.get("DEBUG_TOKEN")
+    if not token:
+        return []
+    debug = DebugRoutes(token)
+    return [Route("/debug/profile", debug.profile, methods=["GET"], name="debug_profile"),
+            Route("/debug/tasks", debug.tasks, methods=["GET"], name="debug_tasks")]
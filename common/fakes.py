@@ -0,0 +1,457 @@
+"""Offline stand-ins for the cloud backends used by the agent executors.
+
+Enable with A2A_BACKEND=fake. Latency per call is drawn from a distribution spec
+such as "fixed:0.2", "uniform:0.5,2", "normal:1,0.2", "lognormal:1.5,0.4" or "exp:1"
+(seconds). Override with FAKE_LATENCY_<STEP>, scale everything with FAKE_LATENCY_SCALE,
+inject errors with FAKE_FAILURE_RATE / FAKE_FAILURE_RATE_<STEP> and seed with FAKE_SEED.
+"""
+import asyncio
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+FAKE_ENV_DEFAULTS = {
+    "PROJECT_ENDPOINT": "https://fake.services.ai.azure.com/api/projects/fake",
+    "MODEL_DEPLOYMENT_NAME": "fake-model",
+    "LOGIC_APP_URL": "https://fake.logic.azure.com/workflows/fake/triggers/manual/paths/invoke?api-version=2016-10-01",
+    "AZURE_OPENAI_ENDPOINT": "https://fake.openai.azure.com",
+    "MCP_SERVER_URL": "https://fake.mcp.local/v1/sse",
+    "MCP_SERVER_LABEL": "fake",
+}
+
+TODO_TITLES = [
+    "Update the onboarding guide", "Review API documentation", "Set up staging monitoring",
+    "Clarify release checklist", "Migrate build pipeline", "Schedule security review",
+]
+
+def use_fake_backends() -> bool:
+    return os.environ.get("A2A_BACKEND", "").lower() == "fake"
+
+def install_fake_env():
+    for key, value in FAKE_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+
+class FakeBackendError(Exception):
+    def __init__(self, status_code: int, step: str, retry_after: float | None = None):
+        reason = {429: "Too Many Requests", 500: "Internal Server Error", 503: "Service Unavailable"}.get(status_code, "Error")
+        super().__init__(f"({status_code}) {reason} from fake backend during {step}")
+        self.status_code = status_code
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+
+class Latency:
+    def __init__(self, kind: str = "fixed", *params: float):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, _, raw = spec.partition(":")
+        params = [float(p) for p in raw.split(",") if p.strip()] if raw else []
+        if kind not in ("fixed", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind, *params)
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            # Parameterised by median and sigma, which is how service latencies are usually described.
+            value = rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+class FakeProfile:
+    def __init__(self, latencies: dict[str, str], failure_rate: float = 0.0, scale: float = 1.0, seed: int | None = None):
+        self.latencies = {step: Latency.parse(spec) for step, spec in latencies.items()}
+        self.failure_rates = {}
+        self.failure_rate = failure_rate
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, defaults: dict[str, str]) -> "FakeProfile":
+        latencies = {}
+        for step, spec in defaults.items():
+            latencies[step] = os.environ.get(f"FAKE_LATENCY_{step.upper()}") or os.environ.get("FAKE_LATENCY") or spec
+        seed = os.environ.get("FAKE_SEED")
+        profile = cls(
+            latencies,
+            failure_rate=float(os.environ.get("FAKE_FAILURE_RATE", "0")),
+            scale=float(os.environ.get("FAKE_LATENCY_SCALE", "1")),
+            seed=int(seed) if seed else None,
+        )
+        for step in defaults:
+            rate = os.environ.get(f"FAKE_FAILURE_RATE_{step.upper()}")
+            if rate:
+                profile.failure_rates[step] = float(rate)
+        return profile
+
+    def duration(self, step: str) -> float:
+        latency = self.latencies.get(step)
+        if not latency:
+            return 0.0
+        with self._lock:
+            return latency.sample(self.rng) * self.scale
+
+    def fails(self, step: str) -> bool:
+        with self._lock:
+            return self.rng.random() < self.failure_rates.get(step, self.failure_rate)
+
+    def error(self, step: str) -> FakeBackendError:
+        with self._lock:
+            status = self.rng.choice([429, 429, 500, 503])
+        return FakeBackendError(status, step, retry_after=1 if status == 429 else None)
+
+    def call(self, step: str):
+        """Blocks like the synchronous Azure SDKs do, then maybe raises."""
+        time.sleep(self.duration(step))
+        if self.fails(step):
+            raise self.error(step)
+
+    async def acall(self, step: str):
+        await asyncio.sleep(self.duration(step))
+        if self.fails(step):
+            raise self.error(step)
+
+def _list_items(text: str) -> list[str]:
+    items = [m.group(1).strip() for m in re.finditer(r"^\s*(?:\d+[.)]|[-*])\s+(.+)$", text or "", re.MULTILINE)]
+    titles = [m.group(1).strip() for m in re.finditer(r"^\s*\**Title\**:\s*(.+)$", text or "", re.MULTILINE)]
+    return titles or items
+
+def _usage(prompt: str, reply: str) -> SimpleNamespace:
+    prompt_tokens, completion_tokens = max(1, len(prompt) // 4), max(1, len(reply) // 4)
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens,
+                           input_tokens=prompt_tokens, output_tokens=completion_tokens)
+
+def extraction_reply(todo_count: int) -> str:
+    todos = [f"{i + 1}. {TODO_TITLES[i % len(TODO_TITLES)]} (Assigned to: Team member {i + 1})" for i in range(todo_count)]
+    return "I found the following todos/action items on the page:\n\n" + "\n".join(todos)
+
+def formatting_reply(user_input: str) -> str:
+    items = _list_items(user_input) or [user_input.strip().splitlines()[0][:80] if user_input.strip() else "Untitled"]
+    blocks = []
+    for i, item in enumerate(items, 1):
+        title = re.sub(r"\s*\(Assigned to:.*?\)", "", item)
+        blocks.append(f"{i}. **Title**: {title}\n   **Type**: User Story\n   **Description**: As a team member, I want to {title[:1].lower() + title[1:]}.\n"
+                      f"   **Acceptance Criteria**: {title} is completed and reviewed.")
+    return "Here are the detailed work items:\n\n" + "\n\n".join(blocks)
+
+def creation_reply(user_input: str) -> str:
+    titles = _list_items(user_input) or ["Work item"]
+    created = [f"- #{1000 + i} {re.sub(r'[*]', '', title)}" for i, title in enumerate(titles, 1)]
+    return "Work items created successfully:\n" + "\n".join(created)
+
+class _FakeThreads:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, **kwargs):
+        self._backend.profile.call("threads_create")
+        thread = SimpleNamespace(id=f"thread_{uuid4().hex[:24]}", created_at=time.time())
+        self._backend.messages_by_thread[thread.id] = []
+        return thread
+
+    def delete(self, thread_id: str, **kwargs):
+        self._backend.profile.call("threads_delete")
+        self._backend.messages_by_thread.pop(thread_id, None)
+
+class _FakeMessages:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, thread_id: str, role: str, content: str, **kwargs):
+        self._backend.profile.call("messages_create")
+        return self._backend.append_message(thread_id, role, content)
+
+    def list(self, thread_id: str, **kwargs):
+        self._backend.profile.call("messages_list")
+        # Foundry lists newest first by default.
+        return list(reversed(self._backend.messages_by_thread.get(thread_id, [])))
+
+class _FakeRuns:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def create(self, thread_id: str, agent_id: str, **kwargs):
+        self._backend.profile.call("runs_create")
+        return self._backend.start_run(thread_id, agent_id)
+
+    def get(self, thread_id: str, run_id: str, **kwargs):
+        self._backend.profile.call("runs_get")
+        return self._backend.advance(self._backend.run_state[run_id])
+
+    def create_and_process(self, thread_id: str, agent_id: str, **kwargs):
+        run = self.create(thread_id=thread_id, agent_id=agent_id)
+        while run.status in ("queued", "in_progress", "requires_action"):
+            time.sleep(self._backend.poll_interval)
+            run = self.get(thread_id=thread_id, run_id=run.id)
+            if run.status == "requires_action":
+                self.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_approvals=[])
+        return run
+
+    def submit_tool_outputs(self, thread_id: str, run_id: str, **kwargs):
+        self._backend.profile.call("runs_submit")
+        run = self._backend.run_state[run_id]
+        if run.status == "requires_action":
+            run.status, run.required_action = "in_progress", None
+            run.needs_approval = False
+            run.tool_called = True
+            run.done_at = time.monotonic() + self._backend.profile.duration("tool_call") + run.remaining
+        return run
+
+    def cancel(self, thread_id: str, run_id: str, **kwargs):
+        self._backend.profile.call("runs_cancel")
+        run = self._backend.run_state[run_id]
+        if run.status not in FakeAgentsClient.TERMINAL:
+            run.status = "cancelled"
+        return run
+
+class _FakeRunSteps:
+    def __init__(self, backend):
+        self._backend = backend
+
+    def list(self, thread_id: str, run_id: str, **kwargs):
+        self._backend.profile.call("run_steps_list")
+        run = self._backend.run_state[run_id]
+        steps = [SimpleNamespace(id=f"step_{uuid4().hex[:24]}", type="tool_calls")] if run.tool_called else []
+        return steps + ([SimpleNamespace(id=f"step_{uuid4().hex[:24]}", type="message_creation")] if run.status == "completed" else [])
+
+class FakeAgentsClient:
+    """Mimics the Foundry `AgentsClient` surface used by the DevOps and GitHub executors."""
+
+    TERMINAL = ("completed", "failed", "cancelled", "expired")
+    DEFAULT_LATENCY = {
+        "create_agent": "fixed:0.5", "threads_create": "lognormal:0.15,0.3", "threads_delete": "fixed:0.1",
+        "messages_create": "lognormal:0.1,0.3", "messages_list": "lognormal:0.12,0.3",
+        "runs_create": "lognormal:0.15,0.3", "runs_get": "lognormal:0.08,0.3", "runs_submit": "lognormal:0.1,0.3",
+        "runs_cancel": "fixed:0.1", "run_steps_list": "lognormal:0.08,0.3", "run_queue": "exp:0.3", "run": "lognormal:3,0.4", "tool_call": "lognormal:1,0.5",
+    }
+
+    def __init__(self, profile: FakeProfile | None = None, poll_interval: float = 1.0):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self.poll_interval = poll_interval
+        self.agents = {}
+        self.run_state = {}
+        self.messages_by_thread = {}
+        self.threads = _FakeThreads(self)
+        self.messages = _FakeMessages(self)
+        self.runs = _FakeRuns(self)
+        self.run_steps = _FakeRunSteps(self)
+
+    @classmethod
+    def from_env(cls) -> "FakeAgentsClient":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY), poll_interval=float(os.environ.get("FAKE_POLL_INTERVAL", "1")))
+
+    def create_agent(self, model: str, name: str, instructions: str = "", tools=None, **kwargs):
+        self.profile.call("create_agent")
+        uses_mcp = any((tool.get("type") if isinstance(tool, dict) else getattr(tool, "type", None)) == "mcp" for tool in tools or [])
+        agent = SimpleNamespace(id=f"asst_{uuid4().hex[:24]}", name=name, model=model, instructions=instructions, tools=tools or [], uses_mcp=uses_mcp)
+        self.agents[agent.id] = agent
+        return agent
+
+    def append_message(self, thread_id: str, role: str, content: str):
+        from azure.ai.agents.models import MessageTextContent, MessageTextDetails
+        message = SimpleNamespace(
+            id=f"msg_{uuid4().hex[:24]}", thread_id=thread_id, role=role,
+            content=[MessageTextContent(text=MessageTextDetails(value=content, annotations=[]))],
+        )
+        self.messages_by_thread.setdefault(thread_id, []).append(message)
+        return message
+
+    def start_run(self, thread_id: str, agent_id: str):
+        now = time.monotonic()
+        total = self.profile.duration("run")
+        agent = self.agents.get(agent_id)
+        run = SimpleNamespace(
+            id=f"run_{uuid4().hex[:24]}", thread_id=thread_id, agent_id=agent_id, status="queued",
+            last_error=None, required_action=None, usage=None,
+            ready_at=now + self.profile.duration("run_queue"), needs_approval=bool(agent and agent.uses_mcp),
+            approval_at=None, done_at=None, tool_called=False, remaining=total / 2, total=total, fails=self.profile.fails("run"),
+        )
+        self.run_state[run.id] = run
+        return run
+
+    def advance(self, run):
+        from azure.ai.agents.models import RequiredMcpToolCall, SubmitToolApprovalAction, SubmitToolApprovalDetails
+        now = time.monotonic()
+        if run.status == "queued" and now >= run.ready_at:
+            run.status = "in_progress"
+            run.approval_at = now + run.total / 2
+            run.done_at = now + run.total
+        if run.status != "in_progress":
+            return run
+        # Tools without approval run server-side halfway through, the way the DevOps OpenAPI tool does.
+        agent = self.agents.get(run.agent_id)
+        if agent and agent.tools and not run.needs_approval and now >= run.approval_at:
+            run.tool_called = True
+        if run.needs_approval and now >= run.approval_at:
+            run.status = "requires_action"
+            run.required_action = SubmitToolApprovalAction(submit_tool_approval=SubmitToolApprovalDetails(tool_calls=[
+                RequiredMcpToolCall(id=f"call_{uuid4().hex[:12]}", arguments="{}", name="create_issue", server_label="github"),
+            ]))
+        elif not run.needs_approval and now >= run.done_at:
+            if run.fails:
+                run.status = "failed"
+                run.last_error = {"code": "server_error", "message": "Fake backend run failure"}
+                return run
+            history = self.messages_by_thread.get(run.thread_id, [])
+            prompt = next((m.content[0].text.value for m in reversed(history) if m.role == "user"), "")
+            reply = creation_reply(prompt)
+            self.append_message(run.thread_id, "assistant", reply)
+            run.usage = _usage(prompt, reply)
+            run.status = "completed"
+        return run
+
+class _FakeResponses:
+    def __init__(self, backend):
+        self._backend = backend
+
+    async def create(self, model: str, input, previous_response_id: str | None = None, tools=None, **kwargs):
+        backend = self._backend
+        if previous_response_id and previous_response_id not in backend.stored:
+            raise FakeBackendError(400, "responses_create")
+        await backend.profile.acall("responses_create")
+        output = []
+        for tool in tools or []:
+            if tool.get("type") != "mcp":
+                continue
+            if tool.get("require_approval", "always") != "never":
+                output.append(SimpleNamespace(type="mcp_approval_request", id=f"mcpr_{uuid4().hex[:12]}", name=(tool.get("allowed_tools") or ["tool"])[0],
+                                              server_label=tool.get("server_label"), arguments="{}"))
+                continue
+            await asyncio.sleep(backend.profile.duration("mcp_call"))
+            output.append(SimpleNamespace(type="mcp_call", id=f"mcp_{uuid4().hex[:12]}", name=(tool.get("allowed_tools") or ["tool"])[0],
+                                          server_label=tool.get("server_label"), arguments="{}", output="<page content>", error=None))
+        prompt = "\n".join(str(item.get("content", "")) for item in input) if isinstance(input, list) else str(input)
+        reply = extraction_reply(backend.todo_count)
+        if not any(item.type == "mcp_approval_request" for item in output):
+            output.append(SimpleNamespace(type="message", role="assistant", content=[SimpleNamespace(type="output_text", text=reply, annotations=[])]))
+        response = SimpleNamespace(id=f"resp_{uuid4().hex}", model=model, status="completed", output=output,
+                                   previous_response_id=previous_response_id, usage=_usage(prompt, reply))
+        backend.stored[response.id] = response
+        return response
+
+class FakeResponsesClient:
+    """Mimics `AsyncAzureOpenAI.responses.create` with a remote MCP tool, as used by the Confluence executor."""
+
+    DEFAULT_LATENCY = {"responses_create": "lognormal:2.5,0.4", "mcp_call": "lognormal:1.2,0.5"}
+
+    def __init__(self, profile: FakeProfile | None = None, todo_count: int = 3):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self.todo_count = todo_count
+        self.stored = {}
+        self.responses = _FakeResponses(self)
+
+    @classmethod
+    def from_env(cls) -> "FakeResponsesClient":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY), todo_count=int(os.environ.get("FAKE_TODO_COUNT", "3")))
+
+class FakeConfluencePages:
+    """Stands in for the Confluence page listing used by the sync mode; FAKE_PAGE_VERSION bumps every page."""
+
+    DEFAULT_LATENCY = {"list_pages": "lognormal:0.3,0.3"}
+
+    def __init__(self, profile: FakeProfile | None = None, page_count: int = 5, version: int = 1):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self.page_count = page_count
+        self.version = version
+
+    @classmethod
+    def from_env(cls) -> "FakeConfluencePages":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY), page_count=int(os.environ.get("FAKE_PAGE_COUNT", "5")),
+                   version=int(os.environ.get("FAKE_PAGE_VERSION", "1")))
+
+    async def list(self, space: str):
+        await self.profile.acall("list_pages")
+        return [SimpleNamespace(id=str(65700 + i), title=f"{space} meeting notes {i + 1}", version=self.version) for i in range(self.page_count)]
+
+
+class FakeCopilotStudioAgent:
+    """Mimics `CopilotStudioAgent.get_response` for the user story formatter."""
+
+    DEFAULT_LATENCY = {"copilot_get_response": "lognormal:2.5,0.4"}
+
+    def __init__(self, profile: FakeProfile | None = None, name: str = "AzureDevOpsAssistant"):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self.name = name
+
+    @classmethod
+    def from_env(cls) -> "FakeCopilotStudioAgent":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY))
+
+    async def get_response(self, messages=None, thread=None, **kwargs):
+        await self.profile.acall("copilot_get_response")
+        thread = thread or SimpleNamespace(id=f"conv_{uuid4().hex}")
+        reply = formatting_reply(messages if isinstance(messages, str) else str(messages))
+        message = SimpleNamespace(items=[SimpleNamespace(text=reply)], content=reply)
+        return SimpleNamespace(message=message, content=message, thread=thread)
+
+class FakeChatCompletion:
+    """Stands in for `AzureChatCompletion` in the group chat termination check.
+
+    With logprobs requested, FAKE_UNCERTAIN_RATE of the verdicts come with a low token probability.
+    """
+
+    DEFAULT_LATENCY = {"chat_completion": "lognormal:0.6,0.3"}
+    DONE_KEYWORDS = ("created", "no todos", "no action items")
+
+    def __init__(self, profile: FakeProfile | None = None, uncertain_rate: float = 0.0):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self.uncertain_rate = uncertain_rate
+
+    @classmethod
+    def from_env(cls) -> "FakeChatCompletion":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY), uncertain_rate=float(os.environ.get("FAKE_UNCERTAIN_RATE", "0")))
+
+    async def get_chat_message_content(self, chat_history, settings=None, **kwargs):
+        await self.profile.acall("chat_completion")
+        # The last message is the "Complete?" question; judge the one before it.
+        messages = getattr(chat_history, "messages", chat_history)
+        last = str(messages[-2].content).lower() if len(messages) > 1 else ""
+        content = "true" if any(kw in last for kw in self.DONE_KEYWORDS) else "false"
+        metadata = {"usage": _usage(" ".join(str(m.content) for m in messages), content)}
+        if (getattr(settings, "extra_body", None) or {}).get("logprobs"):
+            with self.profile._lock:
+                probability = 0.55 if self.profile.rng.random() < self.uncertain_rate else 0.99
+            metadata["logprobs"] = SimpleNamespace(content=[SimpleNamespace(token=content, logprob=math.log(probability))])
+        return SimpleNamespace(content=content, metadata=metadata)
+
+class FakeLogicApp:
+    """Stands in for the DevOps Logic App that the executor calls directly for structured work items."""
+
+    DEFAULT_LATENCY = {"create_work_item": "lognormal:0.4,0.3"}
+
+    def __init__(self, profile: FakeProfile | None = None):
+        self.profile = profile or FakeProfile(self.DEFAULT_LATENCY)
+        self._next_id = 1000
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeLogicApp":
+        return cls(FakeProfile.from_env(cls.DEFAULT_LATENCY))
+
+    async def create(self, item):
+        await self.profile.acall("create_work_item")
+        with self._lock:
+            self._next_id += 1
+            work_item_id = self._next_id
+        return item.model_copy(update={"id": work_item_id, "url": f"https://dev.azure.com/fake/_workitems/edit/{work_item_id}"})
+
+    async def close(self):
+        pass
+
+async def fake_atlassian_token() -> str:
+    await asyncio.sleep(0)
+    return "fake-atlassian-token"
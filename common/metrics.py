@@ -0,0 +1,168 @@
+"""Minimal Prometheus-compatible metrics for the agent servers.
+
+Observing a value is a bisect plus a couple of additions under a lock; text rendering only
+happens when /metrics is scraped, and gauges backed by a callback are evaluated at scrape time.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class Histogram:
+    def __init__(self, name: str, help: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names, self.buckets = name, help, tuple(label_names), tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in snapshot.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), label_values + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names=()):
+        self.name, self.help, self.label_names = name, help, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in self._values.items()]
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, help: str, label_names=()):
+        self.name, self.help, self.label_names = name, help, tuple(label_names)
+        self._values = {}
+        self._functions = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def set_function(self, function, *label_values):
+        self._functions[label_values] = function
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, function in list(self._functions.items()):
+            try:
+                values[labels] = function()
+            except Exception:
+                continue
+        lines += [f"{self.name}{_labels(self.label_names, labels)} {value}" for labels, value in values.items()]
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def counter(self, name, help, label_names=()) -> Counter:
+        return self._register(Counter(name, help, label_names))
+
+    def gauge(self, name, help, label_names=()) -> Gauge:
+        return self._register(Gauge(name, help, label_names))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("a2a_stage_duration_seconds", "Time spent in each backend stage of an executor.", ["agent", "stage", "outcome"])
+REQUESTS_IN_FLIGHT = REGISTRY.gauge("a2a_requests_in_flight", "Requests currently being executed.", ["agent"])
+SESSIONS = REGISTRY.gauge("a2a_sessions", "Conversation contexts held in the executor's session map.", ["agent"])
+TOOL_CALLS = REGISTRY.counter("a2a_tool_calls_total", "MCP tool calls reported by the backend.", ["agent", "tool", "outcome"])
+
+class ExecutorMetrics:
+    """Per-executor handle so call sites only name the stage."""
+
+    def __init__(self, agent: str, sessions=None):
+        self.agent = agent
+        if sessions is not None:
+            SESSIONS.set_function(lambda: len(sessions), agent)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, self.agent, name, outcome)
+
+    def observe(self, name: str, seconds: float, outcome: str = "ok"):
+        STAGE_SECONDS.observe(seconds, self.agent, name, outcome)
+
+    @contextmanager
+    def request(self):
+        REQUESTS_IN_FLIGHT.inc(self.agent)
+        try:
+            with self.stage("execute"):
+                yield
+        finally:
+            REQUESTS_IN_FLIGHT.dec(self.agent)
+
+    def tool_call(self, tool: str, outcome: str):
+        TOOL_CALLS.inc(self.agent, tool, outcome)
+
+async def _metrics_endpoint(request):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def metrics_route(path: str = "/metrics") -> Route:
+    return Route(path, _metrics_endpoint, methods=["GET"], name="metrics")
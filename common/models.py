@@ -0,0 +1,84 @@
+"""Model tiers: which deployment each call site uses, escalation to a larger one, latency and cost per tier.
+
+`MODEL_TIERS="small=gpt-4o-mini,large=gpt-4.1"` names the deployments, smallest first. Without it there
+is a single tier, `default`, with no deployment of its own: each service keeps its usual one.
+`MODEL_ROUTES="termination=small,extraction=large"` assigns call sites to tiers. A site without a route
+uses each service's built-in default (`SITE_DEFAULTS`), and the largest tier if that tier is not configured.
+When a call site can tell that an answer is unreliable, such as an ambiguous termination verdict or a
+truncated extraction, the call is repeated on the next larger tier. `MODEL_MIN_CONFIDENCE` (default 0.8)
+is the lowest token probability that still counts as reliable where the model reports one.
+`MODEL_PRICES="small=0.15/0.6,large=2/8"` gives USD per million prompt/completion tokens, which feeds
+`a2a_model_cost_usd_total`.
+"""
+import os
+import time
+from pydantic import BaseModel
+from common.metrics import REGISTRY
+from common.usage import Usage
+
+CALL_SECONDS = REGISTRY.histogram("a2a_model_call_seconds", "Model call latency per call site and tier.", ["agent", "site", "tier"])
+TIER_TOKENS = REGISTRY.counter("a2a_model_tokens_total", "Model tokens per tier.", ["agent", "tier", "kind"])
+COST = REGISTRY.counter("a2a_model_cost_usd_total", "Model cost per tier, from MODEL_PRICES.", ["agent", "tier"])
+ESCALATIONS = REGISTRY.counter("a2a_model_escalations_total", "Calls repeated on a larger tier after an unreliable answer.", ["agent", "site", "tier"])
+
+SITE_DEFAULTS = {"termination": "small", "extraction": "large", "devops": "small", "github": "large"}
+
+class ModelTier(BaseModel):
+    name: str
+    deployment: str | None = None
+    prompt_price: float = 0.0
+    completion_price: float = 0.0
+
+    def cost(self, usage: Usage) -> float:
+        return (usage.prompt_tokens * self.prompt_price + usage.completion_tokens * self.completion_price) / 1e6
+
+def _pairs(value: str) -> dict[str, str]:
+    return dict(item.split("=", 1) for item in (part.strip() for part in value.split(",")) if "=" in item)
+
+class ModelRouter:
+    def __init__(self, agent: str, tiers: list[ModelTier], routes: dict[str, str] | None = None, min_confidence: float = 0.8):
+        self.agent = agent
+        self.tiers = tiers
+        self.routes = routes or {}
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def from_env(cls, agent: str) -> "ModelRouter":
+        prices = {name: value.split("/") for name, value in _pairs(os.environ.get("MODEL_PRICES", "")).items()}
+        tiers = [ModelTier(name=name, deployment=deployment, **dict(zip(("prompt_price", "completion_price"), map(float, prices.get(name, [])))))
+                 for name, deployment in _pairs(os.environ.get("MODEL_TIERS", "")).items()]
+        if not tiers:
+            tiers = [ModelTier(name="default", **dict(zip(("prompt_price", "completion_price"), map(float, prices.get("default", [])))))]
+        return cls(agent, tiers, _pairs(os.environ.get("MODEL_ROUTES", "")), float(os.environ.get("MODEL_MIN_CONFIDENCE", "0.8")))
+
+    def tier(self, site: str) -> ModelTier:
+        name = self.routes.get(site, SITE_DEFAULTS.get(site))
+        return next((tier for tier in self.tiers if tier.name == name), self.tiers[-1])
+
+    def escalates(self, site: str) -> bool:
+        return self.larger(self.tier(site)) is not None
+
+    def larger(self, tier: ModelTier) -> ModelTier | None:
+        index = self.tiers.index(tier)
+        return self.tiers[index + 1] if index + 1 < len(self.tiers) else None
+
+    def observe(self, site: str, tier: ModelTier, seconds: float, usage=None):
+        CALL_SECONDS.observe(seconds, self.agent, site, tier.name)
+        usage = Usage.of(usage)
+        if usage:
+            TIER_TOKENS.inc(self.agent, tier.name, "prompt", amount=usage.prompt_tokens)
+            TIER_TOKENS.inc(self.agent, tier.name, "completion", amount=usage.completion_tokens)
+            COST.inc(self.agent, tier.name, amount=tier.cost(usage))
+
+    async def call(self, site: str, fn, confident=None, usage=lambda result: getattr(result, 'usage', None)):
+        """Runs `fn(tier)` on the site's tier, then on larger tiers while `confident(result)` says no."""
+        tier = self.tier(site)
+        while True:
+            start = time.perf_counter()
+            result = await fn(tier)
+            self.observe(site, tier, time.perf_counter() - start, usage(result))
+            larger = self.larger(tier)
+            if confident is None or larger is None or confident(result):
+                return result
+            ESCALATIONS.inc(self.agent, site, tier.name)
+            tier = larger
@@ -0,0 +1,111 @@
+"""Non-blocking message/send with push notifications for the agent servers.
+
+With `configuration.blocking = false`, message/send returns the submitted Task right away. The work
+continues in the background, and every status change is POSTed as a Task snapshot to the request's
+`pushNotificationConfig.url`. The caller's token goes in the X-A2A-Notification-Token header. Blocking
+requests behave exactly as before.
+"""
+import asyncio
+import logging
+import httpx
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.server.tasks import InMemoryPushNotificationConfigStore, InMemoryTaskStore, PushNotificationConfigStore, PushNotificationSender
+from a2a.types import Message, PushNotificationConfig, Task, TaskArtifactUpdateEvent, TaskState, TaskStatus, TaskStatusUpdateEvent
+from a2a.utils import new_agent_text_message
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = "X-A2A-Notification-Token"
+TERMINAL_STATES = (TaskState.completed, TaskState.failed, TaskState.canceled, TaskState.rejected)
+
+NOTIFICATIONS = REGISTRY.counter("a2a_push_notifications_total", "Task push notifications by outcome.", ["outcome"])
+BACKGROUND_TASKS = REGISTRY.gauge("a2a_background_tasks", "Non-blocking tasks still running after their message/send returned.")
+
+class TokenPushNotificationSender(PushNotificationSender):
+    def __init__(self, client: httpx.AsyncClient, config_store: PushNotificationConfigStore):
+        self.client = client
+        self.config_store = config_store
+
+    async def send_notification(self, task: Task) -> None:
+        configs = await self.config_store.get_info(task.id)
+        await asyncio.gather(*(self._post(task, config) for config in configs))
+
+    async def forget(self, task_id: str):
+        """Drops the task's push configs once it has finished, so the store only holds running tasks."""
+        for config in await self.config_store.get_info(task_id):
+            await self.config_store.delete_info(task_id, config.id)
+
+    async def _post(self, task: Task, config: PushNotificationConfig):
+        try:
+            response = await self.client.post(config.url, json=task.model_dump(mode="json", exclude_none=True),
+                                              headers={TOKEN_HEADER: config.token} if config.token else None)
+            response.raise_for_status()
+        except Exception as e:
+            NOTIFICATIONS.inc("error")
+            logger.warning(f"Push notification for task {task.id} to {config.url} failed: {e}")
+            return
+        NOTIFICATIONS.inc("sent")
+
+class NonBlockingRequestHandler(DefaultRequestHandler):
+    """Built only on the handler's public methods: a non-blocking send is a message/stream whose first event is returned."""
+
+    def __init__(self, agent_executor, task_store=None):
+        push_config_store = InMemoryPushNotificationConfigStore()
+        self.push_sender = TokenPushNotificationSender(httpx.AsyncClient(timeout=10.0), push_config_store)
+        super().__init__(
+            agent_executor=agent_executor,
+            task_store=task_store or InMemoryTaskStore(),
+            push_config_store=push_config_store,
+            push_sender=self.push_sender,
+        )
+        self._background = set()
+        BACKGROUND_TASKS.set_function(lambda: len(self._background))
+
+    @property
+    def background(self) -> set:
+        """Non-blocking tasks still running after their message/send returned."""
+        return self._background
+
+    async def on_message_send(self, params, context=None) -> Message | Task:
+        if not params.configuration or params.configuration.blocking is not False:
+            result = await super().on_message_send(params, context)
+            if isinstance(result, Task) and result.status.state in TERMINAL_STATES:
+                await self.push_sender.forget(result.id)
+            return result
+
+        # The stream stores the push config and sends a notification before yielding each event.
+        events = self.on_message_send_stream(params, context)
+        try:
+            # Executors enqueue the submitted Task before any backend work, so this returns at once.
+            first = await anext(events)
+        except BaseException:
+            await events.aclose()
+            raise
+        if isinstance(first, Message):
+            await events.aclose()
+            return first
+
+        task_id = first.taskId if isinstance(first, TaskStatusUpdateEvent | TaskArtifactUpdateEvent) else first.id
+        background = asyncio.create_task(self._finish(events, task_id))
+        self._background.add(background)
+        background.add_done_callback(self._background.discard)
+        return await self.task_store.get(task_id) or first
+
+    async def _finish(self, events, task_id: str):
+        try:
+            async for _ in events:
+                pass
+        except Exception as e:
+            # Nobody is waiting on the response anymore (e.g. admission rejected the request), so record it on the task.
+            logger.error(f"Background task {task_id} failed: {e}")
+            task = await self.task_store.get(task_id)
+            if task and task.status.state not in TERMINAL_STATES:
+                task.status = TaskStatus(state=TaskState.failed, message=new_agent_text_message(f"Error: {getattr(e, 'error', e)}", task.contextId, task_id))
+                await self.task_store.save(task)
+                await self.push_sender.send_notification(task)
+        finally:
+            await events.aclose()
+            task = await self.task_store.get(task_id)
+            if task and task.status.state in TERMINAL_STATES:
+                await self.push_sender.forget(task_id)
@@ -0,0 +1,109 @@
+"""Background backend setup so an agent binds its port and serves its card immediately.
+
+Setup steps, which import the SDKs, build clients and create Foundry agents, run after uvicorn has
+started. `/ready` reports their progress: 200 once every required step succeeded, 503 while starting
+or after a failure, and also 503 while the agent sheds load. Requests that arrive early wait for
+setup instead of failing.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from common.debug import LoopMonitor
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = REGISTRY.gauge("a2a_startup_step_seconds", "Duration of each background setup step.", ["agent", "step"])
+
+class Readiness:
+    def __init__(self, agent: str, timeout: float | None = None):
+        self.agent = agent
+        self.timeout = timeout if timeout is not None else float(os.environ.get("READY_TIMEOUT", "120"))
+        self.state = "starting"
+        self.error = None
+        self.steps = []
+        self.timings = {}
+        self._shutdown = []
+        # The executor's AdmissionController, set by common/server.py, so /ready can report a saturated agent.
+        self.admission = None
+        self._done = None
+        self._started = time.perf_counter()
+
+    def add_step(self, name: str, fn, required: bool = True):
+        """Adds a setup step. Sync steps run in a worker thread so they never block the event loop."""
+        self.steps.append((name, fn, required))
+
+    def on_shutdown(self, fn, first: bool = False):
+        if first:
+            self._shutdown.insert(0, fn)
+        else:
+            self._shutdown.append(fn)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def _call(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            return await fn()
+        return await asyncio.to_thread(fn)
+
+    async def run(self):
+        for name, fn, required in self.steps:
+            start = time.perf_counter()
+            try:
+                await self._call(fn)
+            except Exception as e:
+                logger.error(f"Setup step {name} failed: {e}")
+                if required:
+                    self.state, self.error = "failed", f"{name}: {e}"
+                    break
+            finally:
+                self.timings[name] = round(time.perf_counter() - start, 3)
+                STARTUP_SECONDS.set(self.timings[name], self.agent, name)
+        else:
+            self.state = "ready"
+            logger.info(f"{self.agent} ready after {time.perf_counter() - self._started:.2f}s")
+        self._done.set()
+
+    async def wait(self) -> bool:
+        """Waits for setup to finish (up to `timeout`) and returns whether the agent is ready."""
+        if self._done is None:
+            return self.ready
+        try:
+            await asyncio.wait_for(self._done.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.ready
+
+    @asynccontextmanager
+    async def lifespan(self, app):
+        self._done = asyncio.Event()
+        # Every agent server runs this lifespan, so the loop watchdog is always on, see common/debug.py.
+        monitor = LoopMonitor.from_env(self.agent)
+        monitor.start()
+        task = asyncio.create_task(self.run())
+        yield
+        task.cancel()
+        monitor.stop()
+        for fn in self._shutdown:
+            try:
+                await self._call(fn)
+            except Exception as e:
+                logger.warning(f"Shutdown hook failed: {e}")
+
+    async def endpoint(self, request):
+        saturated = self.ready and self.admission is not None and self.admission.full
+        body = {"status": "saturated" if saturated else self.state, "steps": self.timings, "uptime": round(time.perf_counter() - self._started, 3)}
+        if self.error:
+            body["error"] = self.error
+        # Saturated is still ready: a router keeps the agent's conversations on it, and LoadSheddingMiddleware sheds the excess.
+        return JSONResponse(body, status_code=200 if self.ready else 503)
+
+    def route(self, path: str = "/ready") -> Route:
+        return Route(path, self.endpoint, methods=["GET"], name="ready")
@@ -0,0 +1,147 @@
+"""Retries for backend calls that fail with 429/5xx.
+
+Waits honor `Retry-After` / `retry-after-ms` when the backend sends them and otherwise use full-jitter
+exponential backoff. A per-executor retry budget caps retries to a fraction of first attempts, so a
+backend that is down does not get hit with several times the normal load. Calls that must not run twice
+go through `call_unsent`, which only retries failures that show the backend never took the request.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# A 5xx or a timeout can come after the backend committed the request; these can't.
+UNSENT_STATUS = {429}
+# Foundry reports throttling inside a failed run rather than as an HTTP error.
+RETRYABLE_RUN_ERRORS = {"rate_limit_exceeded": 429, "server_error": 500}
+
+RETRIES = REGISTRY.counter("a2a_backend_retries_total", "Backend call retries by outcome (retried, budget_exhausted, gave_up).", ["agent", "stage", "outcome"])
+
+class RunFailedError(Exception):
+    """Raised for a failed Foundry run so a transient failure can be retried like an HTTP error."""
+
+    def __init__(self, last_error):
+        code = last_error.get("code") if isinstance(last_error, dict) else getattr(last_error, "code", None)
+        super().__init__(f"Run failed: {last_error}")
+        self.last_error = last_error
+        self.status_code = RETRYABLE_RUN_ERRORS.get(code)
+
+def status_code(error: Exception) -> int | None:
+    # azure-core and openai use status_code, aiohttp (Copilot Studio) uses status, httpx keeps it on the response.
+    status = getattr(error, "status_code", None) or getattr(error, "status", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def retryable(error: Exception) -> bool:
+    return status_code(error) in RETRYABLE_STATUS
+
+def unsent(error: Exception) -> bool:
+    return status_code(error) in UNSENT_STATUS or isinstance(error, (httpx.ConnectError, ConnectionRefusedError))
+
+def retry_after(error: Exception) -> float | None:
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") or headers.get("Retry-After-Ms"):
+            return float(headers.get("retry-after-ms") or headers.get("Retry-After-Ms")) / 1000
+        value = headers.get("Retry-After") or headers.get("retry-after")
+    except AttributeError:
+        return None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+class RetryBudget:
+    """Token bucket: each first attempt deposits `ratio` tokens, each retry spends one."""
+
+    def __init__(self, ratio: float = 0.2, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class RetryPolicy:
+    def __init__(self, agent: str, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 20.0, budget: RetryBudget | None = None):
+        self.agent = agent
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+
+    @classmethod
+    def from_env(cls, agent: str) -> "RetryPolicy":
+        return cls(
+            agent,
+            max_attempts=int(os.environ.get("RETRY_MAX_ATTEMPTS", 4)),
+            base_delay=float(os.environ.get("RETRY_BASE_DELAY", 0.5)),
+            max_delay=float(os.environ.get("RETRY_MAX_DELAY", 20.0)),
+            budget=RetryBudget(ratio=float(os.environ.get("RETRY_BUDGET_RATIO", 0.2))),
+        )
+
+    def delay(self, attempt: int, error: Exception) -> float | None:
+        """Seconds to wait before the next attempt, or None when the server asks for longer than max_delay."""
+        hinted = retry_after(error)
+        if hinted is None:
+            return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if hinted > self.max_delay:
+            return None
+        # Add a little jitter on top of the server's hint so waiting callers do not return in lockstep.
+        return hinted + random.uniform(0, self.base_delay)
+
+    async def call(self, stage: str, fn, *args, **kwargs):
+        """Calls fn (sync or async) and retries transient failures within the budget."""
+        return await self._call(stage, retryable, fn, args, kwargs)
+
+    async def call_unsent(self, stage: str, fn, *args, **kwargs):
+        """Like call, for requests that are not idempotent: retries only throttling and refused connections."""
+        return await self._call(stage, unsent, fn, args, kwargs)
+
+    async def call_run(self, stage: str, fn, *args, **kwargs):
+        """For a whole Foundry run: retries only a run that failed with a retryable code, never an error from a call inside it."""
+        return await self._call(stage, lambda e: isinstance(e, RunFailedError) and retryable(e), fn, args, kwargs)
+
+    async def _call(self, stage: str, should_retry, fn, args, kwargs):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                result = fn(*args, **kwargs)
+                return await result if inspect.isawaitable(result) else result
+            except Exception as e:
+                if not should_retry(e):
+                    raise
+                attempt += 1
+                wait = self.delay(attempt - 1, e)
+                if attempt >= self.max_attempts or wait is None:
+                    RETRIES.inc(self.agent, stage, "gave_up")
+                    raise
+                if not self.budget.withdraw():
+                    RETRIES.inc(self.agent, stage, "budget_exhausted")
+                    raise
+                RETRIES.inc(self.agent, stage, "retried")
+                logger.warning(f"{stage} failed with {status_code(e) or type(e).__name__}, retrying in {wait:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+                await asyncio.sleep(wait)
@@ -0,0 +1,122 @@
+"""Shared bootstrap for the agent servers: card, A2A app with the common routes, and a tuned uvicorn.
+
+`SERVER_PROFILE=performance` (the default) runs uvicorn on uvloop and the httptools parser when they
+are installed, without per-request access logs. It keeps idle connections open for `SERVER_KEEP_ALIVE`
+seconds (default 75, longer than the callers' pools keep them) and uses a listen backlog of
+`SERVER_BACKLOG` (default 4096). It answers 503 beyond `SERVER_LIMIT_CONCURRENCY` open connections
+(default 1000; admission control still limits the work itself). On shutdown it stops accepting, then
+gives in-flight requests and non-blocking tasks `SERVER_DRAIN_TIMEOUT` seconds to finish (default 30).
+`SERVER_PROFILE=default` runs uvicorn with its stock settings. Either way there is one process per agent,
+because sessions live in memory; `router/main.py` scales out.
+
+Responses are serialised by pydantic's Rust encoder straight to bytes, rather than dumped to a dict and
+encoded again by `json.dumps`. That replaces a private method of the sdk's app, so it is only done on the
+a2a-sdk version pinned in requirements.txt; any other version logs a warning and keeps the stock encoder.
+The agent card never changes, so it is encoded only once and served by its own route.
+"""
+import asyncio
+import functools
+import importlib.metadata
+import importlib.util
+import logging
+import os
+from collections.abc import AsyncGenerator
+import uvicorn
+from a2a.server.apps import A2AStarletteApplication
+from a2a.types import AgentCapabilities, AgentCard, JSONRPCErrorResponse
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH
+from starlette.middleware import Middleware
+from starlette.responses import Response
+from starlette.routing import Route
+from common.admission import LoadSheddingMiddleware
+from common.debug import debug_routes
+from common.metrics import metrics_route
+from common.push import NonBlockingRequestHandler
+
+logger = logging.getLogger(__name__)
+
+# The version FastA2AApplication was written against, keep in step with requirements.txt.
+SDK_VERSION = "0.2.11"
+
+def agent_card(name: str, description: str, port: int) -> AgentCard:
+    return AgentCard(
+        name=name,
+        description=description,
+        capabilities=AgentCapabilities(streaming=False, pushNotifications=True),
+        url=f'http://localhost:{port}/',
+        version='1.0.0',
+        defaultInputModes=['text'],
+        defaultOutputModes=['text'],
+        skills=[],
+    )
+
+class JSONResponse(Response):
+    media_type = "application/json"
+
+class FastA2AApplication(A2AStarletteApplication):
+    def _create_response(self, handler_result) -> Response:
+        if isinstance(handler_result, AsyncGenerator):
+            return super()._create_response(handler_result)
+        if isinstance(handler_result, JSONRPCErrorResponse):
+            return JSONResponse(handler_result.model_dump_json(exclude_none=True))
+        return JSONResponse(handler_result.root.model_dump_json(exclude_none=True))
+
+def card_route(card: AgentCard, path: str = AGENT_CARD_WELL_KNOWN_PATH) -> Route:
+    """Listed before the sdk's routes, so it answers for the card instead of the sdk's handler."""
+    card_json = card.model_dump_json(exclude_none=True, by_alias=True)
+
+    async def get_card(request) -> Response:
+        return JSONResponse(card_json)
+    return Route(path, get_card, methods=["GET"], name="agent_card")
+
+def app_class() -> type[A2AStarletteApplication]:
+    try:
+        version = importlib.metadata.version("a2a-sdk")
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    if version == SDK_VERSION:
+        return FastA2AApplication
+    logger.warning(f"a2a-sdk {version} is not the tested {SDK_VERSION}, using the sdk's own response encoding")
+    return A2AStarletteApplication
+
+def drain_timeout() -> float:
+    return float(os.environ.get("SERVER_DRAIN_TIMEOUT", "30"))
+
+async def _drain(handler: NonBlockingRequestHandler, timeout: float):
+    if handler.background:
+        logger.info(f"Waiting up to {timeout:.0f}s for {len(handler.background)} background tasks")
+        await asyncio.wait(set(handler.background), timeout=timeout)
+
+def build_app(card: AgentCard, executor, routes=()):
+    """The A2A app with /metrics, /ready, the debug routes and load shedding, for an executor with `readiness` and `admission`."""
+    handler = NonBlockingRequestHandler(executor)
+    executor.readiness.on_shutdown(functools.partial(_drain, handler, drain_timeout()), first=True)
+    executor.readiness.admission = executor.admission
+    server = app_class()(agent_card=card, http_handler=handler)
+    return server.build(
+        routes=[card_route(card), metrics_route(), executor.readiness.route(), *debug_routes(), *routes],
+        middleware=[Middleware(LoadSheddingMiddleware, controller=executor.admission)],
+        lifespan=executor.readiness.lifespan,
+    )
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def server_options() -> dict:
+    if os.environ.get("SERVER_PROFILE", "performance") == "default":
+        return {}
+    concurrency = int(os.environ.get("SERVER_LIMIT_CONCURRENCY", "1000"))
+    return {
+        "loop": "uvloop" if _installed("uvloop") else "asyncio",
+        "http": "httptools" if _installed("httptools") else "h11",
+        "timeout_keep_alive": int(os.environ.get("SERVER_KEEP_ALIVE", "75")),
+        "backlog": int(os.environ.get("SERVER_BACKLOG", "4096")),
+        "limit_concurrency": concurrency or None,
+        "timeout_graceful_shutdown": int(drain_timeout()),
+        "access_log": os.environ.get("SERVER_ACCESS_LOG") == "1",
+    }
+
+def serve(app, port: int):
+    options = server_options()
+    logger.info(f"Serving on port {port} ({', '.join(f'{key}={value}' for key, value in options.items()) or 'uvicorn defaults'})")
+    uvicorn.run(app, host=os.environ.get("HOST", "0.0.0.0"), port=port, **options)
@@ -0,0 +1,91 @@
+"""Per-task bookkeeping so `cancel()` can stop the backend work behind a running request.
+
+Executors report their work as an A2A Task: submitted, then completed, failed or canceled. The Task
+is written to the task store right away, so `tasks/cancel` can find it while the request is still
+running. On cancel, the registered callbacks run first, e.g. `runs.cancel` for a Foundry run. Then
+DefaultRequestHandler cancels the executor coroutine, which interrupts any in-flight `await` (HTTP call,
+polling sleep or admission wait). `TaskTracker.start` turns that into a final `canceled` status.
+"""
+import asyncio
+import inspect
+import logging
+from contextlib import asynccontextmanager
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events.event_queue import EventQueue
+from a2a.server.tasks import TaskUpdater
+from a2a.types import Part, TaskNotCancelableError, TextPart
+from a2a.utils import new_task
+from a2a.utils.errors import ServerError
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CANCELLATIONS = REGISTRY.counter("a2a_task_cancellations_total", "Cancel requests by outcome (cancelled, not_running).", ["agent", "outcome"])
+
+class RunningTask:
+    def __init__(self, task_id: str, context_id: str, event_queue: EventQueue):
+        self.task_id = task_id
+        self.context_id = context_id
+        self.updater = TaskUpdater(event_queue, task_id, context_id)
+        self.cancelled = False
+        self.finished = False
+        # Sent as the reply Message metadata, e.g. {"usage": ...} from common/usage.py.
+        self.metadata = {}
+        self._cancel_callbacks = []
+
+    def on_cancel(self, callback):
+        """Registers a sync or async callable that stops remote work, e.g. a Foundry run."""
+        self._cancel_callbacks.append(callback)
+
+    def _message(self, text: str, *parts: Part):
+        return self.updater.new_agent_message([Part(root=TextPart(text=text)), *parts], metadata=self.metadata or None)
+
+    async def reply(self, text: str, *parts: Part):
+        """Completes the task; extra parts, e.g. a DataPart from common/work_items.py, follow the text."""
+        self.finished = True
+        await self.updater.complete(self._message(text, *parts))
+
+    async def fail(self, text: str):
+        self.finished = True
+        await self.updater.failed(self._message(text))
+
+    async def stop_backend(self):
+        for callback in self._cancel_callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Cancelling backend work for task {self.task_id} failed: {e}")
+
+class TaskTracker:
+    def __init__(self, agent: str):
+        self.agent = agent
+        self.running: dict[str, RunningTask] = {}
+
+    @asynccontextmanager
+    async def start(self, context: RequestContext, event_queue: EventQueue):
+        if not context.current_task:
+            await event_queue.enqueue_event(new_task(context.message))
+        running = RunningTask(context.task_id, context.context_id, event_queue)
+        self.running[running.task_id] = running
+        try:
+            yield running
+        except asyncio.CancelledError:
+            if not running.cancelled:
+                raise
+            # Cancelled through tasks/cancel: finish the task instead of leaving it open for the caller.
+            if not running.finished:
+                running.finished = True
+                await running.updater.cancel(running._message("Cancelled."))
+        finally:
+            self.running.pop(running.task_id, None)
+
+    async def cancel(self, context: RequestContext):
+        running = self.running.get(context.task_id)
+        if not running or running.finished:
+            CANCELLATIONS.inc(self.agent, "not_running")
+            raise ServerError(error=TaskNotCancelableError(message=f"Task {context.task_id} is not running"))
+        CANCELLATIONS.inc(self.agent, "cancelled")
+        running.cancelled = True
+        await running.stop_backend()
@@ -0,0 +1,95 @@
+"""Pre-created Foundry threads so the first turn of a new conversation skips `threads.create`.
+
+A background task keeps `target_size` unused threads ready and replaces ones older than `max_age`.
+Taking a thread never waits: an empty pool means the caller creates one on demand as before.
+Threads still unused at shutdown are deleted.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+POOL_TAKES = REGISTRY.counter("a2a_thread_pool_takes_total", "New conversations served from the thread pool (hit) or not (miss).", ["agent", "outcome"])
+POOL_SIZE = REGISTRY.gauge("a2a_thread_pool_size", "Pre-created threads waiting in the pool.", ["agent"])
+
+class ThreadPool:
+    def __init__(self, agent: str, create, delete, target_size: int = 4, max_age: float = 1800.0, retry_delay: float = 5.0):
+        self.agent = agent
+        self.create = create
+        self.delete = delete
+        self.target_size = target_size
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self._threads = deque()
+        self._wanted = None
+        self._task = None
+        POOL_SIZE.set_function(lambda: len(self._threads), agent)
+
+    @classmethod
+    def from_env(cls, agent: str, create, delete) -> "ThreadPool":
+        return cls(agent, create, delete,
+                   target_size=int(os.environ.get("THREAD_POOL_SIZE", 4)),
+                   max_age=float(os.environ.get("THREAD_POOL_MAX_AGE", 1800)))
+
+    async def start(self):
+        if self.target_size > 0 and self._task is None:
+            self._wanted = asyncio.Event()
+            self._task = asyncio.create_task(self._refill())
+
+    def take(self):
+        """Returns a ready thread, or None when the pool is empty or disabled."""
+        self._expire()
+        if self._threads:
+            thread, _ = self._threads.popleft()
+            POOL_TAKES.inc(self.agent, "hit")
+        else:
+            thread = None
+            POOL_TAKES.inc(self.agent, "miss")
+        if self._wanted:
+            self._wanted.set()
+        return thread
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.max_age
+        while self._threads and self._threads[0][1] < cutoff:
+            thread, _ = self._threads.popleft()
+            asyncio.get_running_loop().create_task(self._delete(thread))
+
+    async def _delete(self, thread):
+        try:
+            await asyncio.to_thread(self.delete, thread.id)
+        except Exception as e:
+            logger.warning(f"Deleting pooled thread {thread.id} failed: {e}")
+
+    async def _refill(self):
+        while True:
+            self._expire()
+            while len(self._threads) < self.target_size:
+                try:
+                    thread = await asyncio.to_thread(self.create)
+                except Exception as e:
+                    logger.warning(f"Pre-creating a thread failed, retrying in {self.retry_delay}s: {e}")
+                    await asyncio.sleep(self.retry_delay)
+                    continue
+                self._threads.append((thread, time.monotonic()))
+            self._wanted.clear()
+            # Wake up when a thread is taken, or in time to replace the oldest one before it expires.
+            timeout = self._threads[0][1] + self.max_age - time.monotonic() if self._threads else None
+            try:
+                await asyncio.wait_for(self._wanted.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        threads = [thread for thread, _ in self._threads]
+        self._threads.clear()
+        if threads:
+            await asyncio.gather(*(self._delete(thread) for thread in threads))
+            logger.info(f"Deleted {len(threads)} unused pooled threads")
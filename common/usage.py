@@ -0,0 +1,99 @@
+"""Token usage per context (agents) or per workflow (group chat), with optional budgets.
+
+Executors record the usage their backend reports (Responses API `usage`, Foundry `run.usage`) under
+the request's contextId and attach it to the reply as Message metadata `{"usage": {...}}`, so the
+caller can add it up across agents. A caller may send `{"token_budget": n}` in the request Message
+metadata. The request then gets at most the smaller of that and what is left of the context budget
+(`TOKEN_BUDGET`, unset means unlimited). That limit caps the completion tokens of the model call, and
+a request with nothing left fails before it reaches the model. Prompt tokens are only known afterwards,
+so a call can go over by its own prompt.
+"""
+import os
+import threading
+from collections import OrderedDict
+from pydantic import BaseModel
+from common.metrics import REGISTRY
+
+USAGE = "usage"
+TOKEN_BUDGET = "token_budget"
+
+TOKENS = REGISTRY.counter("a2a_tokens_total", "Model tokens reported by the backend.", ["agent", "kind"])
+EXHAUSTED = REGISTRY.counter("a2a_token_budget_exhausted_total", "Requests refused because their token budget was used up.", ["agent"])
+
+class BudgetExhaustedError(Exception):
+    pass
+
+class Usage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "Usage") -> "Usage":
+        return Usage(prompt_tokens=self.prompt_tokens + other.prompt_tokens, completion_tokens=self.completion_tokens + other.completion_tokens)
+
+    @classmethod
+    def of(cls, value) -> "Usage | None":
+        """Reads OpenAI/Foundry usage objects (prompt/completion or input/output tokens) and metadata dicts."""
+        if value is None:
+            return None
+        get = value.get if isinstance(value, dict) else lambda name: getattr(value, name, None)
+        prompt, completion = get("prompt_tokens"), get("completion_tokens")
+        if prompt is None and completion is None:
+            prompt, completion = get("input_tokens"), get("output_tokens")
+        if prompt is None and completion is None:
+            return None
+        return cls(prompt_tokens=prompt or 0, completion_tokens=completion or 0)
+
+def token_budget(message) -> int | None:
+    """The caller's budget for one request, from the A2A Message metadata."""
+    value = (getattr(message, 'metadata', None) or {}).get(TOKEN_BUDGET)
+    return int(value) if value is not None else None
+
+class UsageLedger:
+    def __init__(self, agent: str, budget: int | None = None, max_keys: int = 10000):
+        self.agent = agent
+        self.budget = budget
+        self.max_keys = max_keys
+        self._totals: OrderedDict[str, Usage] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, agent: str, variable: str = "TOKEN_BUDGET") -> "UsageLedger":
+        budget = os.environ.get(variable)
+        return cls(agent, budget=int(budget) if budget else None)
+
+    def record(self, key: str, usage) -> Usage | None:
+        """Adds a backend usage object to the key's total and returns it as Usage (None if the backend reported none)."""
+        usage = Usage.of(usage)
+        if usage is None:
+            return None
+        TOKENS.inc(self.agent, "prompt", amount=usage.prompt_tokens)
+        TOKENS.inc(self.agent, "completion", amount=usage.completion_tokens)
+        with self._lock:
+            self._totals[key] = self._totals.get(key, Usage()) + usage
+            self._totals.move_to_end(key)
+            # Old contexts fall out first; their tokens stay in the counters.
+            while len(self._totals) > self.max_keys:
+                self._totals.popitem(last=False)
+        return usage
+
+    def total(self, key: str) -> Usage:
+        with self._lock:
+            return self._totals.get(key, Usage())
+
+    def remaining(self, key: str, limit: int | None = None) -> int | None:
+        """Tokens left for the key, also bounded by a per-request limit; None means unlimited."""
+        left = None if self.budget is None else self.budget - self.total(key).total_tokens
+        if limit is not None:
+            left = limit if left is None else min(left, limit)
+        return None if left is None else max(0, left)
+
+    def limit(self, key: str, message=None) -> int | None:
+        """Completion tokens a request may use: 0 means refuse it, None means no cap."""
+        left = self.remaining(key, token_budget(message))
+        if left == 0:
+            EXHAUSTED.inc(self.agent)
+        return left
@@ -0,0 +1,83 @@
+"""Typed todos and work items that agents exchange as A2A DataParts next to their prose reply.
+
+Each agent parses its own LLM output once, then attaches the result as `{"kind": ..., "items": [...]}`.
+The next agent reads the items directly instead of re-parsing the previous agent's text. The text part
+stays for people and for agents that don't know the schema.
+"""
+import re
+from a2a.types import DataPart, Part, TextPart
+from pydantic import BaseModel
+
+TODOS = "todos"
+WORK_ITEMS = "work_items"
+CREATED = "created_work_items"
+FORMAT_RESULTS = "format_results"
+
+LIST_ITEM = re.compile(r"^\s*(?:\d+[.)]|[-*])\s+(.+)$", re.MULTILINE)
+ASSIGNEE = re.compile(r"\s*\((?:Assigned to|Owner|Assignee):\s*(.+?)\)", re.IGNORECASE)
+FIELD = re.compile(r"^\s*(?:\d+[.)]\s*)?[-*]?\s*\**(Title|Type|Description|Acceptance Criteria|Assigned To)\**\s*:\s*\**\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+CREATED_ID = re.compile(r"#(\d+)")
+
+class Todo(BaseModel):
+    title: str
+    assignee: str | None = None
+
+class WorkItem(BaseModel):
+    title: str
+    type: str = "User Story"
+    description: str = ""
+    acceptance_criteria: str | None = None
+    assignee: str | None = None
+    id: int | None = None
+    url: str | None = None
+
+class FormatResult(BaseModel):
+    """One todo of a batch formatting request: its position in the batch, and the work item or why there is none."""
+    index: int
+    status: str
+    todo: Todo
+    item: WorkItem | None = None
+    error: str | None = None
+
+def data_part(kind: str, items: list[BaseModel]) -> Part:
+    return Part(root=DataPart(data={"kind": kind, "items": [item.model_dump(exclude_none=True) for item in items]}))
+
+def read_items(parts, kind: str, model: type[BaseModel]) -> list | None:
+    """Items of the first DataPart (or its data dict) of this kind, or None when there is none."""
+    for part in parts or []:
+        part = getattr(part, 'root', part)
+        data = part.data if isinstance(part, DataPart) else part if isinstance(part, dict) else {}
+        if data.get("kind") == kind:
+            return [model.model_validate(item) for item in data.get("items", [])]
+    return None
+
+def text_of(parts) -> str:
+    return "\n".join(part.text for part in (getattr(p, 'root', p) for p in parts or []) if isinstance(part, TextPart) and part.text)
+
+def parse_todos(text: str) -> list[Todo]:
+    todos = []
+    for line in LIST_ITEM.findall(text or ""):
+        match = ASSIGNEE.search(line)
+        title = ASSIGNEE.sub("", line).strip(" *")
+        if title:
+            todos.append(Todo(title=title, assignee=match.group(1).strip() if match else None))
+    return todos
+
+def parse_work_items(text: str) -> list[WorkItem]:
+    """Reads `Title: ... Type: ... Description: ...` blocks; a new Title starts the next item."""
+    items, fields = [], {}
+    for name, value in FIELD.findall(text or ""):
+        name = name.lower().replace(" ", "_")
+        if name == "title" and fields:
+            items.append(fields)
+            fields = {}
+        fields["assignee" if name == "assigned_to" else name] = value.strip("* ")
+    if fields.get("title"):
+        items.append(fields)
+    return [WorkItem(**fields) for fields in items if fields.get("title")]
+
+def render_todos(todos: list[Todo]) -> str:
+    return "\n".join(f"{i}. {todo.title}{f' (Assigned to: {todo.assignee})' if todo.assignee else ''}" for i, todo in enumerate(todos, 1))
+
+def render_created(items: list[WorkItem]) -> str:
+    return "Work items created successfully:\n" + "\n".join(f"- #{item.id} {item.title}" if item.id else f"- {item.title}" for item in items)
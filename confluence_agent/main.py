@@ -1,86 +1,235 @@
-import os
-import uvicorn
 import asyncio
+import os
+import sys
 from dotenv import load_dotenv
 from a2a.server.agent_execution import AgentExecutor, RequestContext
-from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events.event_queue import EventQueue
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard
-from a2a.utils import new_agent_text_message
-from openai import AzureOpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from httpx import BasicAuth
 from oauth_auth import get_atlassian_bearer_token
+from sync import SYNC, ConfluencePages, SyncStore
 
 load_dotenv()
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.admission import AdmissionController
+from common.fakes import FakeConfluencePages, FakeResponsesClient, fake_atlassian_token, install_fake_env, use_fake_backends
+from common.metrics import ExecutorMetrics
+from common.models import ModelRouter
+from common.readiness import Readiness
+from common.server import agent_card, build_app, serve
+from common.retry import RetryPolicy
+from common.tasks import RunningTask, TaskTracker
+from common.usage import USAGE, BudgetExhaustedError, Usage, UsageLedger
+from common.work_items import TODOS, data_part, parse_todos, render_todos
+
+SYSTEM_PROMPT = "You are a Confluence assistant. Use MCP tools to search and analyze content."
+
+def _text(response) -> str | None:
+    return next((content.text for output_item in response.output or [] if output_item.type == "message" and output_item.content
+                 for content in output_item.content if hasattr(content, 'text')), None)
+
+def _extraction_error(response, text: str | None) -> str | None:
+    """Why a page's answer can't be trusted to hold all its todos, or None when it can."""
+    failed_fetch = next((item.error for item in response.output or [] if item.type == "mcp_call" and getattr(item, 'error', None)), None)
+    if failed_fetch:
+        return f"page fetch failed: {failed_fetch}"
+    if text is None:
+        return "no answer"
+    if getattr(response, 'status', None) == "incomplete":
+        return "answer was truncated"
+    return None
+
 class ConfluenceA2AExecutor(AgentExecutor):
-    def __init__(self):
+    def __init__(self, client=None, token_provider=get_atlassian_bearer_token, pages=None):
         self.conversations = {}
         self.atlassian_token = None
-        self.client = AzureOpenAI(
-            base_url=f"{os.environ['AZURE_OPENAI_ENDPOINT']}/openai/v1/",
-            azure_ad_token_provider=get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"),
-            api_version="preview"
-        )
+        self.token_provider = token_provider
+        self.metrics = ExecutorMetrics("confluence", sessions=self.conversations)
+        self.admission = AdmissionController.from_env("confluence")
+        self.retry = RetryPolicy.from_env("confluence")
+        self.tasks = TaskTracker("confluence")
+        self.usage = UsageLedger.from_env("confluence")
+        self.models = ModelRouter.from_env("confluence")
+        self.client = client
+        self.pages = pages
+        self.sync_store = None
+        self.sync_concurrency = int(os.environ.get("SYNC_CONCURRENCY", "4"))
+        # Runs in the background once the server is up, see common/readiness.py.
+        # The Atlassian token is only prefetched; requests fetch it themselves if that failed.
+        self.readiness = Readiness("confluence")
+        self.readiness.add_step("openai_client", self._create_client)
+        self.readiness.add_step("oauth_token", self._prefetch_token, required=False)
+
+    def _create_client(self):
+        if self.client is None:
+            from openai import AsyncAzureOpenAI
+            from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+            # Async client: cancelling the request coroutine closes the in-flight HTTP call.
+            self.client = AsyncAzureOpenAI(
+                base_url=f"{os.environ['AZURE_OPENAI_ENDPOINT']}/openai/v1/",
+                azure_ad_token_provider=get_bearer_token_provider(DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"),
+                api_version="preview",
+                max_retries=0,  # retries are handled by self.retry so they count against its budget
+            )
+
+    async def _prefetch_token(self):
+        with self.metrics.stage("oauth_token"):
+            self.atlassian_token = await self.token_provider()
 
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        async with self.tasks.start(context, event_queue) as running:
+            async with self.admission.slot():
+                with self.metrics.request():
+                    await self._execute(context, running)
+
+    async def _execute(self, context: RequestContext, running: RunningTask) -> None:
         try:
+            if not await self.readiness.wait():
+                await running.fail("Agent not initialized")
+                return
+            
             if not self.atlassian_token:
-                self.atlassian_token = await get_atlassian_bearer_token()
+                with self.metrics.stage("oauth_token"):
+                    self.atlassian_token = await self.token_provider()
             
+            limit = self.usage.limit(context.context_id, context.message)
+            if limit == 0:
+                await running.fail("Error: token budget exhausted")
+                return
+
+            space = (context.message.metadata or {}).get(SYNC)
+            if space:
+                await self._sync(context, running, space, limit)
+                return
+
             conversation = self.conversations.get(context.context_id, {})
-            mcp_config = {
-                "type": "mcp", "server_url": os.environ["MCP_SERVER_URL"], "server_label": os.environ["MCP_SERVER_LABEL"],
-                "require_approval": "never", "allowed_tools": ["getConfluencePage"], "headers": {"Authorization": f"Bearer {self.atlassian_token}"}
-            }
-            
             input_data = [{"role": "user", "content": context.get_user_input()}]
             if not conversation.get('last_response_id'):
-                input_data.insert(0, {"role": "system", "content": "You are a Confluence assistant. Use MCP tools to search and analyze content."})
-            
-            response = await asyncio.to_thread(
-                self.client.responses.create,
-                model=os.environ["MODEL_DEPLOYMENT_NAME"],
-                previous_response_id=conversation.get('last_response_id'),
-                input=input_data,
-                tools=[mcp_config]
-            )
+                input_data.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
             
+            response, text, usage = await self._respond(context.context_id, input_data, conversation.get('last_response_id'), limit)
             self.conversations[context.context_id] = {'last_response_id': response.id}
+            if usage:
+                running.metadata[USAGE] = usage.model_dump()
             
-            for output_item in response.output or []:
-                if output_item.type == "message" and output_item.content:
-                    for content in output_item.content:
-                        if hasattr(content, 'text'):
-                            await event_queue.enqueue_event(new_agent_text_message(content.text))
-                            return
+            if text is not None:
+                # Parsed once here, so the formatter gets the todos without re-reading this prose.
+                todos = parse_todos(text)
+                await running.reply(text, *([data_part(TODOS, todos)] if todos else []))
+                return
             
-            await event_queue.enqueue_event(new_agent_text_message("Operation completed."))
+            await running.reply("Operation completed.")
                 
         except Exception as e:
             if "401" in str(e):
                 self.atlassian_token = None
-            await event_queue.enqueue_event(new_agent_text_message(f"Error: {str(e)}"))
+            await running.fail(f"Error: {str(e)}")
+
+    async def _respond(self, context_id: str, input_data: list, previous_response_id: str | None, limit: int | None):
+        mcp_config = {
+            "type": "mcp", "server_url": os.environ["MCP_SERVER_URL"], "server_label": os.environ["MCP_SERVER_LABEL"],
+            "require_approval": "never", "allowed_tools": ["getConfluencePage"], "headers": {"Authorization": f"Bearer {self.atlassian_token}"}
+        }
+        usages = []
+
+        async def create(tier):
+            with self.metrics.stage("responses_create"):
+                response = await self.retry.call(
+                    "responses_create",
+                    self.client.responses.create,
+                    model=tier.deployment or os.environ["MODEL_DEPLOYMENT_NAME"],
+                    previous_response_id=previous_response_id,
+                    input=input_data,
+                    tools=[mcp_config],
+                    # The Responses API rejects caps below 16 tokens.
+                    **({"max_output_tokens": max(limit, 16)} if limit else {}),
+                )
+            usages.append(self.usage.record(context_id, getattr(response, 'usage', None)))
+            # MCP calls run inside the Responses API call, so they are counted here and timed as part of responses_create.
+            for output_item in response.output or []:
+                if output_item.type == "mcp_call":
+                    self.metrics.tool_call(output_item.name, "error" if getattr(output_item, 'error', None) else "ok")
+            return response
+
+        # A truncated or empty answer is retried on a larger tier rather than passed on as "no todos".
+        response = await self.models.call("extraction", create, confident=lambda response: getattr(response, 'status', None) != "incomplete" and _text(response) is not None)
+        usage = sum((usage for usage in usages if usage), Usage()) if any(usages) else None
+        return response, _text(response), usage
+
+    async def _sync(self, context: RequestContext, running: RunningTask, space: str, limit: int | None):
+        if self.pages is None:
+            if not os.environ.get("CONFLUENCE_BASE_URL"):
+                await running.fail("Error: sync needs CONFLUENCE_BASE_URL")
+                return
+            auth = BasicAuth(os.environ["CONFLUENCE_EMAIL"], os.environ["CONFLUENCE_API_TOKEN"]) if os.environ.get("CONFLUENCE_API_TOKEN") else None
+            self.pages = ConfluencePages(os.environ["CONFLUENCE_BASE_URL"], auth=auth, token_provider=self.token_provider)
+        if self.sync_store is None:
+            self.sync_store = SyncStore(os.environ.get("CONFLUENCE_SYNC_DB", "confluence_sync.db"))
+
+        with self.metrics.stage("list_pages"):
+            pages = await self.pages.list(space)
+        changed = await self.sync_store.changed(space, pages)
+        semaphore = asyncio.Semaphore(self.sync_concurrency)
+        # The request's limit covers the whole sync: each page gets what the pages before it left over.
+        left = limit
+
+        async def extract(page):
+            nonlocal left
+            async with semaphore:
+                if left == 0:
+                    raise BudgetExhaustedError("token budget exhausted")
+                # A fresh response chain per page, so one page's content never leaks into another's todos.
+                prompt = f"Give me the content for Confluence page {page.id} ({page.title}) and extract any open todos or action items as a list."
+                response, text, usage = await self._respond(context.context_id, [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}], None, left)
+                if left is not None and usage:
+                    left = max(0, left - usage.total_tokens)
+                return _extraction_error(response, text), parse_todos(text or ""), usage
+
+        results = await asyncio.gather(*(extract(page) for page in changed), return_exceptions=True)
+        new_todos, failed, skipped, total = [], [], 0, Usage()
+        for page, result in zip(changed, results):
+            if isinstance(result, BudgetExhaustedError):
+                # Not marked processed either, so the next sync picks these pages up.
+                skipped += 1
+                continue
+            if isinstance(result, BaseException):
+                failed.append(f"{page.title}: {result}")
+                continue
+            error, todos, usage = result
+            total = total + (usage or Usage())
+            if error:
+                # Not marked processed, so the next sync extracts the page again instead of losing its todos.
+                failed.append(f"{page.title}: {error}")
+                continue
+            new_todos += await self.sync_store.new_todos(page, todos)
+            await self.sync_store.processed(space, page, todos)
+        running.metadata[USAGE] = total.model_dump()
+        if skipped:
+            # The todos found so far are already stored as seen, so they go into the error rather than being dropped.
+            await running.fail(f"Error: token budget exhausted: sync of {space} stopped after {len(changed) - skipped} of {len(changed)} changed pages, "
+                               f"{len(new_todos)} new todos; the other pages are extracted on the next sync."
+                               + (f"\n\n{render_todos(new_todos)}" if new_todos else ""))
+            return
+
+        if changed and len(failed) == len(changed):
+            await running.fail(f"Error: sync of {space} failed for every changed page: " + "; ".join(failed))
+            return
+        summary = f"Synced {space}: {len(changed)} of {len(pages)} pages changed, {len(new_todos)} new todos."
+        if failed:
+            summary += f" {len(failed)} pages failed and are retried on the next sync: " + "; ".join(failed)
+        await running.reply(summary + (f"\n\n{render_todos(new_todos)}" if new_todos else ""), *([data_part(TODOS, new_todos)] if new_todos else []))
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        self.conversations.pop(context.context_id, None)
-        await event_queue.enqueue_event(new_agent_text_message("Cancelled."))
+        await self.tasks.cancel(context)
 
 if __name__ == "__main__":
-    agent_card = AgentCard(name='Confluence MCP Agent', description='AI agent for Confluence documentation using MCP tools.',
-                          capabilities=AgentCapabilities(streaming=False), url='http://localhost:8002/', version='1.0.0',
-                          defaultInputModes=['text'], defaultOutputModes=['text'], skills=[])
-    
-    executor = ConfluenceA2AExecutor()
-    server = A2AStarletteApplication(agent_card=agent_card, http_handler=DefaultRequestHandler(agent_executor=executor, task_store=InMemoryTaskStore()))
-    
-    async def start_server():
-        try:
-            executor.atlassian_token = await get_atlassian_bearer_token()
-        except:
-            pass
-        await uvicorn.Server(uvicorn.Config(server.build(), host='0.0.0.0', port=8002)).serve()
+    port = int(os.environ.get("PORT", 8002))
+    card = agent_card('Confluence MCP Agent', 'AI agent for Confluence documentation using MCP tools.', port)
     
-    asyncio.run(start_server())
\ No newline at end of file
+    if use_fake_backends():
+        install_fake_env()
+        executor = ConfluenceA2AExecutor(client=FakeResponsesClient.from_env(), token_provider=fake_atlassian_token, pages=FakeConfluencePages.from_env())
+    else:
+        executor = ConfluenceA2AExecutor()
+    serve(build_app(card, executor), port)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Incremental sync of a Confluence space: only new or changed pages go through todo extraction.
+
+Page versions come from the Confluence REST API, which is one cheap paged listing per space and no model
+call. The store keeps page id -> last processed version and a fingerprint per todo seen on each page. A
+page is only re-extracted when its version moved, and of its todos only the unseen fingerprints are
+returned. A page is marked processed together with its todos once its extraction succeeded, so a failed
+page is simply tried again on the next run. A request with `{"sync": "<space key>"}` in its Message
+metadata runs a sync of that space.
+"""
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import httpx
+from pydantic import BaseModel
+
+SYNC = "sync"
+
+class Page(BaseModel):
+    id: str
+    title: str
+    version: int
+
+def fingerprint(todo) -> str:
+    # Title only, normalised: re-assigning or re-wording case and punctuation doesn't make it a new todo.
+    title = re.sub(r"[^\w]+", " ", todo.title.lower()).strip()
+    return hashlib.sha256(title.encode()).hexdigest()[:32]
+
+class ConfluencePages:
+    """Lists the pages of a space with their current version via the Confluence v2 REST API."""
+
+    def __init__(self, base_url: str, auth=None, token_provider=None, page_size: int = 250):
+        self.base_url = base_url.rstrip("/")
+        self.auth = auth
+        self.token_provider = token_provider
+        self.page_size = page_size
+
+    async def list(self, space: str) -> list[Page]:
+        headers = {} if self.auth else {"Authorization": f"Bearer {await self.token_provider()}"}
+        async with httpx.AsyncClient(base_url=self.base_url, auth=self.auth, headers=headers, timeout=30) as client:
+            spaces = (await self._get(client, "/api/v2/spaces", keys=space))["results"]
+            if not spaces:
+                raise ValueError(f"Unknown Confluence space: {space}")
+            pages, url, params = [], f"/api/v2/spaces/{spaces[0]['id']}/pages", {"limit": self.page_size, "status": "current"}
+            while url:
+                body = await self._get(client, url, **params)
+                pages += [Page(id=str(page["id"]), title=page["title"], version=page["version"]["number"]) for page in body["results"]]
+                # The next link carries the cursor and is relative to the site, not to /wiki.
+                url, params = body.get("_links", {}).get("next", "").removeprefix("/wiki"), {}
+            return pages
+
+    async def _get(self, client: httpx.AsyncClient, url: str, **params) -> dict:
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+class SyncStore:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                space TEXT NOT NULL, page_id TEXT NOT NULL, version INTEGER NOT NULL, title TEXT, synced REAL NOT NULL,
+                PRIMARY KEY (space, page_id));
+            CREATE TABLE IF NOT EXISTS todos (
+                page_id TEXT NOT NULL, fingerprint TEXT NOT NULL, title TEXT NOT NULL, first_seen REAL NOT NULL,
+                PRIMARY KEY (page_id, fingerprint));
+        """)
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    async def changed(self, space: str, pages: list[Page]) -> list[Page]:
+        """Pages that are new or whose version moved since they were last processed."""
+        rows = await self._run(lambda: self._db.execute("SELECT page_id, version FROM pages WHERE space = ?", (space,)).fetchall())
+        processed = dict(rows)
+        return [page for page in pages if processed.get(page.id, 0) < page.version]
+
+    async def new_todos(self, page: Page, todos: list) -> list:
+        rows = await self._run(lambda: self._db.execute("SELECT fingerprint FROM todos WHERE page_id = ?", (page.id,)).fetchall())
+        seen = {row[0] for row in rows}
+        fresh = []
+        for todo in todos:
+            key = fingerprint(todo)
+            if key not in seen:
+                seen.add(key)
+                fresh.append(todo)
+        return fresh
+
+    async def processed(self, space: str, page: Page, todos: list):
+        """Records the page version and its todos' fingerprints in one transaction."""
+        def write():
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)", (space, page.id, page.version, page.title, now))
+                self._db.executemany("INSERT OR IGNORE INTO todos VALUES (?, ?, ?, ?)",
+                                     [(page.id, fingerprint(todo), todo.title, now) for todo in todos])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        await self._run(write)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,32 @@
+import httpx
+
+WORK_ITEM_TYPES = ("User Story", "Task", "Bug", "Feature", "Epic")
+
+class LogicAppClient:
+    """Calls the work item Logic App directly, the same endpoint the Foundry agent reaches through its OpenAPI tool."""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+        self._http = None
+
+    async def create(self, item):
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.timeout)
+        description = item.description
+        if item.acceptance_criteria:
+            description += f"\n\nAcceptance Criteria: {item.acceptance_criteria}"
+        response = await self._http.post(self.url, json={
+            "title": item.title,
+            "description": description,
+            "workItemType": item.type if item.type in WORK_ITEM_TYPES else "User Story",
+        })
+        response.raise_for_status()
+        body = response.json() if "json" in response.headers.get("content-type", "") else {}
+        body = body if isinstance(body, dict) else {}
+        return item.model_copy(update={"id": body.get("id"), "url": body.get("url")})
+
+    async def close(self):
+        if self._http:
+            await self._http.aclose()
+            self._http = None
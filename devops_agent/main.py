@@ -1,31 +1,59 @@
+import asyncio
 import logging
 import os
-import uvicorn
+import sys
 from dotenv import load_dotenv
 
 load_dotenv()
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
 from a2a.server.agent_execution import AgentExecutor, RequestContext
-from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events.event_queue import EventQueue
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard
-from a2a.utils import new_agent_text_message
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import OpenApiTool, OpenApiAnonymousAuthDetails
+from common.admission import AdmissionController
+from common.fakes import FakeAgentsClient, FakeLogicApp, install_fake_env, use_fake_backends
+from common.metrics import ExecutorMetrics
+from common.models import ModelRouter
+from common.readiness import Readiness
+from common.server import agent_card, build_app, serve
+from common.retry import RetryPolicy, RunFailedError
+from common.tasks import RunningTask, TaskTracker
+from common.thread_pool import ThreadPool
+from common.usage import USAGE, UsageLedger
+from common.work_items import CREATED, WORK_ITEMS, WorkItem, data_part, read_items, render_created
+from logic_app import LogicAppClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DevOpsA2AExecutor(AgentExecutor):
-    def __init__(self):
+    def __init__(self, agents_client=None, logic_app=None):
         self.agent = None
         self.project_client = None
-        self.agents_client = None
+        self.agents_client = agents_client
+        self.logic_app = logic_app
+        # Structured work items go straight to the Logic App instead of through an LLM run.
+        self.direct_create = os.environ.get("DEVOPS_DIRECT_CREATE", "1") != "0"
         self.threads = {}
-        self._setup_azure_client()
+        self.metrics = ExecutorMetrics("devops", sessions=self.threads)
+        self.admission = AdmissionController.from_env("devops")
+        self.retry = RetryPolicy.from_env("devops")
+        self.tasks = TaskTracker("devops")
+        self.usage = UsageLedger.from_env("devops")
+        self.models = ModelRouter.from_env("devops")
+        self.poll_interval = float(os.environ.get("RUN_POLL_INTERVAL", "1.0"))
+        # Runs in the background once the server is up, see common/readiness.py.
+        self.readiness = Readiness("devops")
+        self.readiness.add_step("project_client", self._setup_azure_client)
+        self.readiness.add_step("create_agent", self._create_agent)
+        self.thread_pool = ThreadPool.from_env(
+            "devops",
+            create=lambda: self.agents_client.threads.create(),
+            delete=lambda thread_id: self.agents_client.threads.delete(thread_id),
+        )
+        self.readiness.add_step("thread_pool", self.thread_pool.start, required=False)
+        self.readiness.on_shutdown(self.thread_pool.close)
+        self.readiness.on_shutdown(self._close_logic_app)
 
     def _validate_environment(self):
         required_vars = ["PROJECT_ENDPOINT", "MODEL_DEPLOYMENT_NAME", "LOGIC_APP_URL"]
@@ -79,86 +107,159 @@ class DevOpsA2AExecutor(AgentExecutor):
         return spec
 
     def _setup_azure_client(self):
-        try:
-            self._validate_environment()
-            
+        self._validate_environment()
+        if self.logic_app is None:
+            self.logic_app = LogicAppClient(os.environ["LOGIC_APP_URL"])
+        
+        if self.agents_client is None:
+            from azure.ai.projects import AIProjectClient
+            from azure.identity import DefaultAzureCredential
             self.project_client = AIProjectClient(
                 endpoint=os.environ["PROJECT_ENDPOINT"],
                 credential=DefaultAzureCredential(),
+                retry_total=0,  # retries are handled by self.retry so they count against its budget
             )
             self.agents_client = self.project_client.agents
-            
-            openapi_tool = OpenApiTool(
-                name="create_work_item",
-                spec=self._create_openapi_spec(),
-                description="Create work items in Azure DevOps",
-                auth=OpenApiAnonymousAuthDetails()
-            )
-            
-            self.agent = self.agents_client.create_agent(
-                model=os.environ["MODEL_DEPLOYMENT_NAME"],
-                name="devops-logic-app-agent",
-                instructions="You are an Azure DevOps assistant. Create work items using the create_work_item operation with title, description, and workItemType parameters.",
-                tools=openapi_tool.definitions,
-            )
-            
-        except Exception as e:
-            logger.error(f"Setup failed: {e}")
+
+    def _create_agent(self):
+        from azure.ai.agents.models import OpenApiTool, OpenApiAnonymousAuthDetails
+        openapi_tool = OpenApiTool(
+            name="create_work_item",
+            spec=self._create_openapi_spec(),
+            description="Create work items in Azure DevOps",
+            auth=OpenApiAnonymousAuthDetails()
+        )
+        
+        self.agent = self.agents_client.create_agent(
+            model=os.environ["MODEL_DEPLOYMENT_NAME"],
+            name="devops-logic-app-agent",
+            instructions="You are an Azure DevOps assistant. Create work items using the create_work_item operation with title, description, and workItemType parameters.",
+            tools=openapi_tool.definitions,
+        )
 
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        async with self.tasks.start(context, event_queue) as running:
+            async with self.admission.slot():
+                with self.metrics.request():
+                    await self._execute(context, running)
+
+    async def _process_run(self, running: RunningTask, thread_id: str, limit: int | None = None, tier=None):
+        with self.metrics.stage("runs_create"):
+            # A 5xx or timeout may come after the run started, and a second run could create the work items twice.
+            run = await self.retry.call_unsent("runs_create", asyncio.to_thread, self.agents_client.runs.create, thread_id=thread_id, agent_id=self.agent.id,
+                                               **({"max_completion_tokens": limit} if limit else {}),
+                                               **({"model": tier.deployment} if tier and tier.deployment else {}))
+        running.on_cancel(lambda: asyncio.to_thread(self.agents_client.runs.cancel, thread_id=thread_id, run_id=run.id))
+        # Polled here instead of create_and_process so a cancelled request stops waiting immediately.
+        while run.status in ["queued", "in_progress"]:
+            await asyncio.sleep(self.poll_interval)
+            with self.metrics.stage("runs_get"):
+                run = await self.retry.call("runs_get", asyncio.to_thread, self.agents_client.runs.get, thread_id=thread_id, run_id=run.id)
+        if run.status == "failed":
+            error = RunFailedError(run.last_error)
+            if error.status_code and await self._called_tools(thread_id, run.id):
+                # The create_work_item tool may already have run, and a repeated run would create the work items twice.
+                error.status_code = None
+            raise error
+        return run
+
+    async def _called_tools(self, thread_id: str, run_id: str) -> bool:
+        with self.metrics.stage("run_steps_list"):
+            steps = await self.retry.call("run_steps_list", asyncio.to_thread, lambda: list(self.agents_client.run_steps.list(thread_id=thread_id, run_id=run_id)))
+        return any(step.type == "tool_calls" for step in steps)
+
+    async def _execute(self, context: RequestContext, running: RunningTask) -> None:
         try:
-            if not self.agent:
-                await event_queue.enqueue_event(new_agent_text_message("Agent not initialized"))
+            if not await self.readiness.wait() or not self.agent:
+                await running.fail("Agent not initialized")
+                return
+
+            items = read_items(context.message.parts, WORK_ITEMS, WorkItem)
+            if items and self.direct_create:
+                await self._create_directly(running, items)
+                return
+
+            limit = self.usage.limit(context.context_id, context.message)
+            if limit == 0:
+                await running.fail("Error: token budget exhausted")
                 return
                 
-            thread = self.threads.get(context.context_id)
+            thread = self.threads.get(context.context_id) or self.thread_pool.take()
             if not thread:
-                thread = self.agents_client.threads.create()
-                self.threads[context.context_id] = thread
+                with self.metrics.stage("threads_create"):
+                    thread = await self.retry.call("threads_create", asyncio.to_thread, self.agents_client.threads.create)
+            self.threads[context.context_id] = thread
             
-            self.agents_client.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=context.get_user_input(),
-            )
+            with self.metrics.stage("messages_create"):
+                # Not idempotent: a retry after a 5xx or timeout could post the prompt to the thread twice.
+                await self.retry.call_unsent(
+                    "messages_create",
+                    asyncio.to_thread,
+                    self.agents_client.messages.create,
+                    thread_id=thread.id,
+                    role="user",
+                    content=context.get_user_input(),
+                )
             
-            run = self.agents_client.runs.create_and_process(thread_id=thread.id, agent_id=self.agent.id)
-            
-            if run.status == "failed":
-                await event_queue.enqueue_event(new_agent_text_message(f"Run failed: {run.last_error}"))
-                return
+            # No escalation here: a repeated run could create the work items twice. For the same reason only a
+            # failed run that never called the tool is retried, see _process_run, and not a failed call inside the run.
+            with self.metrics.stage("run"):
+                run = await self.models.call("devops", lambda tier: self.retry.call_run("run", self._process_run, running, thread.id, limit, tier))
+            usage = self.usage.record(context.context_id, getattr(run, 'usage', None))
+            if usage:
+                running.metadata[USAGE] = usage.model_dump()
                     
-            messages = list(self.agents_client.messages.list(thread_id=thread.id))
+            with self.metrics.stage("messages_list"):
+                messages = await self.retry.call("messages_list", asyncio.to_thread, lambda: list(self.agents_client.messages.list(thread_id=thread.id)))
             for msg in reversed(messages):
                 if msg.role == "assistant" and msg.content:
                     for content_item in msg.content:
                         if hasattr(content_item, 'text') and content_item.text:
-                            await event_queue.enqueue_event(new_agent_text_message(content_item.text.value))
+                            await running.reply(content_item.text.value)
                             return
             
-            await event_queue.enqueue_event(new_agent_text_message("No response generated"))
+            await running.reply("No response generated")
                 
+        except RunFailedError as e:
+            await running.fail(str(e))
         except Exception as e:
-            await event_queue.enqueue_event(new_agent_text_message(f"Error: {e}"))
+            await running.fail(f"Error: {e}")
+
+    async def _create_directly(self, running: RunningTask, items: list[WorkItem]):
+        async def create(item):
+            with self.metrics.stage("create_work_item"):
+                try:
+                    # Not idempotent: a timeout or 5xx may come after the Logic App created the item.
+                    created = await self.retry.call_unsent("create_work_item", self.logic_app.create, item)
+                except Exception:
+                    self.metrics.tool_call("create_work_item", "error")
+                    raise
+            self.metrics.tool_call("create_work_item", "ok")
+            return created
+        results = await asyncio.gather(*(create(item) for item in items), return_exceptions=True)
+        created = [result for result in results if isinstance(result, WorkItem)]
+        failed = [f"- {item.title}: {result}" for item, result in zip(items, results) if not isinstance(result, WorkItem)]
+        if not created:
+            await running.fail("Error: no work items created\n" + "\n".join(failed))
+            return
+        text = render_created(created) + ("\n\nFailed:\n" + "\n".join(failed) if failed else "")
+        await running.reply(text, data_part(CREATED, created))
+
+    async def _close_logic_app(self):
+        if self.logic_app:
+            await self.logic_app.close()
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        await event_queue.enqueue_event(new_agent_text_message("Operation cancelled"))
+        await self.tasks.cancel(context)
 
 if __name__ == "__main__":
-    agent_card = AgentCard(
-        name='Azure DevOps Logic App Agent',
-        description='Creates Azure DevOps work items using Logic Apps',
-        capabilities=AgentCapabilities(streaming=False),
-        url='http://localhost:8001/',
-        version='1.0.0',
-        defaultInputModes=['text'],
-        defaultOutputModes=['text'],
-        skills=[],
-    )
-
-    server = A2AStarletteApplication(
-        agent_card=agent_card,
-        http_handler=DefaultRequestHandler(agent_executor=DevOpsA2AExecutor(), task_store=InMemoryTaskStore()),
-    )
-
-    uvicorn.run(server.build(), host='0.0.0.0', port=8001)
\ No newline at end of file
+    port = int(os.environ.get("PORT", 8001))
+    card = agent_card('Azure DevOps Logic App Agent', 'Creates Azure DevOps work items using Logic Apps', port)
+
+    if use_fake_backends():
+        install_fake_env()
+        executor = DevOpsA2AExecutor(agents_client=FakeAgentsClient.from_env(), logic_app=FakeLogicApp.from_env())
+    else:
+        executor = DevOpsA2AExecutor()
+
+    serve(build_app(card, executor), port)
\ No newline at end of file
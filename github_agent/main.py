@@ -1,76 +1,118 @@
+import asyncio
 import os
-import uvicorn
+import sys
 import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
 from a2a.server.agent_execution import AgentExecutor, RequestContext
-from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events.event_queue import EventQueue
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard
-from a2a.utils import new_agent_text_message
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
-from azure.ai.agents.models import MCPToolDefinition, RequiredMcpToolCall, SubmitToolApprovalAction, ToolApproval, MCPToolResource, ToolResources
+from common.admission import AdmissionController
+from common.fakes import FakeAgentsClient, install_fake_env, use_fake_backends
+from common.metrics import ExecutorMetrics
+from common.models import ModelRouter
+from common.readiness import Readiness
+from common.server import agent_card, build_app, serve
+from common.retry import RetryPolicy
+from common.tasks import RunningTask, TaskTracker
+from common.thread_pool import ThreadPool
+from common.usage import USAGE, UsageLedger
 
 class DevOpsA2AExecutor(AgentExecutor):
-    def __init__(self):
+    def __init__(self, agents_client=None):
         self.agent = None
         self.project_client = None
-        self.agents_client = None
+        self.agents_client = agents_client
         self.threads = {}
         self.mcp_tool = None
-        self._setup_azure_client()
+        self.metrics = ExecutorMetrics("github", sessions=self.threads)
+        self.admission = AdmissionController.from_env("github")
+        self.retry = RetryPolicy.from_env("github")
+        self.tasks = TaskTracker("github")
+        self.usage = UsageLedger.from_env("github")
+        self.models = ModelRouter.from_env("github")
+        self.poll_interval = float(os.environ.get("RUN_POLL_INTERVAL", "1.0"))
+        # Runs in the background once the server is up, see common/readiness.py.
+        self.readiness = Readiness("github")
+        self.readiness.add_step("project_client", self._setup_azure_client)
+        self.readiness.add_step("create_agent", self._create_agent)
+        self.thread_pool = ThreadPool.from_env(
+            "github",
+            create=lambda: self.agents_client.threads.create(),
+            delete=lambda thread_id: self.agents_client.threads.delete(thread_id),
+        )
+        self.readiness.add_step("thread_pool", self.thread_pool.start, required=False)
+        self.readiness.on_shutdown(self.thread_pool.close)
 
     def _setup_azure_client(self):
-        try:
+        if self.agents_client is None:
+            from azure.ai.projects import AIProjectClient
+            from azure.identity import DefaultAzureCredential
             self.project_client = AIProjectClient(
                 endpoint=os.environ["PROJECT_ENDPOINT"],
                 credential=DefaultAzureCredential(),
+                retry_total=0,  # retries are handled by self.retry so they count against its budget
             )
             self.agents_client = self.project_client.agents
-            
-            self.mcp_tool = MCPToolDefinition(
-                server_label="github",
-                server_url=os.environ.get("MCP_SERVER_URL"),
-                allowed_tools=["create_issue", "list_issues", "get_issue"]
-            )
 
-            tool_info = """
+    def _create_agent(self):
+        from azure.ai.agents.models import MCPToolDefinition
+        self.mcp_tool = MCPToolDefinition(
+            server_label="github",
+            server_url=os.environ.get("MCP_SERVER_URL"),
+            allowed_tools=["create_issue", "list_issues", "get_issue"]
+        )
+
+        tool_info = """
 Available Tools:
 create_issue: {"owner": "aymenfurter", "repo": "a2a", "title": "New Issue", "body": "lorem ipsum"}
 list_issues: {"owner": "aymenfurter", "repo": "a2a"}
 get_issue: {"owner": "aymenfurter", "repo": "a2a", "issue_number": 1}
 """
-            
-            self.agent = self.agents_client.create_agent(
-                model=os.environ["MODEL_DEPLOYMENT_NAME"],
-                name="github-mcp-agent",
-                instructions="You are a helpful GitHub assistant. Use the available MCP tools to create, read, and manage GitHub issues. Always use owner 'aymenfurter' and repo 'a2a'." + tool_info,
-                tools=[self.mcp_tool]
-            )
-        except Exception as e:
-            pass
+        
+        self.agent = self.agents_client.create_agent(
+            model=os.environ["MODEL_DEPLOYMENT_NAME"],
+            name="github-mcp-agent",
+            instructions="You are a helpful GitHub assistant. Use the available MCP tools to create, read, and manage GitHub issues. Always use owner 'aymenfurter' and repo 'a2a'." + tool_info,
+            tools=[self.mcp_tool]
+        )
             
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        async with self.tasks.start(context, event_queue) as running:
+            async with self.admission.slot():
+                with self.metrics.request():
+                    await self._execute(context, running)
+
+    async def _execute(self, context: RequestContext, running: RunningTask) -> None:
         try:
-            if not self.agent:
-                await event_queue.enqueue_event(new_agent_text_message("Agent not initialized"))
+            if not await self.readiness.wait() or not self.agent:
+                await running.fail("Agent not initialized")
+                return
+            limit = self.usage.limit(context.context_id, context.message)
+            if limit == 0:
+                await running.fail("Error: token budget exhausted")
                 return
+            from azure.ai.agents.models import RequiredMcpToolCall, SubmitToolApprovalAction, ToolApproval, MCPToolResource, ToolResources
                 
-            thread = self.threads.get(context.context_id)
+            thread = self.threads.get(context.context_id) or self.thread_pool.take()
             if not thread:
-                thread = self.agents_client.threads.create()
-                self.threads[context.context_id] = thread
+                with self.metrics.stage("threads_create"):
+                    thread = await self.retry.call("threads_create", asyncio.to_thread, self.agents_client.threads.create)
+            self.threads[context.context_id] = thread
             
-            message = self.agents_client.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=context.get_user_input(),
-            )
+            with self.metrics.stage("messages_create"):
+                # Not idempotent: a retry after a 5xx or timeout could post the prompt to the thread twice.
+                message = await self.retry.call_unsent(
+                    "messages_create",
+                    asyncio.to_thread,
+                    self.agents_client.messages.create,
+                    thread_id=thread.id,
+                    role="user",
+                    content=context.get_user_input(),
+                )
             
             headers = {}
             github_pat = os.environ.get("GITHUB_PAT")
@@ -81,15 +123,26 @@ get_issue: {"owner": "aymenfurter", "repo": "a2a", "issue_number": 1}
                 mcp=[MCPToolResource(server_label="github", headers=headers)]
             )
             
-            run = self.agents_client.runs.create(
-                thread_id=thread.id, 
-                agent_id=self.agent.id,
-                tool_resources=tool_resources
-            )
+            tier = self.models.tier("github")
+            run_started = time.perf_counter()
+            with self.metrics.stage("runs_create"):
+                # A second run could open the same GitHub issue twice.
+                run = await self.retry.call_unsent(
+                    "runs_create",
+                    asyncio.to_thread,
+                    self.agents_client.runs.create,
+                    thread_id=thread.id,
+                    agent_id=self.agent.id,
+                    tool_resources=tool_resources,
+                    **({"max_completion_tokens": limit} if limit else {}),
+                    **({"model": tier.deployment} if tier.deployment else {}),
+                )
+            running.on_cancel(lambda: asyncio.to_thread(self.agents_client.runs.cancel, thread_id=thread.id, run_id=run.id))
             
             while run.status in ["queued", "in_progress", "requires_action"]:
-                time.sleep(1)
-                run = self.agents_client.runs.get(thread_id=thread.id, run_id=run.id)
+                await asyncio.sleep(self.poll_interval)
+                with self.metrics.stage("runs_get"):
+                    run = await self.retry.call("runs_get", asyncio.to_thread, self.agents_client.runs.get, thread_id=thread.id, run_id=run.id)
                 
                 if run.status == "requires_action":
                     if isinstance(run.required_action, SubmitToolApprovalAction):
@@ -106,53 +159,62 @@ get_issue: {"owner": "aymenfurter", "repo": "a2a", "issue_number": 1}
                                     )
                             
                             if tool_approvals:
-                                self.agents_client.runs.submit_tool_outputs(
-                                    thread_id=thread.id, 
-                                    run_id=run.id,
-                                    tool_approvals=tool_approvals
-                                )
+                                with self.metrics.stage("mcp_tool_approval"):
+                                    await self.retry.call(
+                                        "mcp_tool_approval",
+                                        asyncio.to_thread,
+                                        self.agents_client.runs.submit_tool_outputs,
+                                        thread_id=thread.id,
+                                        run_id=run.id,
+                                        tool_approvals=tool_approvals
+                                    )
+                                for tool_call in tool_calls:
+                                    self.metrics.tool_call(getattr(tool_call, 'name', 'unknown'), "approved")
                                     
+            self.metrics.observe("run", time.perf_counter() - run_started, "ok" if run.status == "completed" else run.status)
+            self.models.observe("github", tier, time.perf_counter() - run_started, getattr(run, 'usage', None))
+            usage = self.usage.record(context.context_id, getattr(run, 'usage', None))
+            if usage:
+                running.metadata[USAGE] = usage.model_dump()
             if run.status == "failed":
                 print (run)
-                await event_queue.enqueue_event(new_agent_text_message("Operation failed"))
+                await running.fail("Operation failed")
                 return
                     
-            messages = self.agents_client.messages.list(thread_id=thread.id)
-            
-            message_list = []
-            if hasattr(messages, 'data'):
-                message_list = messages.data
-            elif hasattr(messages, '__iter__'):
-                message_list = list(messages)
+            with self.metrics.stage("messages_list"):
+                message_list = await self.retry.call("messages_list", asyncio.to_thread, self._list_messages, thread.id)
             
             for msg in message_list:
                 if msg.role == "assistant" and msg.content:
                     for content_item in msg.content:
                         if hasattr(content_item, 'text') and content_item.text:
-                            await event_queue.enqueue_event(new_agent_text_message(content_item.text.value))
+                            await running.reply(content_item.text.value)
                             return
+            
+            await running.reply("No response generated")
                 
         except Exception as e:
-            await event_queue.enqueue_event(new_agent_text_message(f"Error: {e}"))
+            await running.fail(f"Error: {e}")
+
+    def _list_messages(self, thread_id: str) -> list:
+        messages = self.agents_client.messages.list(thread_id=thread_id)
+        if hasattr(messages, 'data'):
+            return messages.data
+        elif hasattr(messages, '__iter__'):
+            return list(messages)
+        return []
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        await event_queue.enqueue_event(new_agent_text_message("Operation cancelled."))
+        await self.tasks.cancel(context)
 
 if __name__ == "__main__":
-    agent_card = AgentCard(
-        name='GitHub MCP Agent',
-        description='An AI agent that manages GitHub issues using MCP tools.',
-        capabilities=AgentCapabilities(streaming=False),
-        url='http://localhost:8001/',
-        version='1.0.0',
-        defaultInputModes=['text'],
-        defaultOutputModes=['text'],
-        skills=[],
-    )
+    port = int(os.environ.get("PORT", 8001))
+    card = agent_card('GitHub MCP Agent', 'An AI agent that manages GitHub issues using MCP tools.', port)
 
-    server = A2AStarletteApplication(
-        agent_card=agent_card,
-        http_handler=DefaultRequestHandler(agent_executor=DevOpsA2AExecutor(), task_store=InMemoryTaskStore()),
-    )
+    if use_fake_backends():
+        install_fake_env()
+        executor = DevOpsA2AExecutor(agents_client=FakeAgentsClient.from_env())
+    else:
+        executor = DevOpsA2AExecutor()
 
-    uvicorn.run(server.build(), host='0.0.0.0', port=8001)
\ No newline at end of file
+    serve(build_app(card, executor), port)
\ No newline at end of file
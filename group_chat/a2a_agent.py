@@ -1,10 +1,18 @@
-import httpx
+import asyncio
+import os
+from collections.abc import Sequence
 from uuid import uuid4
 from semantic_kernel.agents import Agent, AgentThread
-from semantic_kernel.contents import ChatHistory, ChatMessageContent
+from semantic_kernel.contents import AuthorRole, ChatHistory, ChatMessageContent
 from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
-from a2a.client import A2ACardResolver, A2AClient
-from a2a.types import Message, MessageSendConfiguration, MessageSendParams, SendMessageRequest, TextPart
+from a2a.client import A2AClient
+from a2a.types import (CancelTaskRequest, DataPart, GetTaskRequest, Message, MessageSendConfiguration, MessageSendParams, PushNotificationConfig,
+                       SendMessageRequest, Task, TaskIdParams, TaskQueryParams, TextPart)
+from replay import RecordingClient, TrafficRecorder, TrafficReplayer
+from replicas import ReplicaSet
+from tracing import estimate_tokens, tracer
+from webhooks import DONE_STATES, WebhookReceiver
+from common.usage import TOKEN_BUDGET, USAGE, BudgetExhaustedError, UsageLedger
 
 class A2AThread(AgentThread):
     def __init__(self):
@@ -20,95 +28,250 @@ class A2AThread(AgentThread):
     async def _on_new_message(self, new_message: ChatMessageContent) -> None:
         pass
 
+class ConversationLog(ChatHistory):
+    """Append-only message list of one group chat. Passed as the chat's history, so every message is stored once."""
+
+    def view(self, start: int = 0) -> "LogView":
+        return LogView(self.messages, start)
+
+class LogView(Sequence):
+    """Read-only window on a shared message list; slicing narrows the window instead of copying messages."""
+
+    def __init__(self, messages: list, start: int = 0, stop: int | None = None):
+        self._messages = messages
+        self._start = start
+        # None follows the end of the log as it grows.
+        self._stop = stop
+
+    def _bounds(self) -> tuple[int, int]:
+        stop = len(self._messages) if self._stop is None else min(self._stop, len(self._messages))
+        return min(self._start, stop), stop
+
+    def __len__(self) -> int:
+        start, stop = self._bounds()
+        return stop - start
+
+    def __getitem__(self, index):
+        start, stop = self._bounds()
+        if isinstance(index, slice):
+            first, last, step = index.indices(stop - start)
+            if step != 1:
+                return [self._messages[start + i] for i in range(first, last, step)]
+            return LogView(self._messages, start + first, start + max(first, last))
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError(index)
+        return self._messages[start + index]
+
 class A2AChannel:
-    def __init__(self, agent):
+    """An agent's read offset on the group chat log: the agent gets every message it has not seen yet."""
+
+    def __init__(self, agent, log: ConversationLog = None):
         self.agent = agent
-        self.history = ChatHistory()
+        # The group chat appends to a shared log itself; a channel without one keeps a private log.
+        self._shared = log is not None
+        self.log = log if log is not None else ConversationLog()
+        self.offset = 0
         agent._current_channel = self
 
+    @property
+    def history(self) -> LogView:
+        return self.log.view(self.offset)
+
     async def receive(self, history):
-        self.history = ChatHistory()
-        for msg in history:
-            self.history.add_message(msg)
+        if not self._shared:
+            self.log.messages.extend(history)
 
     async def invoke(self, agent, **kwargs):
         async for response in agent.invoke(messages=self.history, **kwargs):
-            if hasattr(response, 'message') and response.message:
-                self.history.add_message(response.message)
+            if not self._shared and response.message:
+                self.log.add_message(response.message)
             yield True, response.message
+            # By now the chat has logged the reply, so the agent is up to date.
+            self.offset = len(self.log.messages)
 
     async def reset(self):
-        """Reset the channel by clearing its history."""
-        self.history = ChatHistory()
+        """The group chat clears a shared log on its own reset, so only a private one is dropped here."""
+        if not self._shared:
+            self.log = ConversationLog()
+        self.offset = 0
 
 class RemoteA2AAgent(Agent):
-    def __init__(self, name: str, description: str, a2a_client: A2AClient, use_last_message_only: bool = False):
+    def __init__(self, name: str, description: str, a2a_client: A2AClient, use_last_message_only: bool = False, webhooks: WebhookReceiver = None,
+                 usage: UsageLedger = None, workflow_id: str = None, log: ConversationLog = None):
         super().__init__(name=name, description=description)
         self._client = a2a_client
+        self._log = log
+        # Workflow-wide token ledger; each request carries what is left of the budget to the remote agent.
+        self._usage = usage
+        self._workflow_id = workflow_id
+        # Set when the agent supports push notifications: requests return at once and the result arrives by webhook.
+        self._webhooks = webhooks
+        self._task_timeout = float(os.environ.get("A2A_TASK_TIMEOUT", "900"))
+        self._task_poll = float(os.environ.get("A2A_TASK_POLL", "30"))
         self._context_id = f"chat-session-{uuid4().hex}"
         self._use_last_message_only = use_last_message_only
+        # Task ids of requests that may still be running on the remote agent.
+        self._pending = set()
 
     @classmethod
-    async def create(cls, base_url: str, name: str, description: str = None, use_last_message_only: bool = False) -> "RemoteA2AAgent":
-        httpx_client = httpx.AsyncClient(timeout=30.0)
-        resolver = A2ACardResolver(httpx_client=httpx_client, base_url=base_url)
-        agent_card = await resolver.get_agent_card()
-        a2a_client = A2AClient(httpx_client=httpx_client, agent_card=agent_card)
+    async def create(cls, base_url: str | list[str], name: str, description: str = None, use_last_message_only: bool = False,
+                     recorder: TrafficRecorder = None, replayer: TrafficReplayer = None, idempotent: bool = False,
+                     webhooks: WebhookReceiver = None, usage: UsageLedger = None) -> "RemoteA2AAgent":
+        """`base_url` may list several replicas; `idempotent` agents may be retried or hedged on another replica."""
+        urls = [base_url] if isinstance(base_url, str) else base_url
+        if replayer:
+            agent_card = replayer.agent_card(name)
+            a2a_client = replayer.client(name)
+        else:
+            a2a_client, agent_card = await ReplicaSet.connect(name, urls, idempotent)
+        if recorder:
+            recorder.record_card(name, agent_card)
+            a2a_client = RecordingClient(a2a_client, recorder, name)
         agent_description = description or agent_card.description or f"A2A {name} Agent"
-        instance = cls(name=name, description=agent_description, a2a_client=a2a_client, use_last_message_only=use_last_message_only)
+        webhooks = webhooks if webhooks and not replayer and agent_card.capabilities.pushNotifications and webhooks.reachable_from(name, urls) else None
+        instance = cls(name=name, description=agent_description, a2a_client=a2a_client, use_last_message_only=use_last_message_only, webhooks=webhooks,
+                       usage=usage)
         # Store agent card for UI access
         instance._agent_card = agent_card
         return instance
 
+    def for_session(self, log: ConversationLog, workflow_id: str) -> "RemoteA2AAgent":
+        """A copy for one workflow session: same connection, card and webhooks, its own remote context and log."""
+        instance = type(self)(name=self.name, description=self.description, a2a_client=self._client, use_last_message_only=self._use_last_message_only,
+                              webhooks=self._webhooks, usage=self._usage, workflow_id=workflow_id, log=log)
+        instance._agent_card = self.agent_card
+        return instance
+
     @property
     def agent_card(self):
         """Access to the agent card for UI display."""
         return getattr(self, '_agent_card', None)
 
     def _extract_messages(self, messages):
+        """Returns the prompt text and the latest structured payload (DataPart dicts) in the history."""
         if hasattr(self, '_current_channel') and hasattr(self._current_channel, 'history'):
             messages = self._current_channel.history
+        if isinstance(messages, ChatHistory):
+            messages = messages.messages
         
-        if isinstance(messages, ChatHistory) and messages.messages:
-            msgs = [messages.messages[-1]] if self._use_last_message_only else messages.messages
-            return "\n\n".join([f"{getattr(msg, 'role', 'user')}{f' ({msg.name})' if hasattr(msg, 'name') and msg.name else ''}: {msg.content}" for msg in msgs])
-        return str(messages) if messages else "Hello"
+        if isinstance(messages, (list, LogView)) and messages:
+            msgs, data = messages, []
+            # A reply that came with structured data replaces its own prose and everything before it.
+            for i in range(len(msgs) - 1, -1, -1):
+                if msgs[i].metadata.get("a2a_data"):
+                    data, msgs = msgs[i].metadata["a2a_data"], msgs[i + 1:]
+                    break
+            if not msgs:
+                return f"Continue with the attached {', '.join(item.get('kind', 'data') for item in data)}.", data
+            if self._use_last_message_only:
+                # The latest reply, plus the stage instruction the orchestrator added after it.
+                last_reply = max((i for i, msg in enumerate(msgs) if msg.role != AuthorRole.USER), default=len(msgs) - 1)
+                msgs = msgs[last_reply:]
+            return "\n\n".join([f"{getattr(msg, 'role', 'user')}{f' ({msg.name})' if hasattr(msg, 'name') and msg.name else ''}: {msg.content}" for msg in msgs]), data
+        return (str(messages) if messages else "Hello"), []
+
+    async def cancel_pending(self):
+        """Cancels requests still running on the remote agent, e.g. when the group chat stops early."""
+        pending, self._pending = self._pending, set()
+        await asyncio.gather(*(self._cancel_task(task_id) for task_id in pending))
+
+    async def _cancel_task(self, task_id: str):
+        try:
+            await self._client.cancel_task(CancelTaskRequest(id=str(uuid4()), params=TaskIdParams(id=task_id)))
+        except Exception:
+            # Already finished or unreachable; either way there is nothing left to stop.
+            pass
+
+    async def _wait_for_task(self, task_id: str) -> Task:
+        """Waits for the webhook, polling tasks/get now and then in case a notification was lost."""
+        with tracer.span("await_task", cat="a2a", agent=self.name):
+            deadline = asyncio.get_running_loop().time() + self._task_timeout
+            while True:
+                try:
+                    return await self._webhooks.wait(task_id, timeout=self._task_poll)
+                except asyncio.TimeoutError:
+                    response = await self._client.get_task(GetTaskRequest(id=str(uuid4()), params=TaskQueryParams(id=task_id)))
+                    task = getattr(response.root, 'result', None)
+                    if task and task.status.state in DONE_STATES:
+                        return task
+                    if asyncio.get_running_loop().time() >= deadline:
+                        raise TimeoutError(f"{self.name} task {task_id} did not finish within {self._task_timeout}s")
 
     async def _invoke_agent(self, messages) -> ChatMessageContent:
-        prompt = self._extract_messages(messages)
+        prompt, data = self._extract_messages(messages)
+        return await self.send(prompt, data=data)
+
+    async def send(self, prompt: str, context_id: str = None, data: list[dict] = None) -> ChatMessageContent:
+        """Sends one prompt plus optional DataPart payloads. A separate context_id gets its own remote conversation.
+
+        DataParts in the reply end up in the returned message's metadata["a2a_data"].
+        """
+        budget = self._usage.remaining(self._workflow_id) if self._usage else None
+        if budget == 0:
+            raise BudgetExhaustedError(f"Token budget of {self._usage.budget} for this workflow is used up")
+        # The task id is chosen here so the request can be cancelled before its response arrives.
+        task_id = str(uuid4())
         request = SendMessageRequest(
             id=str(uuid4()),
             params=MessageSendParams(
                 message=Message(
                     role='user',
-                    parts=[TextPart(text=prompt)],
+                    parts=[TextPart(text=prompt), *(DataPart(data=item) for item in data or [])],
                     messageId=str(uuid4()),
-                    contextId=self._context_id,
+                    contextId=context_id or self._context_id,
+                    taskId=task_id,
+                    metadata={TOKEN_BUDGET: budget} if budget is not None else None,
+                ),
+                configuration=MessageSendConfiguration(
+                    acceptedOutputModes=['text', 'data'],
+                    blocking=not self._webhooks,
+                    pushNotificationConfig=PushNotificationConfig(url=self._webhooks.url, token=self._webhooks.token) if self._webhooks else None,
                 ),
-                configuration=MessageSendConfiguration(acceptedOutputModes=['text']),
             )
         )
 
-        response = await self._client.send_message(request)
-        event = response.root.result
-        
-        response_text = ""
-        if hasattr(event, 'parts') and event.parts:
-            for part in event.parts:
-                if hasattr(part, 'root') and hasattr(part.root, 'text'):
-                    response_text = part.root.text
-                    break
-                elif hasattr(part, 'text'):
-                    response_text = part.text
-                    break
-        
-        return ChatMessageContent(role="assistant", content=response_text or str(event), name=self.name)
+        with tracer.span("remote_agent", cat="a2a", agent=self.name, prompt_chars=len(prompt), prompt_tokens_est=estimate_tokens(prompt),
+                         data_parts=len(data or [])) as span:
+            self._pending.add(task_id)
+            if self._webhooks:
+                self._webhooks.expect(task_id)
+            try:
+                response = await self._client.send_message(request)
+                event = response.root.result
+                if isinstance(event, Task) and event.status.state not in DONE_STATES:
+                    span["push"] = True
+                    event = await self._wait_for_task(task_id)
+            except asyncio.CancelledError:
+                # Left in _pending so cancel_pending() can stop the remote task.
+                raise
+            except Exception:
+                self._pending.discard(task_id)
+                await self._cancel_task(task_id)
+                raise
+            finally:
+                if self._webhooks:
+                    self._webhooks.forget(task_id)
+            self._pending.discard(task_id)
+            
+            message = event.status.message if isinstance(event, Task) else event
+            parts = getattr(message, 'parts', None)
+            usage = self._usage.record(self._workflow_id, (getattr(message, 'metadata', None) or {}).get(USAGE)) if self._usage else None
+            if usage:
+                span.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            parts = [getattr(part, 'root', part) for part in parts or []]
+            content = "\n".join(part.text for part in parts if isinstance(part, TextPart) and part.text) or str(event)
+            reply_data = [part.data for part in parts if isinstance(part, DataPart)]
+            span.update(response_chars=len(content), response_tokens_est=estimate_tokens(content), response_data_parts=len(reply_data))
+        return ChatMessageContent(role="assistant", content=content, name=self.name, metadata={"a2a_data": reply_data} if reply_data else {})
     
     def get_channel_keys(self):
-        return ["A2AChannel"]
+        # One channel per agent, so each keeps its own read offset into the log.
+        return ["A2AChannel", self.name]
     
     async def create_channel(self):
-        return A2AChannel(self)
+        return A2AChannel(self, self._log)
     
     async def _get_response_item(self, messages, **kwargs):
         from semantic_kernel.agents.agent import AgentResponseItem
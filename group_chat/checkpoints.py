@@ -0,0 +1,96 @@
+"""Durable workflow checkpoints, so an interrupted workflow resumes instead of redoing LLM work.
+
+Each workflow is a row with its query, mode, status and orchestrator state. Progress is stored as one
+row per checkpoint key (a chat stage reply, the extracted todos, or one formatted or created pipeline
+item), so a save costs the same however large the backlog is. SQLite runs in WAL mode with full sync,
+so everything saved has survived a crash of the process. Workflows left `running` are the ones to resume.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pydantic import BaseModel
+from semantic_kernel.contents import ChatMessageContent
+
+class Reply(BaseModel):
+    """An agent reply as stored in a checkpoint: enough to put it back into the conversation."""
+    name: str | None = None
+    content: str = ""
+    data: list[dict] = []
+
+    @classmethod
+    def of(cls, message: ChatMessageContent) -> "Reply":
+        return cls(name=message.name, content=str(message.content), data=message.metadata.get("a2a_data", []))
+
+    def message(self) -> ChatMessageContent:
+        return ChatMessageContent(role="assistant", content=self.content, name=self.name, metadata={"a2a_data": self.data} if self.data else {})
+
+class WorkflowRecord(BaseModel):
+    id: str
+    query: str
+    mode: str
+    status: str
+    state: str
+    result: str | None = None
+
+class WorkflowStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS workflows (
+                id TEXT PRIMARY KEY, query TEXT NOT NULL, mode TEXT NOT NULL, status TEXT NOT NULL,
+                state TEXT NOT NULL, result TEXT, created REAL NOT NULL, updated REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                workflow_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (workflow_id, key));
+        """)
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    def _write(self, statements):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                self._db.execute(sql, params)
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    async def create(self, workflow_id: str, query: str, mode: str):
+        now = time.time()
+        await self._run(self._write, [("INSERT OR IGNORE INTO workflows VALUES (?, ?, ?, 'running', 'INITIAL', NULL, ?, ?)",
+                                       (workflow_id, query, mode, now, now))])
+
+    async def put(self, workflow_id: str, key: str, value, state: str | None = None):
+        """Stores one checkpoint value and, in the same transaction, the workflow's current state."""
+        encoded = json.dumps(value)
+        await self._run(self._write, [
+            ("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)", (workflow_id, key, encoded)),
+            ("UPDATE workflows SET state = COALESCE(?, state), updated = ? WHERE id = ?", (state, time.time(), workflow_id)),
+        ])
+
+    async def finish(self, workflow_id: str, status: str, result: str | None = None, state: str | None = None):
+        await self._run(self._write, [("UPDATE workflows SET status = ?, result = ?, state = COALESCE(?, state), updated = ? WHERE id = ?",
+                                       (status, result, state, time.time(), workflow_id))])
+
+    async def load(self, workflow_id: str) -> dict:
+        rows = await self._run(lambda: self._db.execute("SELECT key, value FROM checkpoints WHERE workflow_id = ? ORDER BY rowid", (workflow_id,)).fetchall())
+        return {key: json.loads(value) for key, value in rows}
+
+    async def unfinished(self) -> list[WorkflowRecord]:
+        rows = await self._run(lambda: self._db.execute(
+            "SELECT id, query, mode, status, state, result FROM workflows WHERE status = 'running' ORDER BY created").fetchall())
+        return [WorkflowRecord(id=row[0], query=row[1], mode=row[2], status=row[3], state=row[4], result=row[5]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,130 @@
+import asyncio
+from uuid import uuid4
+from checkpoints import Reply
+from common.work_items import TODOS, Todo, data_part, parse_todos, read_items, render_todos
+from tracing import tracer
+
+DONE = object()
+
+FORMAT_PROMPT = "Format this todo into a structured work item for Azure DevOps with title, description, type, and acceptance criteria:\n\n{todo}"
+CREATE_PROMPT = "Create this formatted work item in Azure DevOps. Provide confirmation with the work item ID if possible.\n\n{formatted}"
+
+class PipelineItem:
+    def __init__(self, index: int, todo: Todo):
+        self.index = index
+        self.todo = todo
+        self.formatted = None
+        self.created = None
+        self.error = None
+        self.exception: Exception | None = None
+
+class PipelineError(Exception):
+    """Some todos did not make it through the pipeline; the cause is the first item's exception."""
+
+class Pipeline:
+    """Streams todos through formatter and DevOps one item at a time instead of one batch per stage.
+
+    Each stage runs `concurrency` workers and hands items on through a queue of `queue_size`, so a slow
+    stage holds back the one before it instead of letting work pile up. Every item gets its own remote
+    context, so items never wait behind each other's conversation (a Foundry thread runs one run at a time).
+    With `save`, the todos and every formatted and created item are checkpointed; items found in
+    `checkpoint` skip the stages they already passed.
+    """
+
+    def __init__(self, extractor, formatter, creator, ui, concurrency: int = 4, queue_size: int = 4, checkpoint: dict = None, save=None):
+        self.extractor = extractor
+        self.formatter = formatter
+        self.creator = creator
+        self.ui = ui
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.checkpoint = checkpoint if checkpoint is not None else {}
+        self._save = save
+        self.items: list[PipelineItem] = []
+
+    async def save(self, key: str, value, state: str | None = None):
+        if self._save:
+            await self._save(key, value, state)
+
+    async def run(self, query: str) -> list[PipelineItem]:
+        to_format = asyncio.Queue(self.queue_size)
+        to_create = asyncio.Queue(self.queue_size)
+        await asyncio.gather(
+            self._extract(query, to_format),
+            self._stage("format", to_format, to_create, self._format),
+            self._stage("create", to_create, None, self._create),
+        )
+        return self.items
+
+    async def _extract(self, query: str, outbox: asyncio.Queue):
+        try:
+            if "todos" in self.checkpoint:
+                todos = [Todo.model_validate(todo) for todo in self.checkpoint["todos"]]
+            else:
+                todos = await self._extract_todos(query)
+            self.ui.add_message("System", f"Pipelining {len(todos)} todos" if todos else "No work items to process")
+            self.ui.update_workflow_state("TODOS_EXTRACTED")
+            for index, todo in enumerate(todos, 1):
+                item = PipelineItem(index, todo)
+                self.items.append(item)
+                if f"formatted:{index}" in self.checkpoint:
+                    item.formatted = Reply.model_validate(self.checkpoint[f"formatted:{index}"]).message()
+                if f"created:{index}" in self.checkpoint:
+                    item.created = Reply.model_validate(self.checkpoint[f"created:{index}"]).message()
+                    continue
+                await outbox.put(item)
+        finally:
+            # Also after a failed extraction, so the stage workers stop instead of waiting for items.
+            for _ in range(self.concurrency):
+                await outbox.put(DONE)
+
+    async def _extract_todos(self, query: str) -> list[Todo]:
+        self.ui.set_active_agent(self.extractor.name, self.extractor.agent_card)
+        try:
+            reply = await self.extractor.send(query)
+        except Exception as e:
+            # A failed extraction fails the run, rather than looking like a page without todos.
+            self.ui.add_message("System", f"Extraction failed: {e}")
+            raise
+        self.ui.add_message(self.extractor.name, reply.content, self.extractor.name, is_agent=True)
+        todos = read_items(reply.metadata.get("a2a_data"), TODOS, Todo)
+        if todos is None:
+            todos = parse_todos(reply.content)
+        await self.save("todos", [todo.model_dump() for todo in todos], "TODOS_EXTRACTED")
+        return todos
+
+    async def _stage(self, name: str, inbox: asyncio.Queue, outbox: asyncio.Queue | None, handle):
+        async def worker():
+            while (item := await inbox.get()) is not DONE:
+                with tracer.span(f"pipeline_{name}", cat="pipeline", item=item.index):
+                    try:
+                        await handle(item)
+                    except Exception as e:
+                        item.error = f"{name}: {e}"
+                        item.exception = e
+                        self.ui.add_message("System", f"Todo {item.index} failed at {name}: {e}")
+                        continue
+                if outbox:
+                    await outbox.put(item)
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        if outbox:
+            for _ in range(self.concurrency):
+                await outbox.put(DONE)
+
+    async def _format(self, item: PipelineItem):
+        if item.formatted:
+            return
+        self.ui.set_active_agent(self.formatter.name, self.formatter.agent_card)
+        item.formatted = await self.formatter.send(FORMAT_PROMPT.format(todo=render_todos([item.todo])), context_id=f"pipeline-{uuid4().hex}",
+                                                   data=[data_part(TODOS, [item.todo]).root.data])
+        self.ui.add_message(self.formatter.name, item.formatted.content, self.formatter.name, is_agent=True)
+        await self.save(f"formatted:{item.index}", Reply.of(item.formatted).model_dump())
+
+    async def _create(self, item: PipelineItem):
+        self.ui.set_active_agent(self.creator.name, self.creator.agent_card)
+        # Structured work items let DevOps skip its LLM run, so the prose is left out of the prompt.
+        data = item.formatted.metadata.get("a2a_data")
+        prompt = CREATE_PROMPT.format(formatted="" if data else item.formatted.content).strip()
+        item.created = await self.creator.send(prompt, context_id=f"pipeline-{uuid4().hex}", data=data)
+        self.ui.add_message(self.creator.name, item.created.content, self.creator.name, is_agent=True)
+        await self.save(f"created:{item.index}", Reply.of(item.created).model_dump())
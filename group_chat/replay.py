@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+import json
+import time
+from collections import defaultdict, deque
+from uuid import uuid4
+from a2a.types import AgentCard, SendMessageResponse
+
+def _open(path: str, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+class ReplayExhausted(Exception):
+    pass
+
+class TrafficRecorder:
+    """Appends agent cards and SendMessageRequest/response pairs as JSON lines (gzip if the path ends in .gz)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.session = uuid4().hex
+        self._file = _open(path, "a")
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def record_card(self, agent: str, card: AgentCard):
+        self._write({"kind": "card", "session": self.session, "agent": agent, "card": card.model_dump(mode="json", exclude_none=True)})
+
+    def record_exchange(self, agent: str, request, response, started: float, duration: float, error: str | None = None):
+        self._write({
+            "kind": "send", "session": self.session, "agent": agent, "ts": round(started, 6), "duration": round(duration, 6),
+            "request": request.model_dump(mode="json", exclude_none=True),
+            "response": response.model_dump(mode="json", exclude_none=True) if response is not None else None,
+            "error": error,
+        })
+
+    def close(self):
+        self._file.close()
+
+class RecordingClient:
+    """Wraps an A2AClient and records every send_message exchange."""
+
+    def __init__(self, client, recorder: TrafficRecorder, agent: str):
+        self._client = client
+        self._recorder = recorder
+        self._agent = agent
+
+    async def send_message(self, request, **kwargs):
+        started, start = time.time(), time.perf_counter()
+        try:
+            response = await self._client.send_message(request, **kwargs)
+        except Exception as e:
+            self._recorder.record_exchange(self._agent, request, None, started, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        self._recorder.record_exchange(self._agent, request, response, started, time.perf_counter() - start)
+        return response
+
+    async def cancel_task(self, request, **kwargs):
+        return await self._client.cancel_task(request, **kwargs)
+
+    async def get_task(self, request, **kwargs):
+        return await self._client.get_task(request, **kwargs)
+
+class TrafficReplayer:
+    """Serves recorded traffic per agent in original order, reading the capture lazily line by line."""
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self._records = self._read()
+        self._pending = defaultdict(deque)
+
+    def _read(self):
+        with _open(self.path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _next(self, kind: str, agent: str) -> dict:
+        # Only records for other agents that arrive before ours are buffered, so memory stays bounded
+        # by how far the agents' traffic is interleaved rather than by the size of the capture.
+        key = (kind, agent)
+        while not self._pending[key]:
+            record = next(self._records, None)
+            if record is None:
+                raise ReplayExhausted(f"No more recorded '{kind}' traffic for {agent} in {self.path}")
+            self._pending[(record["kind"], record["agent"])].append(record)
+        return self._pending[key].popleft()
+
+    def agent_card(self, agent: str) -> AgentCard:
+        return AgentCard.model_validate(self._next("card", agent)["card"])
+
+    def client(self, agent: str) -> "ReplayClient":
+        return ReplayClient(self, agent)
+
+class ReplayClient:
+    """Drop-in for A2AClient.send_message that answers from a capture instead of the network."""
+
+    def __init__(self, replayer: TrafficReplayer, agent: str):
+        self._replayer = replayer
+        self._agent = agent
+
+    async def send_message(self, request, **kwargs):
+        record = self._replayer._next("send", self._agent)
+        if self._replayer.speed > 0:
+            await asyncio.sleep(record["duration"] / self._replayer.speed)
+        if record["error"]:
+            raise RuntimeError(f"Replayed error: {record['error']}")
+        return SendMessageResponse.model_validate(record["response"])
+
+    async def cancel_task(self, request, **kwargs):
+        # Replayed requests are never running anywhere, so there is nothing to cancel.
+        return None
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from uuid import uuid4
+import httpx
+from a2a.client import A2ACardResolver, A2AClient, A2AClientError, A2AClientHTTPError
+from a2a.types import CancelTaskRequest, JSONRPCErrorResponse, TaskIdParams
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Contexts and tasks remembered per replica set; the least recently used are forgotten first.
+MAX_REMEMBERED = 1024
+
+def not_started(error: Exception) -> bool:
+    """True when the replica never ran the request: connection refused, or shed with 503 before execution."""
+    cause = error.__cause__
+    return isinstance(cause, (httpx.ConnectError, httpx.ConnectTimeout)) or (
+        isinstance(error, A2AClientHTTPError) and error.status_code == 503 and isinstance(cause, httpx.HTTPStatusError))
+
+def _remember(recent: OrderedDict, key: str, replica: "Replica"):
+    recent[key] = replica
+    recent.move_to_end(key)
+    while len(recent) > MAX_REMEMBERED:
+        recent.popitem(last=False)
+
+class Replica:
+    """One agent endpoint with its latency window, in-flight count and circuit breaker."""
+
+    def __init__(self, url: str, client: A2AClient, window: int = 200):
+        self.url = url
+        self.client = client
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.ewma = None
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+    def percentile(self, pct: float) -> float | None:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    @property
+    def available(self) -> bool:
+        # Open: skipped until the cooldown ends. Half-open: a single probe request decides.
+        return time.monotonic() >= self.open_until and not self.probing
+
+    def score(self) -> float:
+        # Expected wait: typical latency times the queue in front of a new request.
+        return (self.ewma or 1.0) * (self.in_flight + 1)
+
+    def succeeded(self, seconds: float):
+        self.latencies.append(seconds)
+        self.ewma = seconds if self.ewma is None else 0.8 * self.ewma + 0.2 * seconds
+        self.failures = 0
+        self.open_until = 0.0
+
+    def failed(self, threshold: int, cooldown: float):
+        self.failures += 1
+        if self.failures >= threshold:
+            if not self.open_until:
+                logger.warning(f"Circuit open for {self.url} after {self.failures} failures")
+            self.open_until = time.monotonic() + cooldown
+
+class ReplicaSet:
+    """Drop-in for A2AClient that spreads one logical agent over several replica URLs.
+
+    Each request goes to the better of two random available replicas, scored by latency EWMA and
+    in-flight count; a context stays on the replica that served it while that replica is healthy.
+    Consecutive failures open a replica's circuit for `cooldown` seconds. Timeouts follow each
+    replica's observed p99, capped at `max_timeout`. For idempotent agents, a request that has not
+    answered by the set's p95 is hedged to a second replica and the slower copy is cancelled.
+    """
+
+    def __init__(self, name: str, replicas: list[Replica], idempotent: bool = False, max_timeout: float = 30.0, min_timeout: float = 5.0,
+                 failure_threshold: int = 3, cooldown: float = 10.0, hedge: bool = False, hedge_delay: float = 10.0):
+        self.name = name
+        self.replicas = replicas
+        self.idempotent = idempotent
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.hedge = hedge and idempotent and len(replicas) > 1
+        self.hedge_delay = hedge_delay
+        # Replica of each recent conversation, so its follow-up messages reach the same agent process.
+        self._context_replica = OrderedDict()
+        # Task id -> (replica, hedge task ids) so tasks/cancel reaches wherever the task runs.
+        self._tasks = {}
+        # Replica that accepted each recent task, for tasks/get and tasks/cancel after message/send returned.
+        self._owners = OrderedDict()
+
+    @classmethod
+    async def connect(cls, name: str, urls: list[str], idempotent: bool = False):
+        max_timeout = float(os.environ.get("A2A_TIMEOUT", "30"))
+        httpx_client = httpx.AsyncClient(timeout=max_timeout, limits=httpx.Limits(max_connections=100))
+        card = None
+        for url in urls:
+            try:
+                card = await A2ACardResolver(httpx_client=httpx_client, base_url=url).get_agent_card()
+                break
+            except Exception as e:
+                logger.warning(f"{name}: replica {url} unreachable: {e}")
+        if card is None:
+            raise ConnectionError(f"No replica of {name} is reachable: {', '.join(urls)}")
+        replicas = [Replica(url, A2AClient(httpx_client=httpx_client, url=url.rstrip("/") + "/")) for url in urls]
+        instance = cls(name, replicas, idempotent=idempotent, max_timeout=max_timeout,
+                       failure_threshold=int(os.environ.get("A2A_BREAKER_FAILURES", "3")),
+                       cooldown=float(os.environ.get("A2A_BREAKER_COOLDOWN", "10")),
+                       hedge=os.environ.get("A2A_HEDGE", "") == "1",
+                       hedge_delay=float(os.environ.get("A2A_HEDGE_DELAY", "10")))
+        return instance, card
+
+    def timeout(self, replica: Replica) -> float:
+        p99 = replica.percentile(99)
+        return self.max_timeout if p99 is None else min(self.max_timeout, max(self.min_timeout, 2 * p99))
+
+    def _hedge_after(self) -> float:
+        latencies = sorted(seconds for replica in self.replicas for seconds in replica.latencies)
+        if len(latencies) < 20:
+            return self.hedge_delay
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _pick(self, context_id: str | None = None, exclude=()) -> Replica | None:
+        sticky = self._context_replica.get(context_id)
+        if sticky and sticky.available and sticky not in exclude:
+            self._context_replica.move_to_end(context_id)
+            return sticky
+        candidates = [r for r in self.replicas if r.available and r not in exclude]
+        if not candidates:
+            # Everything is open: try the replica whose cooldown ends first rather than failing outright.
+            candidates = sorted((r for r in self.replicas if r not in exclude), key=lambda r: r.open_until)[:1]
+        if not candidates:
+            return None
+        replica = min(random.sample(candidates, min(2, len(candidates))), key=Replica.score)
+        if context_id:
+            _remember(self._context_replica, context_id, replica)
+        return replica
+
+    async def _send(self, replica: Replica, request):
+        half_open = replica.open_until and time.monotonic() >= replica.open_until
+        replica.probing = bool(half_open)
+        replica.in_flight += 1
+        start = time.perf_counter()
+        task_id = request.params.message.taskId
+        with tracer.span("replica_call", cat="a2a", agent=self.name, replica=replica.url, half_open=bool(half_open)) as span:
+            try:
+                response = await asyncio.wait_for(replica.client.send_message(request), self.timeout(replica))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                replica.failed(self.failure_threshold, self.cooldown)
+                span["error"] = f"{type(e).__name__}: {e}"
+                if isinstance(e, asyncio.TimeoutError) and task_id:
+                    asyncio.create_task(self._cancel_on(replica, task_id))
+                raise
+            finally:
+                replica.in_flight -= 1
+                replica.probing = False
+        if isinstance(response.root, JSONRPCErrorResponse):
+            # Overloaded or broken replica; the caller still gets the error if no other replica helps.
+            replica.failed(self.failure_threshold, self.cooldown)
+        else:
+            replica.succeeded(time.perf_counter() - start)
+        return response
+
+    async def _cancel_on(self, replica: Replica, task_id: str):
+        try:
+            await replica.client.cancel_task(CancelTaskRequest(id=str(uuid4()), params=TaskIdParams(id=task_id)))
+        except Exception:
+            pass
+
+    async def send_message(self, request, **kwargs):
+        message = request.params.message
+        tried, last_error = [], None
+        while True:
+            replica = self._pick(message.contextId, exclude=tried)
+            if replica is None:
+                raise last_error or ConnectionError(f"No replica of {self.name} left to try")
+            tried.append(replica)
+            if message.taskId:
+                self._tasks[message.taskId] = (replica, [])
+            try:
+                # A non-blocking send only submits the task, so there is nothing slow to hedge.
+                if self.hedge and not (request.params.configuration and request.params.configuration.blocking is False):
+                    response = await self._send_hedged(replica, request)
+                else:
+                    response = await self._send(replica, request)
+            except (A2AClientError, asyncio.TimeoutError) as e:
+                # Another replica may only repeat work that never started, unless the agent is idempotent.
+                if not (self.idempotent or not_started(e)):
+                    raise
+                last_error = e
+                continue
+            finally:
+                if message.taskId:
+                    self._tasks.pop(message.taskId, None)
+            if isinstance(response.root, JSONRPCErrorResponse) and self.idempotent and len(tried) < len(self.replicas):
+                continue
+            _remember(self._context_replica, message.contextId, replica)
+            if message.taskId:
+                _remember(self._owners, message.taskId, replica)
+            return response
+
+    async def _send_hedged(self, primary: Replica, request):
+        first = asyncio.create_task(self._send(primary, request))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_after())
+        backup = None if done else self._pick(exclude=[primary])
+        if backup is None:
+            return await first
+
+        # The copy gets its own task id so either replica's task can be cancelled independently.
+        hedge_request = request.model_copy(deep=True)
+        hedge_request.id = str(uuid4())
+        hedge_request.params.message.taskId = str(uuid4())
+        hedge_request.params.message.messageId = str(uuid4())
+        if request.params.message.taskId in self._tasks:
+            self._tasks[request.params.message.taskId][1].append((backup, hedge_request.params.message.taskId))
+        second = asyncio.create_task(self._send(backup, hedge_request))
+        copies = {first: (primary, request), second: (backup, hedge_request)}
+        with tracer.span("hedge", cat="a2a", agent=self.name, primary=primary.url, backup=backup.url) as span:
+            try:
+                pending = set(copies)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    winner = next((task for task in done if not task.exception() and not isinstance(task.result().root, JSONRPCErrorResponse)), None)
+                    if winner or not pending:
+                        winner = winner or next(iter(done))
+                        span["winner"] = copies[winner][0].url
+                        return winner.result()
+            finally:
+                for task, (replica, copy) in copies.items():
+                    if not task.done():
+                        task.cancel()
+                        asyncio.create_task(self._cancel_on(replica, copy.params.message.taskId))
+
+    async def cancel_task(self, request, **kwargs):
+        replica, hedges = self._tasks.get(request.params.id, (self._owners.get(request.params.id), []))
+        await asyncio.gather(*(self._cancel_on(hedge_replica, task_id) for hedge_replica, task_id in hedges))
+        return await self._on_owner(request.params.id, replica, "cancel_task", request, **kwargs)
+
+    async def get_task(self, request, **kwargs):
+        return await self._on_owner(request.params.id, self._owners.get(request.params.id), "get_task", request, **kwargs)
+
+    async def _on_owner(self, task_id: str, replica: Replica | None, method: str, request, **kwargs):
+        # Without a known owner every replica is asked; the ones that never saw the task just answer with an error.
+        targets = [replica] if replica else self.replicas
+        results = await asyncio.gather(*(getattr(r.client, method)(request, **kwargs) for r in targets), return_exceptions=True)
+        answers = [result for result in results if not isinstance(result, Exception)]
+        return next((answer for answer in answers if not isinstance(answer.root, JSONRPCErrorResponse)), answers[0] if answers else None)
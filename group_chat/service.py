@@ -0,0 +1,155 @@
+"""The group chat orchestrator as a long-running A2A agent.
+
+Every message/send starts one workflow session with its own orchestrator state, conversation log and
+remote context ids. The remote agent connections, agent cards, webhook receiver and termination-check
+client are set up once at startup and shared by all sessions. Per session, SESSION_TIMEOUT bounds the
+run time, SESSION_MAX_TURNS the chat turns and WORKFLOW_TOKEN_BUDGET the tokens; MAX_CONCURRENCY
+sessions run at once and the rest queue. The message text is the query (the Confluence demo query when
+empty); `{"mode": "pipeline"}` in the message metadata runs the session in pipeline mode. With
+A2A_CHECKPOINTS, sessions are checkpointed and the ones a restart interrupted resume in the background.
+"""
+import asyncio
+import logging
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from a2a.server.agent_execution import AgentExecutor, RequestContext
+from a2a.server.events.event_queue import EventQueue
+from a2a.types import DataPart, Part
+from common.admission import AdmissionController
+from common.metrics import ExecutorMetrics
+from common.readiness import Readiness
+from common.server import agent_card, build_app, serve
+from common.tasks import RunningTask, TaskTracker
+from common.usage import USAGE, UsageLedger
+from checkpoints import WorkflowRecord, WorkflowStore
+from tracing import tracer
+from webhooks import WebhookReceiver
+from workflow import CONFLUENCE_QUERY, NO_WORK_ITEMS, Session, connect_agents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class SessionLog:
+    """Stands in for the terminal UI: keeps one session's messages and logs them."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.messages = []
+        self.state = "INITIAL"
+
+    def add_message(self, role, content, agent_name=None, is_agent=False):
+        self.messages.append((role, content))
+        logger.info(f"[{self.session_id}] {role}: {str(content)[:200]}")
+
+    def update_workflow_state(self, state):
+        self.state = state
+
+    def set_active_agent(self, agent_name, agent_card=None):
+        pass
+
+    def add_agent_card(self, agent_name, agent_card):
+        pass
+
+class WorkflowExecutor(AgentExecutor):
+    def __init__(self, port: int):
+        self.agents = []
+        self.sessions = {}
+        self.usage = UsageLedger.from_env("group_chat", "WORKFLOW_TOKEN_BUDGET")
+        # Mounted on this server, so agents push task updates to the orchestrator's own port.
+        self.webhooks = WebhookReceiver.from_env(port) if os.environ.get("A2A_PUSH", "1") != "0" else None
+        self.session_timeout = float(os.environ.get("SESSION_TIMEOUT", "900"))
+        self.max_turns = int(os.environ.get("SESSION_MAX_TURNS", "15"))
+        self.pipeline = bool(os.environ.get("A2A_PIPELINE"))
+        self.store = WorkflowStore(os.environ["A2A_CHECKPOINTS"]) if os.environ.get("A2A_CHECKPOINTS") else None
+        self._resumed = set()
+        self.metrics = ExecutorMetrics("group_chat", sessions=self.sessions)
+        self.admission = AdmissionController.from_env("group_chat")
+        self.tasks = TaskTracker("group_chat")
+        # Runs in the background once the server is up, see common/readiness.py.
+        self.readiness = Readiness("group_chat")
+        self.readiness.add_step("remote_agents", self._connect)
+        self.readiness.add_step("resume_workflows", self._resume_unfinished, required=False)
+        self.readiness.on_shutdown(tracer.close)
+
+    async def _connect(self):
+        self.agents = await connect_agents(webhooks=self.webhooks, usage=self.usage)
+
+    async def _resume_unfinished(self):
+        if not self.store:
+            return
+        for record in await self.store.unfinished():
+            task = asyncio.create_task(self._resume(record))
+            self._resumed.add(task)
+            task.add_done_callback(self._resumed.discard)
+
+    async def _resume(self, record: WorkflowRecord):
+        # No caller waits for these anymore; the outcome is kept in the checkpoint store.
+        async with self.admission.slot():
+            session = await Session.resume(record, self.agents, SessionLog(record.id), self.store, usage=self.usage, max_turns=self.max_turns)
+            self.sessions[record.id] = session
+            try:
+                async with asyncio.timeout(self.session_timeout):
+                    await session.run(record.query, pipeline=record.mode == "pipeline")
+            except TimeoutError:
+                await self.store.finish(record.id, "failed", f"did not finish within {self.session_timeout:.0f}s")
+                logger.error(f"Resumed workflow {record.id} timed out")
+            except Exception as e:
+                logger.error(f"Resumed workflow {record.id} failed: {e}")
+            finally:
+                self.sessions.pop(record.id, None)
+                await session.cancel_pending()
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        async with self.tasks.start(context, event_queue) as running:
+            async with self.admission.slot():
+                with self.metrics.request():
+                    await self._execute(context, running)
+
+    async def _execute(self, context: RequestContext, running: RunningTask) -> None:
+        if not await self.readiness.wait():
+            await running.fail("Orchestrator not initialized")
+            return
+        options = context.message.metadata or {}
+        session_id = f"workflow-{running.task_id}"
+        session = Session(self.agents, SessionLog(session_id), self.usage, session_id=session_id, max_turns=self.max_turns, store=self.store)
+        self.sessions[running.task_id] = session
+        running.on_cancel(session.cancel)
+        error = None
+        try:
+            async with asyncio.timeout(self.session_timeout):
+                await session.run(context.get_user_input().strip() or CONFLUENCE_QUERY, pipeline=options.get("mode", "pipeline" if self.pipeline else "chat") == "pipeline")
+        except TimeoutError:
+            error = f"Error: workflow did not finish within {self.session_timeout:.0f}s"
+            if self.store:
+                await self.store.finish(session.id, "failed", error)
+        except Exception as e:
+            error = f"Error: {e}"
+        finally:
+            self.sessions.pop(running.task_id, None)
+            await session.cancel_pending()
+
+        running.metadata[USAGE] = session.tokens().model_dump()
+        if error:
+            await running.fail(error)
+            return
+        result = session.result
+        data = result.metadata.get("a2a_data", []) if result else []
+        await running.reply(result.content if result else NO_WORK_ITEMS, *(Part(root=DataPart(data=item)) for item in data))
+
+    async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
+        await self.tasks.cancel(context)
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 8003))
+    card = agent_card('Group Chat Orchestrator', 'Runs the Confluence to Azure DevOps workflow across the remote agents, one session per request', port)
+    if os.environ.get("A2A_TRACE_FILE"):
+        tracer.start(os.environ["A2A_TRACE_FILE"])
+
+    executor = WorkflowExecutor(port)
+    serve(build_app(card, executor, routes=[executor.webhooks.route()] if executor.webhooks else []), port)
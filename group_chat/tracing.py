@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import json
+import os
+import threading
+import time
+
+def estimate_tokens(text: str) -> int:
+    # Rough GPT-style estimate (~4 characters per token); good enough for spotting where prompt size goes.
+    return (len(text) + 3) // 4 if text else 0
+
+class Tracer:
+    """Writes spans in Chrome Trace Event format, viewable as a flame graph in Perfetto or chrome://tracing.
+
+    Events are streamed to the file as they complete, so a crashed run still leaves a readable trace.
+    """
+
+    def __init__(self):
+        self._file = None
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._first = True
+        # Task or thread -> [lane, open spans]. A lane is freed when its last open span closes and reused after.
+        self._lanes = {}
+        self._free_lanes = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._file is not None
+
+    def start(self, path: str):
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[")
+        self._first = True
+        self._origin = time.perf_counter()
+        self._emit({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "group_chat"}})
+
+    def close(self):
+        if self._file:
+            self._file.write("\n]\n")
+            self._file.close()
+            self._file = None
+
+    def _open_lane(self) -> tuple[int, int]:
+        """Returns (key, lane) for a span starting now; concurrent asyncio tasks get their own row so overlapping spans do not interleave."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = id(task) if task else threading.get_ident()
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = [heapq.heappop(self._free_lanes) if self._free_lanes else len(self._lanes) + 1, 0]
+            lane[1] += 1
+            return key, lane[0]
+
+    def _close_lane(self, key: int):
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane:
+                lane[1] -= 1
+                if lane[1] == 0:
+                    del self._lanes[key]
+                    heapq.heappush(self._free_lanes, lane[0])
+
+    def _emit(self, event: dict):
+        with self._lock:
+            # The separator goes before each event, so the array closes without a placeholder; a crashed run's trace only lacks the "]".
+            self._file.write(("\n" if self._first else ",\n") + json.dumps(event, separators=(",", ":"), default=str))
+            self._first = False
+            self._file.flush()
+
+    def span(self, name: str, cat: str = "workflow", **args) -> "Span":
+        return Span(self, name, cat, args)
+
+    def _record(self, span: "Span", end: float):
+        if self._file:
+            self._emit({
+                "name": span.name, "cat": span.cat, "ph": "X", "pid": os.getpid(), "tid": span.lane,
+                "ts": round((span.start - self._origin) * 1e6, 1), "dur": round((end - span.start) * 1e6, 1), "args": span.args,
+            })
+
+    async def sleep(self, seconds: float):
+        with self.span("sleep", cat="wait", seconds=seconds):
+            await asyncio.sleep(seconds)
+
+    async def iterate(self, iterable, name: str, cat: str = "workflow"):
+        """Yields from an async iterator, wrapping the wait for each item in its own span."""
+        iterator = iterable.__aiter__()
+        turn = 0
+        while True:
+            with self.span(name, cat=cat, turn=turn) as args:
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    args["end"] = True
+                    return
+                args["agent"] = getattr(item, "name", None)
+            yield item
+            turn += 1
+
+class Span:
+    """Times a block; usable with both `with` and `async with`. Yields its args dict for extra attributes."""
+
+    def __init__(self, tracer: Tracer, name: str, cat: str, args: dict):
+        self.tracer, self.name, self.cat, self.args = tracer, name, cat, args
+        self.start = 0.0
+        self.lane = None
+        self._lane_key = None
+
+    def __enter__(self) -> dict:
+        if self.tracer.enabled:
+            self._lane_key, self.lane = self.tracer._open_lane()
+        self.start = time.perf_counter()
+        return self.args
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._record(self, time.perf_counter())
+        if self._lane_key is not None:
+            self.tracer._close_lane(self._lane_key)
+        return False
+
+    async def __aenter__(self) -> dict:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+tracer = Tracer()
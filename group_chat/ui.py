@@ -3,11 +3,10 @@ from rich.live import Live
 from rich.panel import Panel
 from rich.layout import Layout
 from rich.table import Table
-from rich.text import Text
-from rich.columns import Columns
 from rich.markdown import Markdown
 from datetime import datetime
 import time
+from tracing import tracer
 
 class Display:
     def __init__(self):
@@ -18,7 +17,6 @@ class Display:
         self.active_agent = None
         self.active_agent_card = None
         self.start_time = time.time()
-        self.pending_requests = []
         self.agent_cards = {}
         
         # Setup layout
@@ -67,14 +65,6 @@ class Display:
         if len(self.messages) > 15:
             self.messages = self.messages[:15]
     
-    def add_pending_request(self, request_type):
-        if request_type not in self.pending_requests:
-            self.pending_requests.append(request_type)
-    
-    def remove_pending_request(self, request_type):
-        if request_type in self.pending_requests:
-            self.pending_requests.remove(request_type)
-    
     def generate_display(self):
         # Header
         runtime = time.time() - self.start_time
@@ -96,10 +86,15 @@ class Display:
             ("COMPLETED", "Completed")
         ]
         
-        current_stage_index = next((i for i, (s, _) in enumerate(stages) if s == self.workflow_state), 0)
+        # A pipeline that ended with failed todos shows on the last row.
+        workflow_state = "COMPLETED" if self.workflow_state == "PARTIAL" else self.workflow_state
+        current_stage_index = next((i for i, (s, _) in enumerate(stages) if s == workflow_state), 0)
         
         for i, (stage, description) in enumerate(stages):
-            if stage == self.workflow_state:
+            if stage == workflow_state and self.workflow_state == "PARTIAL":
+                status = "Partial"
+                style = "bold red"
+            elif stage == workflow_state:
                 status = "Active"
                 style = "bold yellow"
             elif i < current_stage_index:
@@ -111,13 +106,7 @@ class Display:
             
             status_table.add_row(description, status, style=style)
         
-        # Add pending requests to status panel
-        status_content = [status_table]
-        if self.pending_requests:
-            pending_text = "\n".join([f"{req.replace('_', ' ')}" for req in self.pending_requests])
-            status_content.append(Text(f"Queued:\n{pending_text}", style="yellow"))
-        
-        self.layout["workflow"].update(Panel(Columns(status_content), title="Progress"))
+        self.layout["workflow"].update(Panel(status_table, title="Progress"))
         
         # Agent card panel
         if self.active_agent_card:
@@ -211,7 +200,8 @@ class UI:
     
     def update(self):
         if self.live:
-            self.live.update(self.display.generate_display())
+            with tracer.span("ui_render", cat="ui"):
+                self.live.update(self.display.generate_display())
     
     def add_message(self, role, content, agent_name=None, is_agent=False):
         self.display.add_message(role, content, agent_name, is_full_message=is_agent)
@@ -227,11 +217,3 @@ class UI:
     def update_workflow_state(self, state):
         self.display.update_workflow_state(state)
         self.update()
-    
-    def add_pending_request(self, request_type):
-        self.display.add_pending_request(request_type)
-        self.update()
-    
-    def remove_pending_request(self, request_type):
-        self.display.remove_pending_request(request_type)
-        self.update()
\ No newline at end of file
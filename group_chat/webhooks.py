@@ -0,0 +1,110 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import secrets
+from urllib.parse import urlparse
+import uvicorn
+from a2a.types import Task, TaskState
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = "X-A2A-Notification-Token"
+# Task states after which the agent sends nothing more for this request.
+DONE_STATES = (TaskState.completed, TaskState.failed, TaskState.canceled, TaskState.rejected, TaskState.input_required, TaskState.auth_required)
+
+def _loopback(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    try:
+        return host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class WebhookReceiver:
+    """Local endpoint that agents POST Task updates to, so no connection stays open while a task runs.
+
+    Agents are given `public_url` when it is set. Otherwise they get the bind address, which only agents
+    on this host can reach, so push is only used for agents at a loopback URL.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8090, path: str = "/a2a/notifications", public_url: str | None = None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.public_url = public_url
+        self.token = secrets.token_urlsafe(24)
+        self._waiters: dict[str, asyncio.Future] = {}
+        self._server = None
+        self._serve_task = None
+
+    @classmethod
+    def from_env(cls, port: int | None = None) -> "WebhookReceiver":
+        return cls(host=os.environ.get("A2A_WEBHOOK_HOST", "127.0.0.1"), port=port or int(os.environ.get("A2A_WEBHOOK_PORT", "8090")),
+                   public_url=os.environ.get("A2A_WEBHOOK_URL") or None)
+
+    @property
+    def url(self) -> str:
+        if self.public_url:
+            return self.public_url
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "::", "") else self.host
+        return f"http://{host}:{self.port}{self.path}"
+
+    def reachable_from(self, name: str, agent_urls: list[str]) -> bool:
+        """Whether every replica of the agent can deliver to `url`; otherwise the agent gets blocking requests."""
+        if self.public_url or all(_loopback(url) for url in agent_urls):
+            return True
+        logger.warning(f"Push notifications are off for {name}: it runs on another host and cannot reach {self.url}, set A2A_WEBHOOK_URL")
+        return False
+
+    def route(self) -> Route:
+        """The receiving endpoint, for mounting on an existing app instead of calling start()."""
+        return Route(self.path, self._receive, methods=["POST"], name="a2a_notifications")
+
+    async def start(self):
+        app = Starlette(routes=[self.route()])
+        self._server = uvicorn.Server(uvicorn.Config(app, host=self.host, port=self.port, log_level="warning", lifespan="off"))
+        self._serve_task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._serve_task.done():
+                raise RuntimeError(f"Webhook receiver could not start on {self.url}")
+            await asyncio.sleep(0.05)
+
+    async def stop(self):
+        if self._server:
+            self._server.should_exit = True
+            await self._serve_task
+        for waiter in self._waiters.values():
+            waiter.cancel()
+
+    def expect(self, task_id: str):
+        """Registers a task before it is sent, so an update that arrives before wait() is not lost."""
+        self._waiters.setdefault(task_id, asyncio.get_running_loop().create_future())
+
+    async def wait(self, task_id: str, timeout: float | None = None) -> Task:
+        """Waits for the task to reach a final state. The future is only dropped once it has a result."""
+        waiter = self._waiters.setdefault(task_id, asyncio.get_running_loop().create_future())
+        task = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        self._waiters.pop(task_id, None)
+        return task
+
+    def forget(self, task_id: str):
+        waiter = self._waiters.pop(task_id, None)
+        if waiter and not waiter.done():
+            waiter.cancel()
+
+    async def _receive(self, request: Request) -> Response:
+        if not secrets.compare_digest(request.headers.get(TOKEN_HEADER, ""), self.token):
+            return Response(status_code=401)
+        try:
+            task = Task.model_validate(await request.json())
+        except Exception as e:
+            logger.warning(f"Ignoring malformed push notification: {e}")
+            return Response(status_code=400)
+        waiter = self._waiters.get(task.id)
+        if waiter and not waiter.done() and task.status.state in DONE_STATES:
+            waiter.set_result(task)
+        return Response(status_code=202)
@@ -0,0 +1,375 @@
+import asyncio
+import math
+import os
+from uuid import uuid4
+import httpx
+from a2a.client import A2AClientHTTPError
+from semantic_kernel.agents import AgentGroupChat
+from semantic_kernel.agents.strategies import SelectionStrategy, TerminationStrategy
+from semantic_kernel.contents import ChatMessageContent, AuthorRole, ChatHistory
+from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion, AzureChatPromptExecutionSettings
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from a2a_agent import ConversationLog, RemoteA2AAgent
+from checkpoints import Reply, WorkflowRecord, WorkflowStore
+from pipeline import Pipeline, PipelineError
+from tracing import estimate_tokens, tracer
+from common.fakes import FakeChatCompletion, use_fake_backends
+from common.models import ModelRouter
+from common.retry import RETRYABLE_STATUS
+from common.usage import Usage, UsageLedger
+
+NO_WORK_ITEMS = "No work items to process"
+
+CONFLUENCE_QUERY = "Analyze https://aymenfurter.atlassian.net/wiki/spaces/~557058e4fa0cdeeab349c084c43e9310ea2ed3/pages/65706/2025-07-12+Besprechungsnotizen and extract todos/action items."
+
+STAGE_REQUESTS = {
+    "FORMAT_TODOS": "Format extracted todos into structured work items for Azure DevOps with titles, descriptions, types, and acceptance criteria.",
+    "CREATE_WORK_ITEMS": "Create the formatted work items in Azure DevOps. Provide confirmation with work item IDs if possible."
+}
+
+_chat_services = {}
+_model_router = None
+
+def chat_service(deployment: str | None = None):
+    """The completion client for one deployment (None: the configured default), created once and shared by every session."""
+    if deployment not in _chat_services:
+        if use_fake_backends():
+            _chat_services[deployment] = FakeChatCompletion.from_env()
+        else:
+            _chat_services[deployment] = AzureChatCompletion(deployment_name=deployment) if deployment else AzureChatCompletion()
+    return _chat_services[deployment]
+
+def model_router() -> ModelRouter:
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter.from_env("group_chat")
+    return _model_router
+
+def confident_verdict(response, min_confidence: float) -> bool:
+    """True for a clear 'true' or 'false' whose token probability, when the model reports one, reaches min_confidence."""
+    text = str(response.content).lower()
+    if ("true" in text) == ("false" in text):
+        return False
+    logprobs = getattr((getattr(response, 'metadata', None) or {}).get("logprobs"), "content", None)
+    for token in logprobs or []:
+        if token.token.strip().lower() in ("true", "false"):
+            return math.exp(token.logprob) >= min_confidence
+    return True
+
+def transient(error: BaseException | None) -> bool:
+    """True for errors a later resume can get past: a remote timeout, or a replica that was unreachable or overloaded."""
+    # The group chat wraps agent errors, so the whole cause chain counts.
+    while error is not None:
+        if isinstance(error, A2AClientHTTPError):
+            return error.status_code in RETRYABLE_STATUS
+        if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        error = error.__cause__
+    return False
+
+class WorkflowSelectionStrategy(SelectionStrategy):
+    """Picks the one agent that can move the orchestrator out of its current state."""
+
+    def __init__(self, orchestrator):
+        super().__init__()
+        object.__setattr__(self, '_orchestrator', orchestrator)
+
+    async def select_agent(self, agents, history):
+        name = self._orchestrator.stage_agents.get(self._orchestrator.state)
+        return next((agent for agent in agents if agent.name == name), agents[0])
+
+class ChatTerminationStrategy(TerminationStrategy):
+    def __init__(self, agents, ui, orchestrator, maximum_iterations: int = 15, max_stalled_turns: int = 1,
+                 usage: UsageLedger = None, workflow_id: str = None, downgrade_at: float = 0.8):
+        super().__init__(agents=agents, maximum_iterations=maximum_iterations)
+        object.__setattr__(self, '_ui', ui)
+        object.__setattr__(self, '_orchestrator', orchestrator)
+        # Token budget: past `downgrade_at` of it the LLM check is skipped, once it is used up the chat stops.
+        object.__setattr__(self, '_usage', usage)
+        object.__setattr__(self, '_workflow_id', workflow_id)
+        object.__setattr__(self, '_downgrade_at', downgrade_at)
+        # Turns in a row that left the state unchanged before the chat gives up on the stage.
+        object.__setattr__(self, '_max_stalled_turns', max_stalled_turns)
+        object.__setattr__(self, '_stalled_turns', 0)
+        object.__setattr__(self, 'termination_prompt', (
+            "Analyze a workflow that extracts todos from Confluence and creates Azure DevOps work items. "
+            "Complete when work items are created or no todos exist. Respond 'true' if complete, 'false' if not."
+        ))
+    
+    @property
+    def service(self):
+        return chat_service(model_router().tier("termination").deployment)
+    
+    async def should_agent_terminate(self, agent, history):
+        with tracer.span("termination_check", cat="termination", agent=agent.name, history_messages=len(history)) as span:
+            state = self._orchestrator.state
+            with tracer.span("orchestrator_transition", state=state):
+                should_continue, next_step = await self._orchestrator.should_continue_workflow(history[-1].content)
+            budget_used = self._budget_used()
+            if budget_used >= 1:
+                self._ui.add_message("System", f"Token budget of {self._usage.budget} used up, stopping")
+                span["terminate"] = True
+            elif self._orchestrator.state != state or next_step == NO_WORK_ITEMS:
+                # The state machine decides whenever a reply moved it; the LLM only judges replies that did not.
+                object.__setattr__(self, '_stalled_turns', 0)
+                span["terminate"] = not should_continue
+            elif self._stalled_turns >= self._max_stalled_turns or budget_used >= self._downgrade_at:
+                self._ui.add_message("System", f"{agent.name} did not advance {state}, stopping")
+                span["terminate"] = True
+            else:
+                object.__setattr__(self, '_stalled_turns', self._stalled_turns + 1)
+                span["terminate"] = await self._should_agent_terminate(agent, history)
+            return span["terminate"]
+
+    def _budget_used(self) -> float:
+        if not self._usage or not self._usage.budget:
+            return 0.0
+        return self._usage.total(self._workflow_id).total_tokens / self._usage.budget
+
+    async def _should_agent_terminate(self, agent, history):
+        if len(history) < 2:
+            return False
+            
+        last_message = history[-1].content.lower()
+            
+        try:
+            chat_history = ChatHistory()
+            chat_history.add_message(ChatMessageContent(role=AuthorRole.SYSTEM, content=self.termination_prompt))
+            
+            for msg in history[-3:]:
+                chat_history.add_message(msg)
+                
+            chat_history.add_message(ChatMessageContent(role=AuthorRole.USER, content="Complete? 'true' or 'false'."))
+            
+            prompt_chars = sum(len(str(msg.content)) for msg in chat_history.messages)
+            router = model_router()
+            # Token probabilities are only needed to decide on escalation, so they are only asked for when a larger tier exists.
+            settings = (AzureChatPromptExecutionSettings(max_tokens=10, temperature=0.1, extra_body={"logprobs": True}) if router.escalates("termination")
+                        else PromptExecutionSettings(max_tokens=10, temperature=0.1))
+
+            async def check(tier):
+                with tracer.span("termination_llm", cat="llm", tier=tier.name, prompt_chars=prompt_chars, prompt_tokens_est=prompt_chars // 4) as span:
+                    response = await chat_service(tier.deployment).get_chat_message_content(chat_history, settings=settings)
+                    span["response_tokens_est"] = estimate_tokens(response.content)
+                    usage = self._usage.record(self._workflow_id, (getattr(response, 'metadata', None) or {}).get("usage")) if self._usage else None
+                    if usage:
+                        span.update(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+                    return response
+
+            response = await router.call("termination", check, confident=lambda response: confident_verdict(response, router.min_confidence),
+                                         usage=lambda response: (getattr(response, 'metadata', None) or {}).get("usage"))
+            
+            should_terminate = "true" in response.content.lower()
+            self._ui.add_message("System", f"Termination check: {should_terminate} - {response.content}")
+            return should_terminate
+            
+        except Exception as e:
+            self._ui.add_message("System", f"Termination analysis error: {e}")
+            return any(kw in last_message for kw in ["completed", "done", "finished"])
+
+class Orchestrator:
+    def __init__(self, ui):
+        self.state = "INITIAL"
+        self.ui = ui
+        # Result of the latest reply, for the chat loop; the termination strategy drives the transitions.
+        self.last_step = (False, "")
+        self.stage_agents = {"INITIAL": "ConfluenceAgent", "TODOS_EXTRACTED": "FormatterAgent", "FORMATTED": "DevOpsAgent"}
+        self.transitions = {
+            "INITIAL": (["todo", "action item", "task", "found", "extracted"], "FORMAT_TODOS", "TODOS_EXTRACTED"),
+            "TODOS_EXTRACTED": (["assigned to", "description", "acceptance criteria", "detailed", "expand"], "CREATE_WORK_ITEMS", "FORMATTED"),
+            "FORMATTED": (["created", "success", "work items created", "installed", "completed"], None, "COMPLETED")
+        }
+        
+    async def should_continue_workflow(self, content: str) -> tuple[bool, str]:
+        self.last_step = self._next_step(content)
+        return self.last_step
+
+    def _next_step(self, content: str) -> tuple[bool, str]:
+        content_lower = content.lower()
+        
+        if "no todos" in content_lower or "no action items" in content_lower:
+            return False, NO_WORK_ITEMS
+            
+        if self.state in self.transitions:
+            keywords, next_action, next_state = self.transitions[self.state]
+            if any(kw in content_lower for kw in keywords):
+                old_state = self.state
+                self.state = next_state
+                self.ui.update_workflow_state(self.state)
+                self.ui.add_message("System", f"State transition: {old_state} -> {next_state}")
+                return next_action is not None, next_action or "Workflow completed"
+        
+        return False, "Workflow step completed"
+
+def replica_urls(variable: str, default: str) -> list[str]:
+    return [url.strip() for url in os.environ.get(variable, default).split(",") if url.strip()]
+
+
+async def connect_agents(**options) -> list[RemoteA2AAgent]:
+    """Connects to the remote agents once; sessions get per-session copies that share these connections."""
+    # <NAME>_URLS takes a comma-separated replica list. Reading and formatting are safe to retry or hedge; creating work items is not.
+    return [
+        await RemoteA2AAgent.create(replica_urls("CONFLUENCE_URLS", "http://localhost:8002"), "ConfluenceAgent", "Reads Confluence pages and extracts todos", idempotent=True, **options),
+        await RemoteA2AAgent.create(replica_urls("FORMATTER_URLS", "http://localhost:8000"), "FormatterAgent", "Formats requests into structured tickets", True, idempotent=True, **options),
+        await RemoteA2AAgent.create(replica_urls("DEVOPS_URLS", "http://localhost:8001"), "DevOpsAgent", "Creates Azure DevOps work items", **options),
+    ]
+
+class Session:
+    """One workflow run with its own orchestrator state, conversation log, remote context ids and token budget.
+
+    `agents` are the shared connections from connect_agents(); the session talks to them through its own
+    copies, so concurrent sessions never see each other's messages or remote conversations. With a
+    `store`, every state transition and pipeline item is checkpointed, and resume() continues from there.
+    """
+
+    def __init__(self, agents: list[RemoteA2AAgent], ui, usage: UsageLedger = None, session_id: str = None,
+                 max_turns: int = 15, pause: float = 0.0, store: WorkflowStore = None, checkpoint: dict = None):
+        self.id = session_id or f"workflow-{uuid4().hex}"
+        self.ui = ui
+        self.usage = usage
+        self.store = store
+        # Checkpoint values by key, restored ones included: "stage:<state>", "todos", "formatted:<n>", "created:<n>".
+        self.checkpoint = checkpoint or {}
+        self.max_turns = max_turns
+        # Seconds to wait between turns, so a terminal UI can keep up.
+        self.pause = pause
+        self.log = ConversationLog()
+        self.agents = [agent.for_session(self.log, self.id) for agent in agents]
+        self.orchestrator = Orchestrator(ui)
+        # Latest agent reply, i.e. the workflow's result once it finished.
+        self.result: ChatMessageContent | None = None
+        for agent in self.agents:
+            if agent.agent_card:
+                ui.add_agent_card(agent.name, agent.agent_card)
+
+    @classmethod
+    async def resume(cls, record: WorkflowRecord, agents: list[RemoteA2AAgent], ui, store: WorkflowStore, **options) -> "Session":
+        session = cls(agents, ui, session_id=record.id, store=store, checkpoint=await store.load(record.id), **options)
+        ui.add_message("System", f"Resuming {record.id} at {record.state} ({len(session.checkpoint)} checkpoints)")
+        return session
+
+    async def _pause(self):
+        if self.pause:
+            await tracer.sleep(self.pause)
+
+    async def save(self, key: str, value, state: str | None = None):
+        self.checkpoint[key] = value
+        if self.store:
+            await self.store.put(self.id, key, value, state)
+
+    async def run(self, query: str = CONFLUENCE_QUERY, pipeline: bool = False):
+        mode = "pipeline" if pipeline else "chat"
+        if self.store:
+            await self.store.create(self.id, query, mode)
+        with tracer.span("session", session=self.id, mode=mode, resumed=bool(self.checkpoint)) as span:
+            try:
+                await (self.run_pipeline(query) if pipeline else self.run_chat(query))
+            except Exception as e:
+                # Interrupts, cancellations and transient errors leave the workflow running, so it resumes on the next start.
+                if self.store and not transient(e):
+                    await self.store.finish(self.id, "failed", str(e))
+                raise
+            finally:
+                total = self.tokens()
+                span.update(prompt_tokens=total.prompt_tokens, completion_tokens=total.completion_tokens)
+        if self.store:
+            await self.store.finish(self.id, "completed", str(self.result.content) if self.result else None, self.orchestrator.state)
+
+    async def cancel(self):
+        """Stops the session for good: it is not resumed later, and its remote tasks are cancelled."""
+        if self.store:
+            await self.store.finish(self.id, "canceled")
+        await self.cancel_pending()
+
+    async def run_pipeline(self, query: str):
+        # Streaming mode: each todo moves on to the next agent as soon as it is ready.
+        self.ui.add_message("User", query)
+        pipeline = Pipeline(*self.agents, self.ui,
+                            concurrency=int(os.environ.get("PIPELINE_CONCURRENCY", "4")),
+                            queue_size=int(os.environ.get("PIPELINE_QUEUE", "4")),
+                            checkpoint=self.checkpoint, save=self.save)
+        with tracer.span("pipeline", cat="pipeline"):
+            items = await pipeline.run(query)
+        failed = [item for item in items if item.error]
+        retry = next((item.exception for item in failed if transient(item.exception)), None)
+        if retry:
+            # Left running: resume skips the items that have a created: checkpoint and retries the others.
+            self.ui.add_message("System", f"Pipeline interrupted: {len(failed)}/{len(items)} todos failed")
+            raise PipelineError(f"{len(failed)} of {len(items)} todos failed: {failed[0].error}") from retry
+        if failed and len(failed) == len(items):
+            self.ui.add_message("System", f"Pipeline failed: all {len(items)} todos failed")
+            raise PipelineError(f"all {len(items)} todos failed: {failed[0].error}") from failed[0].exception
+        created = [Reply.of(item.created) for item in items if item.created]
+        # One reply per item: the result joins all of them, so every created id and DataPart reaches the caller.
+        content = "\n\n".join(reply.content for reply in created)
+        if failed:
+            content += "\n\nFailed:\n" + "\n".join(f"- Todo {item.index} ({item.todo.title}): {item.error}" for item in failed)
+        self.result = Reply(name=created[0].name, content=content,
+                            data=[part for reply in created for part in reply.data]).message() if created else None
+        self.ui.add_message("System", f"Pipeline finished: {len(created)}/{len(items)} work items created" + (f", {len(failed)} failed" if failed else ""))
+        # PARTIAL: the workflow ended, but some todos have no work item; the result lists them.
+        self.orchestrator.state = "PARTIAL" if failed else "COMPLETED"
+        self.ui.update_workflow_state(self.orchestrator.state)
+
+    async def run_chat(self, query: str):
+        ui, orchestrator = self.ui, self.orchestrator
+        chat = AgentGroupChat(agents=self.agents, chat_history=self.log, selection_strategy=WorkflowSelectionStrategy(orchestrator),
+                              termination_strategy=ChatTerminationStrategy(self.agents, ui, orchestrator, self.max_turns, usage=self.usage, workflow_id=self.id,
+                                                                           downgrade_at=float(os.environ.get("WORKFLOW_TOKEN_DOWNGRADE", "0.8"))))
+
+        await chat.add_chat_message(ChatMessageContent(role=AuthorRole.USER, content=query))
+        ui.add_message("User", query)
+
+        reached = [state for _, _, state in orchestrator.transitions.values()]
+        stages = {state: Reply.model_validate(self.checkpoint[f"stage:{state}"]) for state in reached if f"stage:{state}" in self.checkpoint}
+        if stages:
+            # Replies of finished stages go back into the conversation, and the orchestrator continues after the last one.
+            await chat.add_chat_messages([reply.message() for reply in stages.values()])
+            orchestrator.state = list(stages)[-1]
+            ui.update_workflow_state(orchestrator.state)
+            self.result = chat.history.messages[-1]
+            if orchestrator.state not in orchestrator.stage_agents:
+                ui.add_message("System", "Workflow completed before the restart")
+                return
+            step = next((action for _, action, state in orchestrator.transitions.values() if state == orchestrator.state), None)
+            if step in STAGE_REQUESTS:
+                self._request_stage(step)
+
+        async for content in tracer.iterate(chat.invoke(), "chat_turn"):
+            await self._on_reply(content)
+            should_continue, next_step = orchestrator.last_step
+            if should_continue and next_step in STAGE_REQUESTS:
+                self._request_stage(next_step)
+            elif not should_continue:
+                ui.add_message("System", next_step)
+            await self._pause()
+
+        await chat.reset()
+        ui.add_message("System", "Workflow completed successfully!")
+        ui.update_workflow_state("COMPLETED")
+
+    def _request_stage(self, step: str):
+        """Adds the next stage's instruction to the log, where the agent the chat selects next reads it with its turn."""
+        # The chat is still iterating, so the message goes straight into the shared log rather than through add_chat_message.
+        self.log.add_message(ChatMessageContent(role=AuthorRole.USER, content=STAGE_REQUESTS[step]))
+        self.ui.add_message("System", f"Requesting {step}")
+
+    async def _on_reply(self, content: ChatMessageContent):
+        self._show(content)
+        # The reply that moved the orchestrator into a state is that stage's checkpoint.
+        state = self.orchestrator.state
+        if state != "INITIAL" and f"stage:{state}" not in self.checkpoint:
+            await self.save(f"stage:{state}", Reply.of(content).model_dump(), state)
+
+    def _show(self, content: ChatMessageContent):
+        self.result = content
+        agent_card = next((agent.agent_card for agent in self.agents if agent.name == content.name), None)
+        self.ui.set_active_agent(content.name or content.role, agent_card)
+        self.ui.add_message(content.name or content.role, content.content, content.name, is_agent=True)
+
+    def tokens(self):
+        return self.usage.total(self.id) if self.usage else Usage()
+
+    async def cancel_pending(self):
+        """Stops remote work the session no longer waits for (interrupt, error or early termination)."""
+        await asyncio.wait([asyncio.create_task(agent.cancel_pending()) for agent in self.agents], timeout=5)
@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AGENT_CARD_PATH = "/.well-known/agent.json"
+# 503 while the worker is starting up or failed setup, see common/readiness.py.
+READY_PATH = "/ready"
+TASK_METHODS = ("tasks/get", "tasks/cancel", "tasks/resubscribe", "tasks/pushNotificationConfig/get",
+                "tasks/pushNotificationConfig/set", "tasks/pushNotificationConfig/list", "tasks/pushNotificationConfig/delete")
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+class HashRing:
+    """Consistent hash ring with virtual nodes: adding or removing a worker only moves the keys it owns."""
+
+    def __init__(self, replicas: int = 128):
+        self.replicas = replicas
+        self._keys = []
+        self._nodes = {}
+
+    def add(self, node: str):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if point not in self._nodes:
+                bisect.insort(self._keys, point)
+                self._nodes[point] = node
+
+    def remove(self, node: str):
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._keys.pop(bisect.bisect_left(self._keys, point))
+
+    def get(self, key: str) -> str | None:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[self._keys[index]]
+
+    @property
+    def nodes(self) -> set[str]:
+        return set(self._nodes.values())
+
+class Worker:
+    def __init__(self, url: str, process: subprocess.Popen | None = None):
+        self.url = url.rstrip("/")
+        self.process = process
+        self.healthy = False
+        self.saturated = False
+        self.failures = 0
+        self.in_flight = 0
+        self.requests = 0
+
+class Router:
+    def __init__(self, public_url: str, health_interval: float = 5.0, unhealthy_after: int = 2, task_cache: int = 100_000):
+        self.public_url = public_url
+        self.health_interval = health_interval
+        self.unhealthy_after = unhealthy_after
+        self.workers: dict[str, Worker] = {}
+        self.ring = HashRing()
+        self.agent_card = None
+        # Task ids are minted by the worker, so follow-up task calls are routed by where the task was created.
+        self.task_owner = OrderedDict()
+        self.task_cache = task_cache
+        self.client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0), limits=httpx.Limits(max_connections=1000, max_keepalive_connections=200))
+
+    def add_worker(self, url: str, process=None) -> Worker:
+        worker = self.workers.setdefault(url.rstrip("/"), Worker(url, process))
+        return worker
+
+    def remove_worker(self, url: str):
+        worker = self.workers.pop(url.rstrip("/"), None)
+        if worker:
+            self.ring.remove(worker.url)
+            if worker.process:
+                worker.process.terminate()
+
+    def _set_health(self, worker: Worker, healthy: bool):
+        if healthy:
+            worker.failures = 0
+            if not worker.healthy:
+                worker.healthy = True
+                self.ring.add(worker.url)
+                logger.info(f"Worker {worker.url} joined the ring")
+        else:
+            worker.failures += 1
+            if worker.healthy and worker.failures >= self.unhealthy_after:
+                worker.healthy = False
+                self.ring.remove(worker.url)
+                logger.warning(f"Worker {worker.url} left the ring after {worker.failures} failed health checks")
+
+    async def check(self, worker: Worker):
+        try:
+            ready = await self.client.get(worker.url + READY_PATH, timeout=3.0)
+            ready.raise_for_status()
+            # Only shown in /router/status: a saturated worker keeps its contexts and sheds new requests itself.
+            worker.saturated = ready.json().get("status") == "saturated"
+            if self.agent_card is None:
+                response = await self.client.get(worker.url + AGENT_CARD_PATH, timeout=3.0)
+                response.raise_for_status()
+                card = response.json()
+                card["url"] = self.public_url
+                self.agent_card = card
+            self._set_health(worker, True)
+        except Exception:
+            self._set_health(worker, False)
+
+    async def health_loop(self):
+        while True:
+            await asyncio.gather(*(self.check(worker) for worker in list(self.workers.values())))
+            await asyncio.sleep(self.health_interval)
+
+    def _routing_key(self, payload: dict) -> tuple[str | None, str | None]:
+        """Returns (key for the hash ring, task id whose owner should be used instead)."""
+        method = payload.get("method")
+        params = payload.get("params") or {}
+        if method in TASK_METHODS:
+            return None, params.get("id") or params.get("taskId")
+        message = params.get("message") or {}
+        if message.get("taskId") and message["taskId"] in self.task_owner:
+            return None, message["taskId"]
+        return message.get("contextId") or str(payload.get("id")), None
+
+    def pick(self, payload: dict) -> Worker | None:
+        key, task_id = self._routing_key(payload)
+        if task_id:
+            owner = self.task_owner.get(task_id)
+            worker = self.workers.get(owner) if owner else None
+            if worker and worker.healthy:
+                return worker
+            key = task_id
+        url = self.ring.get(key)
+        return self.workers.get(url) if url else None
+
+    def remember_task(self, body: bytes, worker: Worker):
+        try:
+            result = json.loads(body).get("result") or {}
+        except ValueError:
+            return
+        if result.get("kind") == "task" and result.get("id"):
+            self.task_owner[result["id"]] = worker.url
+            self.task_owner.move_to_end(result["id"])
+            while len(self.task_owner) > self.task_cache:
+                self.task_owner.popitem(last=False)
+
+    async def handle_rpc(self, request: Request) -> Response:
+        body = await request.body()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return JSONResponse({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+        worker = self.pick(payload)
+        if not worker:
+            return JSONResponse({"jsonrpc": "2.0", "id": payload.get("id"), "error": {"code": -32603, "message": "No healthy workers"}}, status_code=503)
+
+        worker.in_flight += 1
+        worker.requests += 1
+        upstream = self.client.build_request("POST", worker.url + "/", content=body, headers={"content-type": "application/json"})
+        try:
+            response = await self.client.send(upstream, stream=True)
+        except httpx.TransportError:
+            worker.in_flight -= 1
+            self._set_health(worker, False)
+            return JSONResponse({"jsonrpc": "2.0", "id": payload.get("id"), "error": {"code": -32603, "message": f"Worker {worker.url} unavailable"}}, status_code=502)
+
+        if response.headers.get("content-type", "").startswith("text/event-stream"):
+            async def relay():
+                try:
+                    async for chunk in response.aiter_raw():
+                        yield chunk
+                finally:
+                    await response.aclose()
+                    worker.in_flight -= 1
+            return StreamingResponse(relay(), status_code=response.status_code, media_type="text/event-stream")
+
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+            worker.in_flight -= 1
+        self.remember_task(content, worker)
+        headers = {"retry-after": response.headers["retry-after"]} if "retry-after" in response.headers else None
+        return Response(content, status_code=response.status_code, headers=headers, media_type=response.headers.get("content-type"))
+
+    async def handle_agent_card(self, request: Request) -> Response:
+        if self.agent_card is None:
+            return JSONResponse({"error": "No healthy workers yet"}, status_code=503)
+        return JSONResponse(self.agent_card)
+
+    async def handle_status(self, request: Request) -> Response:
+        return JSONResponse({"workers": [
+            {"url": w.url, "healthy": w.healthy, "saturated": w.saturated, "in_flight": w.in_flight, "requests": w.requests, "failures": w.failures}
+            for w in self.workers.values()
+        ], "tracked_tasks": len(self.task_owner)})
+
+    async def handle_workers(self, request: Request) -> Response:
+        url = (await request.json()).get("url")
+        if not url:
+            return JSONResponse({"error": "url is required"}, status_code=400)
+        if request.method == "POST":
+            await self.check(self.add_worker(url))
+        else:
+            self.remove_worker(url)
+        return await self.handle_status(request)
+
+    def build(self) -> Starlette:
+        @asynccontextmanager
+        async def lifespan(app):
+            await asyncio.gather(*(self.check(worker) for worker in self.workers.values()))
+            health = asyncio.create_task(self.health_loop())
+            yield
+            health.cancel()
+            await self.client.aclose()
+            for worker in self.workers.values():
+                if worker.process:
+                    worker.process.terminate()
+
+        return Starlette(routes=[
+            Route("/", self.handle_rpc, methods=["POST"]),
+            Route(AGENT_CARD_PATH, self.handle_agent_card, methods=["GET"]),
+            Route("/router/status", self.handle_status, methods=["GET"]),
+            Route("/router/workers", self.handle_workers, methods=["POST", "DELETE"]),
+        ], lifespan=lifespan)
+
+def spawn_workers(agent_dir: str, count: int, base_port: int) -> list[tuple[str, subprocess.Popen]]:
+    workers = []
+    for i in range(count):
+        port = base_port + i
+        process = subprocess.Popen([sys.executable, "main.py"], cwd=agent_dir, env={**os.environ, "PORT": str(port)})
+        workers.append((f"http://localhost:{port}", process))
+    return workers
+
+def main():
+    parser = argparse.ArgumentParser(description="Context-affinity router that spreads A2A requests across agent worker processes.")
+    parser.add_argument("--port", type=int, default=8001, help="Port the router listens on")
+    parser.add_argument("--public-url", help="URL advertised in the shared agent card (default: http://localhost:<port>/)")
+    parser.add_argument("--worker", action="append", default=[], help="URL of an already running worker (repeatable)")
+    parser.add_argument("--spawn", help="Agent folder to start workers from, e.g. devops_agent")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Number of workers to spawn")
+    parser.add_argument("--base-port", type=int, default=9100, help="First port for spawned workers")
+    parser.add_argument("--health-interval", type=float, default=5.0, help="Seconds between worker health checks")
+    args = parser.parse_args()
+
+    router = Router(args.public_url or f"http://localhost:{args.port}/", health_interval=args.health_interval)
+    for url in args.worker:
+        router.add_worker(url)
+    if args.spawn:
+        agent_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", args.spawn)
+        for url, process in spawn_workers(agent_dir, args.workers, args.base_port):
+            router.add_worker(url, process)
+    if not router.workers:
+        parser.error("Provide --worker URLs or --spawn an agent folder")
+
+    logger.info(f"Routing to {len(router.workers)} workers on http://localhost:{args.port}")
+    uvicorn.run(router.build(), host='0.0.0.0', port=args.port)
+
+if __name__ == "__main__":
+    main()
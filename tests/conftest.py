@@ -0,0 +1,25 @@
+import importlib.util
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The agents import their siblings by module name, the way they run from their own directory.
+sys.path[:0] = [ROOT, os.path.join(ROOT, "group_chat")]
+
+def load_module(relative_path: str, name: str):
+    """Imports an agent's main.py under its own name, since every agent calls it main."""
+    path = os.path.join(ROOT, relative_path)
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def load():
+    return load_module
@@ -0,0 +1,105 @@
+import asyncio
+from uuid import uuid4
+import httpx
+import pytest
+from a2a.types import Message, Part, SendMessageResponse, SendMessageSuccessResponse, TextPart
+from a2a_agent import RemoteA2AAgent
+from checkpoints import WorkflowStore
+from pipeline import PipelineError
+from service import SessionLog
+from workflow import Session
+
+REPLIES = {
+    "ConfluenceAgent": "Found these todos:\n1. Update the onboarding guide",
+    "FormatterAgent": "Title: Update the onboarding guide\nDescription: Bring the guide up to date\nAcceptance Criteria: Reviewed",
+    "DevOpsAgent": "Work items created successfully:\n- #1001 Update the onboarding guide",
+}
+
+class StubClient:
+    """Answers message/send for one agent, raising `errors` first."""
+
+    def __init__(self, name: str, errors=(), reply: str = None):
+        self.name = name
+        self.reply = reply or REPLIES[name]
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def send_message(self, request):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        reply = Message(role="agent", messageId=uuid4().hex, parts=[Part(root=TextPart(text=self.reply))])
+        return SendMessageResponse(root=SendMessageSuccessResponse(id=request.id, result=reply))
+
+    async def cancel_task(self, request):
+        pass
+
+def agents(clients):
+    return [RemoteA2AAgent(name=client.name, description=client.name, a2a_client=client) for client in clients]
+
+def test_workflow_interrupted_by_a_transient_error_resumes_at_the_failed_stage(tmp_path, monkeypatch):
+    monkeypatch.setenv("A2A_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LATENCY", "fixed:0")
+    store = WorkflowStore(str(tmp_path / "workflows.db"))
+    clients = [StubClient("ConfluenceAgent"), StubClient("FormatterAgent"), StubClient("DevOpsAgent", [ConnectionError("No replica of DevOpsAgent is reachable")])]
+
+    async def interrupted():
+        session = Session(agents(clients), SessionLog("first"), store=store)
+        try:
+            await session.run("Extract the todos")
+        except Exception:
+            pass
+        return await store.unfinished()
+
+    unfinished = asyncio.run(interrupted())
+    assert [record.state for record in unfinished] == ["FORMATTED"]
+
+    async def resumed():
+        session = await Session.resume(unfinished[0], agents(clients), SessionLog("resumed"), store)
+        await session.run(unfinished[0].query)
+        return session
+
+    session = asyncio.run(resumed())
+    assert "#1001" in str(session.result.content)
+    assert asyncio.run(store.unfinished()) == []
+    assert [client.calls for client in clients] == [1, 1, 2]
+    store.close()
+
+def test_pipeline_interrupted_by_a_transient_error_resumes_only_the_failed_todos(tmp_path, monkeypatch):
+    monkeypatch.setenv("A2A_BACKEND", "fake")
+    monkeypatch.setenv("PIPELINE_CONCURRENCY", "1")
+    store = WorkflowStore(str(tmp_path / "workflows.db"))
+    clients = [StubClient("ConfluenceAgent", reply="Found these todos:\n1. Update the onboarding guide\n2. Review the API"),
+               StubClient("FormatterAgent"), StubClient("DevOpsAgent", [httpx.ConnectError("Connection refused")])]
+
+    async def interrupted():
+        session = Session(agents(clients), SessionLog("first"), store=store)
+        with pytest.raises(PipelineError):
+            await session.run("Extract the todos", pipeline=True)
+        return await store.unfinished()
+
+    unfinished = asyncio.run(interrupted())
+    assert [(record.mode, record.status) for record in unfinished] == [("pipeline", "running")]
+
+    async def resumed():
+        session = await Session.resume(unfinished[0], agents(clients), SessionLog("resumed"), store)
+        await session.run(unfinished[0].query, pipeline=True)
+
+    asyncio.run(resumed())
+    assert asyncio.run(store.unfinished()) == []
+    assert [client.calls for client in clients] == [1, 2, 3]
+    store.close()
+
+def test_pipeline_extraction_error_is_not_a_completed_workflow(tmp_path, monkeypatch):
+    monkeypatch.setenv("A2A_BACKEND", "fake")
+    store = WorkflowStore(str(tmp_path / "workflows.db"))
+    clients = [StubClient("ConfluenceAgent", [httpx.ConnectError("Connection refused")]), StubClient("FormatterAgent"), StubClient("DevOpsAgent")]
+
+    async def run():
+        session = Session(agents(clients), SessionLog("first"), store=store)
+        with pytest.raises(httpx.ConnectError):
+            await session.run("Extract the todos", pipeline=True)
+        return await store.unfinished()
+
+    assert [record.status for record in asyncio.run(run())] == ["running"]
+    store.close()
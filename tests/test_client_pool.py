@@ -0,0 +1,14 @@
+from common import client_pool
+from common.client_pool import ClientPool
+
+def test_least_recently_used_contexts_are_forgotten(monkeypatch):
+    monkeypatch.setattr(client_pool, "MAX_CONTEXTS", 3)
+    forgotten = []
+    pool = ClientPool("test", factory=object, size=2, on_recycle=forgotten.extend)
+    pool.start()
+    for context_id in ("a", "b", "c", "a", "d", "e"):
+        pool._pick(context_id)
+
+    assert list(pool.affinity) == ["a", "d", "e"]
+    assert forgotten == ["b", "c"]
+    assert set().union(*(member.contexts for member in pool.clients)) == {"a", "d", "e"}
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from common.fakes import FAKE_ENV_DEFAULTS, FakeConfluencePages, FakeProfile, FakeResponsesClient, fake_atlassian_token
+from common.work_items import TODOS, Todo, read_items
+
+class StubTask:
+    def __init__(self):
+        self.metadata = {}
+        self.text = None
+        self.todos = []
+
+    async def reply(self, text, *parts):
+        self.text = text
+        self.todos = read_items(parts, TODOS, Todo) or []
+
+    async def fail(self, text):
+        self.text = text
+        self.failed = True
+
+class PageWithoutAnswer:
+    """Fake Responses API that returns no message, once, for the pages listed."""
+
+    def __init__(self, *page_ids):
+        self.fake = FakeResponsesClient(FakeProfile({step: "fixed:0" for step in FakeResponsesClient.DEFAULT_LATENCY}), todo_count=2)
+        self.page_ids = set(page_ids)
+        self.responses = self
+
+    async def create(self, input, **kwargs):
+        response = await self.fake.responses.create(input=input, **kwargs)
+        page_id = next((page_id for page_id in self.page_ids if page_id in input[-1]["content"]), None)
+        if page_id:
+            self.page_ids.discard(page_id)
+            response.output = [item for item in response.output if item.type != "message"]
+        return response
+
+@pytest.fixture
+def confluence(load, monkeypatch, tmp_path):
+    for key, value in FAKE_ENV_DEFAULTS.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setenv("CONFLUENCE_SYNC_DB", str(tmp_path / "sync.db"))
+    return load("confluence_agent/main.py", "confluence_main")
+
+def test_page_without_an_answer_is_extracted_again_on_the_next_sync(confluence):
+    pages = FakeConfluencePages(FakeProfile({"list_pages": "fixed:0"}), page_count=3)
+    executor = confluence.ConfluenceA2AExecutor(client=PageWithoutAnswer("65701"), token_provider=fake_atlassian_token, pages=pages)
+    context = SimpleNamespace(context_id="sync", message=SimpleNamespace(metadata={"sync": "ENG"}, parts=[]))
+
+    first, second = StubTask(), StubTask()
+    asyncio.run(executor._sync(context, first, "ENG", None))
+    asyncio.run(executor._sync(context, second, "ENG", None))
+
+    assert "1 pages failed" in first.text
+    assert len(first.todos) == 4
+    assert second.text.startswith("Synced ENG: 1 of 3 pages changed, 2 new todos.")
+    assert len(second.todos) == 2
+
+def test_token_budget_covers_the_whole_sync(confluence, monkeypatch):
+    monkeypatch.setenv("SYNC_CONCURRENCY", "1")
+    pages = FakeConfluencePages(FakeProfile({"list_pages": "fixed:0"}), page_count=3)
+    client = FakeResponsesClient(FakeProfile({step: "fixed:0" for step in FakeResponsesClient.DEFAULT_LATENCY}), todo_count=2)
+    executor = confluence.ConfluenceA2AExecutor(client=client, token_provider=fake_atlassian_token, pages=pages)
+    context = SimpleNamespace(context_id="sync", message=SimpleNamespace(metadata={"sync": "ENG"}, parts=[]))
+
+    first, second = StubTask(), StubTask()
+    asyncio.run(executor._sync(context, first, "ENG", 1))
+    asyncio.run(executor._sync(context, second, "ENG", None))
+
+    assert first.failed
+    assert first.text.startswith("Error: token budget exhausted: sync of ENG stopped after 1 of 3 changed pages, 2 new todos")
+    assert second.text.startswith("Synced ENG: 2 of 3 pages changed, 4 new todos.")
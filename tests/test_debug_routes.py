@@ -0,0 +1,22 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+from common.debug import debug_routes
+
+AUTH = {"Authorization": "Bearer secret"}
+
+@pytest.fixture
+def client():
+    return TestClient(Starlette(routes=debug_routes("secret")))
+
+@pytest.mark.parametrize("query", ["seconds=abc", "seconds=nan", "seconds=-1", "limit=x", "sort=bogus"])
+def test_profile_rejects_bad_parameters(client, query):
+    assert client.get(f"/debug/profile?{query}", headers=AUTH).status_code == 400
+
+def test_profile_runs_with_valid_parameters(client):
+    response = client.get("/debug/profile?seconds=0.01&sort=tottime&limit=5", headers=AUTH)
+    assert response.status_code == 200
+    assert "function calls" in response.text
+
+def test_profile_needs_the_token(client):
+    assert client.get("/debug/profile?seconds=0.01").status_code == 403
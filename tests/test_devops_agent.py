@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from a2a.types import Part, TextPart
+from common.fakes import FakeAgentsClient, FakeBackendError, FakeProfile
+from common.work_items import WorkItem
+
+class StubTask:
+    def __init__(self):
+        self.metadata = {}
+        self.outcome = None
+
+    def on_cancel(self, callback):
+        pass
+
+    async def reply(self, text, *parts):
+        self.outcome = ("completed", text)
+
+    async def fail(self, text):
+        self.outcome = ("failed", text)
+
+@pytest.fixture
+def devops(load, monkeypatch):
+    monkeypatch.setenv("RETRY_BASE_DELAY", "0")
+    monkeypatch.setenv("RUN_POLL_INTERVAL", "0")
+    return load("devops_agent/main.py", "devops_main")
+
+def run_failing(devops, tools) -> tuple[StubTask, FakeAgentsClient]:
+    profile = FakeProfile({step: "fixed:0" for step in FakeAgentsClient.DEFAULT_LATENCY})
+    profile.failure_rates["run"] = 1.0
+    client = FakeAgentsClient(profile, poll_interval=0)
+    executor = devops.DevOpsA2AExecutor(agents_client=client)
+    executor.agent = client.create_agent(model="fake-model", name="devops", tools=tools)
+    executor.readiness.state = "ready"
+    message = SimpleNamespace(parts=[Part(root=TextPart(text="Create: Update the guide"))], metadata=None)
+    context = SimpleNamespace(message=message, context_id="context", get_user_input=lambda: "Create: Update the guide")
+    task = StubTask()
+    asyncio.run(executor._execute(context, task))
+    return task, client
+
+def test_failed_run_that_called_the_tool_is_not_retried(devops):
+    task, client = run_failing(devops, tools=[{"type": "openapi"}])
+    assert task.outcome[0] == "failed"
+    assert len(client.run_state) == 1
+
+def test_failed_run_without_tool_calls_is_retried(devops):
+    task, client = run_failing(devops, tools=[])
+    assert task.outcome[0] == "failed"
+    assert len(client.run_state) == devops.RetryPolicy.from_env("devops").max_attempts
+
+@pytest.mark.parametrize("step", ["messages_create", "runs_create"])
+def test_create_that_failed_with_a_server_error_is_not_retried(devops, monkeypatch, step):
+    calls = []
+
+    def fails(profile, name):
+        calls.append(name)
+        return name == step
+    monkeypatch.setattr(FakeProfile, "fails", fails)
+    monkeypatch.setattr(FakeProfile, "error", lambda profile, name: FakeBackendError(503, name))
+    task, _ = run_failing(devops, tools=[])
+    assert task.outcome[0] == "failed"
+    assert calls.count(step) == 1
+
+class FlakyLogicApp:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def create(self, item):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return item.model_copy(update={"id": 1000 + self.calls})
+
+@pytest.mark.parametrize("error, calls", [(FakeBackendError(503, "create_work_item"), 1), (FakeBackendError(429, "create_work_item"), 2),
+                                          (httpx.ConnectError("Connection refused"), 2), (httpx.ReadTimeout("timed out"), 1)])
+def test_direct_create_retries_only_requests_that_never_reached_the_logic_app(devops, error, calls):
+    logic_app = FlakyLogicApp(error)
+    executor = devops.DevOpsA2AExecutor(agents_client=FakeAgentsClient(), logic_app=logic_app)
+    asyncio.run(executor._create_directly(StubTask(), [WorkItem(title="Update the guide")]))
+    assert logic_app.calls == calls
@@ -0,0 +1,94 @@
+import asyncio
+from uuid import uuid4
+import httpx
+from semantic_kernel.contents import ChatMessageContent
+from common.work_items import CREATED, WORK_ITEMS, data_part, read_items, WorkItem
+
+class StubAgent:
+    """A remote agent that answers from `reply(prompt, data)` instead of over A2A."""
+
+    def __init__(self, name: str, reply):
+        self.name = name
+        self.agent_card = None
+        self.reply = reply
+
+    def for_session(self, log, session_id):
+        return self
+
+    async def send(self, prompt, context_id=None, data=None):
+        content, parts = self.reply(prompt, data)
+        return ChatMessageContent(role="assistant", name=self.name, content=content, metadata={"a2a_data": parts} if parts else {})
+
+    async def cancel_pending(self):
+        pass
+
+def stub_agents():
+    created_ids = iter(range(1001, 1100))
+
+    def format_todo(prompt, data):
+        title = data[0]["items"][0]["title"]
+        return f"Title: {title}", [data_part(WORK_ITEMS, [WorkItem(title=title)]).root.data]
+
+    def create(prompt, data):
+        item = read_items(data, WORK_ITEMS, WorkItem)[0].model_copy(update={"id": next(created_ids)})
+        return f"- #{item.id} {item.title}", [data_part(CREATED, [item]).root.data]
+
+    return [
+        StubAgent("ConfluenceAgent", lambda prompt, data: ("1. Update the guide\n2. Review the API\n3. Plan the release", None)),
+        StubAgent("FormatterAgent", format_todo),
+        StubAgent("DevOpsAgent", create),
+    ]
+
+async def send_pipeline(app) -> dict:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://orchestrator") as client:
+        response = await client.post("/", json={"jsonrpc": "2.0", "id": 1, "method": "message/send", "params": {"message": {
+            "role": "user", "kind": "message", "messageId": uuid4().hex, "metadata": {"mode": "pipeline"},
+            "parts": [{"kind": "text", "text": "Extract the todos"}]}}})
+    return response.json()["result"]
+
+def run_pipeline(monkeypatch, agents) -> dict:
+    monkeypatch.setenv("A2A_PUSH", "0")
+    monkeypatch.delenv("A2A_CHECKPOINTS", raising=False)
+    import service
+    from common.server import agent_card, build_app
+
+    executor = service.WorkflowExecutor(8003)
+    executor.agents = agents
+    executor.readiness.state = "ready"
+    return asyncio.run(send_pipeline(build_app(agent_card("Orchestrator", "test", 8003), executor)))
+
+def rejecting(titles, agents):
+    """The stub agents, with DevOps rejecting the work items in `titles`."""
+    devops = agents[-1]
+    create = devops.reply
+
+    def reply(prompt, data):
+        if read_items(data, WORK_ITEMS, WorkItem)[0].title in titles:
+            raise ValueError("work item type not allowed")
+        return create(prompt, data)
+    devops.reply = reply
+    return agents
+
+def test_pipeline_reply_returns_every_created_work_item(monkeypatch):
+    task = run_pipeline(monkeypatch, stub_agents())
+
+    assert task["status"]["state"] == "completed"
+    parts = task["status"]["message"]["parts"]
+    for work_item_id in (1001, 1002, 1003):
+        assert f"#{work_item_id}" in parts[0]["text"]
+    created = [item.id for part in parts[1:] for item in read_items([part["data"]], CREATED, WorkItem)]
+    assert sorted(created) == [1001, 1002, 1003]
+
+def test_pipeline_reply_lists_the_todos_that_failed(monkeypatch):
+    task = run_pipeline(monkeypatch, rejecting({"Review the API"}, stub_agents()))
+
+    assert task["status"]["state"] == "completed"
+    text = task["status"]["message"]["parts"][0]["text"]
+    assert "#1001" in text and "#1002" in text
+    assert "Failed:\n- Todo 2 (Review the API): create: work item type not allowed" in text
+
+def test_pipeline_fails_when_every_todo_failed(monkeypatch):
+    task = run_pipeline(monkeypatch, rejecting({"Update the guide", "Review the API", "Plan the release"}, stub_agents()))
+
+    assert task["status"]["state"] == "failed"
+    assert "all 3 todos failed" in task["status"]["message"]["parts"][0]["text"]
@@ -0,0 +1,46 @@
+import asyncio
+from uuid import uuid4
+import httpx
+from a2a.server.agent_execution import AgentExecutor
+from a2a.types import Message, MessageSendConfiguration, MessageSendParams, Part, PushNotificationConfig, TaskState, TextPart
+from common.push import TOKEN_HEADER, NonBlockingRequestHandler
+from common.tasks import TaskTracker
+
+class SlowExecutor(AgentExecutor):
+    def __init__(self):
+        self.tasks = TaskTracker("slow")
+        self.release = asyncio.Event()
+
+    async def execute(self, context, event_queue):
+        async with self.tasks.start(context, event_queue) as running:
+            await self.release.wait()
+            await running.reply("Done")
+
+    async def cancel(self, context, event_queue):
+        await self.tasks.cancel(context)
+
+def test_non_blocking_send_returns_the_submitted_task_and_pushes_the_result():
+    posts = []
+
+    def receive(request):
+        posts.append((request.headers.get(TOKEN_HEADER), request.read()))
+        return httpx.Response(200)
+
+    async def send():
+        executor = SlowExecutor()
+        handler = NonBlockingRequestHandler(executor)
+        handler.push_sender.client = httpx.AsyncClient(transport=httpx.MockTransport(receive))
+        message = Message(role="user", messageId=uuid4().hex, parts=[Part(root=TextPart(text="Create: Update the guide"))])
+        task = await handler.on_message_send(MessageSendParams(message=message, configuration=MessageSendConfiguration(
+            blocking=False, acceptedOutputModes=["text"], pushNotificationConfig=PushNotificationConfig(url="http://chat/webhook", token="secret"))))
+        submitted = task.status.state
+        executor.release.set()
+        await asyncio.wait(set(handler.background))
+        return submitted, await handler.task_store.get(task.id), await handler.push_sender.config_store.get_info(task.id)
+
+    submitted, finished, configs = asyncio.run(send())
+    assert submitted == TaskState.submitted
+    assert finished.status.state == TaskState.completed
+    assert {token for token, _ in posts} == {"secret"}
+    assert b'"completed"' in posts[-1][1]
+    assert configs == []
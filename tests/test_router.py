@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+import httpx
+from starlette.applications import Starlette
+from starlette.testclient import TestClient
+from common.readiness import Readiness
+
+def worker(request: httpx.Request) -> httpx.Response:
+    """A worker whose admission queue is full: ready but saturated, and shedding message/send."""
+    if request.url.path == "/ready":
+        return httpx.Response(200, json={"status": "saturated"})
+    if request.url.path == "/.well-known/agent.json":
+        return httpx.Response(200, json={"name": "worker"})
+    return httpx.Response(503, json={"error": "saturated"}, headers={"Retry-After": "3"})
+
+def test_saturated_worker_stays_in_the_ring_and_its_retry_after_reaches_the_caller(load):
+    router_main = load("router/main.py", "router_main")
+    router = router_main.Router("http://router/")
+    router.client = httpx.AsyncClient(transport=httpx.MockTransport(worker))
+    for _ in range(router.unhealthy_after + 1):
+        asyncio.run(router.check(router.add_worker("http://worker-1")))
+    assert router.ring.nodes == {"http://worker-1"}
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=router.build()), base_url="http://router") as client:
+            return await client.post("/", json={"jsonrpc": "2.0", "id": 1, "method": "message/send",
+                                                 "params": {"message": {"contextId": "c1", "parts": []}}})
+
+    response = asyncio.run(send())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+
+def test_saturated_agent_reports_ready():
+    readiness = Readiness("test")
+    readiness.state = "ready"
+    readiness.admission = SimpleNamespace(full=True)
+    response = TestClient(Starlette(routes=[readiness.route()])).get("/ready")
+    assert (response.status_code, response.json()["status"]) == (200, "saturated")
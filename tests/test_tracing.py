@@ -0,0 +1,26 @@
+import asyncio
+import json
+from tracing import Tracer
+
+def test_trace_is_a_json_array_without_placeholder_events_and_lanes_are_freed(tmp_path):
+    tracer = Tracer()
+    tracer.start(str(tmp_path / "trace.json"))
+
+    async def session(index):
+        with tracer.span("session", index=index):
+            with tracer.span("turn"):
+                await asyncio.sleep(0)
+
+    async def sessions():
+        for _ in range(3):
+            await asyncio.gather(*(session(index) for index in range(4)))
+
+    asyncio.run(sessions())
+    lanes = dict(tracer._lanes)
+    tracer.close()
+
+    events = json.loads((tmp_path / "trace.json").read_text())
+    assert all(event.get("name") for event in events)
+    assert len([event for event in events if event["name"] == "session"]) == 12
+    assert {event["tid"] for event in events if event.get("ph") == "X"} == {1, 2, 3, 4}
+    assert lanes == {}
@@ -0,0 +1,13 @@
+from webhooks import WebhookReceiver
+
+def test_push_is_only_offered_to_agents_that_can_reach_the_callback(monkeypatch):
+    monkeypatch.delenv("A2A_WEBHOOK_URL", raising=False)
+    local = WebhookReceiver.from_env(8090)
+    assert local.url == "http://127.0.0.1:8090/a2a/notifications"
+    assert local.reachable_from("DevOpsAgent", ["http://localhost:8001", "http://127.0.0.1:8101"])
+    assert not local.reachable_from("DevOpsAgent", ["http://localhost:8001", "http://host-a:8001"])
+
+    monkeypatch.setenv("A2A_WEBHOOK_URL", "http://chat-host:8090/a2a/notifications")
+    public = WebhookReceiver.from_env(8090)
+    assert public.url == "http://chat-host:8090/a2a/notifications"
+    assert public.reachable_from("DevOpsAgent", ["http://host-a:8001"])
@@ -1,41 +1,120 @@
+import asyncio
 import logging
-import uvicorn
+import os
+import sys
 
 from a2a.server.agent_execution import AgentExecutor, RequestContext
-from a2a.server.apps import A2AStarletteApplication
 from a2a.server.events.event_queue import EventQueue
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from a2a.types import AgentCapabilities, AgentCard
-from a2a.utils import new_agent_text_message
-from semantic_kernel.agents import CopilotStudioAgent, CopilotStudioAgentThread
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from common.admission import AdmissionController
+from common.client_pool import ClientPool
+from common.fakes import FakeCopilotStudioAgent, use_fake_backends
+from common.metrics import ExecutorMetrics
+from common.readiness import Readiness
+from common.server import agent_card, build_app, serve
+from common.retry import RetryPolicy
+from common.tasks import RunningTask, TaskTracker
+from common.work_items import FORMAT_RESULTS, TODOS, WORK_ITEMS, FormatResult, Todo, data_part, parse_work_items, read_items, render_todos
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+FORMAT_INSTRUCTIONS = "Format these todos into structured work items for Azure DevOps with titles, descriptions, types, and acceptance criteria:"
+BATCH = "batch"
+
 class AzureDevOpsA2AExecutor(AgentExecutor):
-    def __init__(self):
-        self.agent = CopilotStudioAgent(name="AzureDevOpsAssistant", instructions="Use the available tools to create or view work items in Azure DevOps.")
-        self.threads: dict[str, CopilotStudioAgentThread] = {}
+    def __init__(self, agent_factory=None):
+        self.threads = {}
+        self.metrics = ExecutorMetrics("formatter", sessions=self.threads)
+        # Several Copilot Studio clients, each conversation pinned to one, see common/client_pool.py.
+        self.clients = ClientPool.from_env("formatter", agent_factory or self._new_agent, on_recycle=self._drop_threads)
+        self.admission = AdmissionController.from_env("formatter", max_concurrency=self.clients.size * self.clients.max_per_client)
+        self.retry = RetryPolicy.from_env("formatter")
+        self.tasks = TaskTracker("formatter")
+        # Todos per model call in a batch: several share one prompt, and the chunks still run in parallel.
+        self.batch_chunk_size = int(os.environ.get("FORMAT_BATCH_CHUNK", "5"))
+        # Runs in the background once the server is up, see common/readiness.py.
+        self.readiness = Readiness("formatter")
+        self.readiness.add_step("copilot_agent", self.clients.start)
+
+    def _new_agent(self):
+        from semantic_kernel.agents import CopilotStudioAgent
+        return CopilotStudioAgent(name="AzureDevOpsAssistant", instructions="Use the available tools to create or view work items in Azure DevOps.")
+
+    def _drop_threads(self, context_ids):
+        for context_id in context_ids:
+            self.threads.pop(context_id, None)
 
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        async with self.tasks.start(context, event_queue) as running:
+            async with self.admission.slot():
+                with self.metrics.request():
+                    await self._execute(context, running)
+
+    async def _execute(self, context: RequestContext, running: RunningTask) -> None:
         try:
+            if not await self.readiness.wait():
+                await running.fail("Agent not initialized")
+                return
             thread = self.threads.get(context.context_id)
-            print (context.get_user_input())
-            user_input = context.get_user_input().strip()
-            response = await self.agent.get_response(messages=user_input, thread=thread)
+            # Structured todos replace the prose transcript, so Copilot Studio only sees the list itself.
+            todos = read_items(context.message.parts, TODOS, Todo)
+            batch = (context.message.metadata or {}).get(BATCH)
+            if todos and batch:
+                chunk_size = batch.get("chunk_size", self.batch_chunk_size) if isinstance(batch, dict) else self.batch_chunk_size
+                await self._format_batch(running, todos, max(1, int(chunk_size)))
+                return
+            user_input = f"{FORMAT_INSTRUCTIONS}\n\n{render_todos(todos)}" if todos else context.get_user_input().strip()
+            logger.debug(f"Formatting request: {user_input}")
+            async with self.clients.client(context.context_id) as agent:
+                with self.metrics.stage("copilot_get_response"):
+                    response = await self.retry.call("copilot_get_response", agent.get_response, messages=user_input, thread=thread)
             
             if response and response.thread:
                 self.threads[context.context_id] = response.thread
 
             result = self._extract_content(response) or "I processed your request but couldn't generate a response."
-            await event_queue.enqueue_event(new_agent_text_message(result))
+            items = parse_work_items(result)
+            if todos and len(todos) == len(items):
+                for todo, item in zip(todos, items):
+                    item.assignee = item.assignee or todo.assignee
+            await running.reply(result, *([data_part(WORK_ITEMS, items)] if items else []))
         except Exception as e:
             error = "Authentication error: Check COPILOT_STUDIO_* environment variables." if "403" in str(e) else f"Error: {e}"
-            await event_queue.enqueue_event(new_agent_text_message(error))
+            await running.fail(error)
+
+    async def _format_chunk(self, start: int, todos: list[Todo]) -> list[FormatResult]:
+        try:
+            # A fresh conversation per chunk on whichever pooled client is least busy; nothing is kept afterwards.
+            async with self.clients.client(None) as agent:
+                with self.metrics.stage("copilot_get_response"):
+                    response = await self.retry.call("copilot_get_response", agent.get_response, messages=f"{FORMAT_INSTRUCTIONS}\n\n{render_todos(todos)}", thread=None)
+            items = parse_work_items(self._extract_content(response))
+        except Exception as e:
+            return [FormatResult(index=start + i, status="failed", todo=todo, error=str(e)) for i, todo in enumerate(todos)]
+        if len(items) != len(todos):
+            error = f"formatter returned {len(items)} work items for {len(todos)} todos"
+            return [FormatResult(index=start + i, status="failed", todo=todo, error=error) for i, todo in enumerate(todos)]
+        for todo, item in zip(todos, items):
+            item.assignee = item.assignee or todo.assignee
+        return [FormatResult(index=start + i, status="formatted", todo=todo, item=item) for i, (todo, item) in enumerate(zip(todos, items))]
+
+    async def _format_batch(self, running: RunningTask, todos: list[Todo], chunk_size: int):
+        """Formats the todos chunk by chunk in parallel conversations and answers with one result per todo, in batch order."""
+        chunks = [(start, todos[start:start + chunk_size]) for start in range(0, len(todos), chunk_size)]
+        results = [result for chunk in await asyncio.gather(*(self._format_chunk(start, chunk) for start, chunk in chunks)) for result in chunk]
+        formatted = [result.item for result in results if result.item]
+        if not formatted:
+            await running.fail(f"Error: none of the {len(todos)} todos could be formatted: {results[0].error}")
+            return
+        lines = [f"{result.index + 1}. {result.item.title}" if result.item else f"{result.index + 1}. {result.todo.title} (failed: {result.error})" for result in results]
+        await running.reply(f"Formatted {len(formatted)} of {len(todos)} todos:\n" + "\n".join(lines),
+                            data_part(WORK_ITEMS, formatted), data_part(FORMAT_RESULTS, results))
 
     def _extract_content(self, response) -> str:
-        print (response)
+        logger.debug(f"Copilot Studio response: {response}")
         if not response:
             return ""
         
@@ -51,24 +130,14 @@ class AzureDevOpsA2AExecutor(AgentExecutor):
         return ""
 
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
-        raise NotImplementedError("Cancel operation is not supported.")
+        # get_response is a coroutine over the Copilot Studio connection, so cancelling the task aborts the call.
+        await self.tasks.cancel(context)
 
 if __name__ == "__main__":
-    agent_card = AgentCard(
-        name='User Story Formating Agent',
-        description='A specialized Azure DevOps assistant that helps structure and organize work items effectively. Create well-formatted user stories, tasks, bugs, and epics with proper acceptance criteria, clear descriptions, and appropriate field values through natural language interaction.',
-        capabilities=AgentCapabilities(streaming=False),
-        url='http://localhost:8000/',
-        version='1.0.0',
-        defaultInputModes=['text'],
-        defaultOutputModes=['text'],
-        skills=[],
-    )
-
-    server = A2AStarletteApplication(
-        agent_card=agent_card,
-        http_handler=DefaultRequestHandler(agent_executor=AzureDevOpsA2AExecutor(), task_store=InMemoryTaskStore()),
-    )
-
-    logger.info("Starting Azure DevOps A2A Agent server on http://localhost:8000")
-    uvicorn.run(server.build(), host='0.0.0.0', port=8000)
\ No newline at end of file
+    port = int(os.environ.get("PORT", 8000))
+    card = agent_card('User Story Formating Agent', 'A specialized Azure DevOps assistant that helps structure and organize work items effectively. Create well-formatted user stories, tasks, bugs, and epics with proper acceptance criteria, clear descriptions, and appropriate field values through natural language interaction.', port)
+
+    executor = AzureDevOpsA2AExecutor(agent_factory=FakeCopilotStudioAgent.from_env if use_fake_backends() else None)
+
+    logger.info(f"Starting Azure DevOps A2A Agent server on http://{os.environ.get('HOST', '0.0.0.0')}:{port}")
+    serve(build_app(card, executor), port)
\ No newline at end of file